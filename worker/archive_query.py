@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# worker/archive_query.py
+# Consulta o arquivo histórico (engine/archive): o pro.json/top10.json que o
+# painel mostrava num instante qualquer.
+#
+#   python worker/archive_query.py --at "2025-10-18 14:35"             # BRT
+#   python worker/archive_query.py --at "2025-10-18 14:35" --stream top10
+#   python worker/archive_query.py --at 1760808900000 --par BTC       # epoch ms
+#   python worker/archive_query.py --days                             # segmentos diários
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from datetime import datetime
+from typing import List, Optional
+
+from engine.archive import SnapshotArchive
+from engine.config import TZ_BRT
+
+
+def _parse_at(s: str) -> int:
+    s = s.strip()
+    if s.isdigit():
+        return int(s)
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return int(datetime.strptime(s, fmt).replace(tzinfo=TZ_BRT).timestamp() * 1000)
+        except ValueError:
+            continue
+    raise argparse.ArgumentTypeError(f"instante inválido: {s!r} (use 'AAAA-MM-DD HH:MM' em BRT ou epoch ms)")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Snapshot do painel num instante (arquivo histórico).")
+    ap.add_argument("--at", type=_parse_at, help="'AAAA-MM-DD HH:MM[:SS]' (BRT) ou epoch em ms")
+    ap.add_argument("--stream", default="pro", choices=("pro", "top10"))
+    ap.add_argument("--par", default="", help="só o item deste PAR")
+    ap.add_argument("--days", action="store_true", help="lista os segmentos diários do stream")
+    args = ap.parse_args(argv)
+
+    archive = SnapshotArchive()
+    if args.days:
+        for d in archive.days(args.stream):
+            print(d)
+        return 0
+    if args.at is None:
+        ap.error("informe --at (ou --days)")
+
+    snap = archive.at(args.stream, args.at)
+    if snap is None:
+        print(f"nada arquivado em {args.stream} até esse instante", file=sys.stderr)
+        return 1
+    if args.par:
+        par = args.par.strip().upper()
+        snap = next((it for it in snap.get("items") or [] if it.get("par") == par), None)
+        if snap is None:
+            print(f"{par} não estava no snapshot", file=sys.stderr)
+            return 1
+    print(json.dumps(snap, ensure_ascii=False, indent=1))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
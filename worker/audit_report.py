@@ -1,179 +1,393 @@
 from __future__ import annotations
 
+import argparse
 import csv
 import json
+import os
+from bisect import bisect_left, bisect_right
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Any, Tuple
+from typing import Deque, Dict, Iterator, List, Any, Optional, Tuple
 from datetime import datetime, timedelta
 
 from engine.config import DATA_DIR
+from engine.io import atomic_write_json
+from engine.pricecol import PriceColumns, bin_path, load_coins, ts_to_min
 
 AUDIT_DIR = Path(DATA_DIR) / "audit"
 OUT_SUMMARY = AUDIT_DIR / "report_summary.json"
 OUT_BY_COIN = AUDIT_DIR / "report_by_coin.csv"
+# parciais por dia de sinal (chaveados por tamanho/mtime dos arquivos usados)
+CACHE_PATH = AUDIT_DIR / "report_cache.json"
+CACHE_VERSION = 1
 
+# janelas aprovadas
+WINDOWS = {
+    "30m": 30,
+    "1h": 60,
+    "4h": 240,
+    "24h": 1440,
+}
 
-def _read_jsonl(path: Path) -> List[Dict[str, Any]]:
+
+def _iter_jsonl(path: Path) -> Iterator[Dict[str, Any]]:
     if not path.exists():
-        return []
-    out: List[Dict[str, Any]] = []
+        return
     with path.open("r", encoding="utf-8") as f:
         for line in f:
             line = line.strip()
             if not line:
                 continue
             try:
-                out.append(json.loads(line))
+                yield json.loads(line)
             except Exception:
                 continue
-    return out
-
 
-def _parse_ts(ts_brt: str) -> datetime:
-    # ts_brt: "YYYY-MM-DD HH:MM"
-    return datetime.strptime(ts_brt, "%Y-%m-%d %H:%M")
 
+class _PriceIndex:
+    """
+    Série de preços de UMA moeda, ordenada por tempo (minutos), com
+    sparse tables de min/max construídas sob demanda.
 
-def _window_end(t0: datetime, minutes: int) -> datetime:
-    return t0 + timedelta(minutes=minutes)
-
+    - janela [t0, t1]: bisect nos tempos -> (lo, hi) em O(log n)
+    - min/max de um intervalo: O(1)
+    - primeiro cruzamento do alvo: O(log n) saltando blocos 2^k
+    """
 
-def _eval_signal(prices: List[Tuple[datetime, float]], *, side: str, entry: float, target: float,
-                 t0: datetime, minutes: int) -> Dict[str, Any]:
+    def __init__(self, series: List[Tuple[int, float]]):
+        series.sort(key=lambda x: x[0])  # estável (mesma ordem do sort original)
+        self.times: List[int] = [t for t, _ in series]
+        self.prices: List[float] = [p for _, p in series]
+        self._mn: List[List[float]] = [self.prices]
+        self._mx: List[List[float]] = [self.prices]
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def _level(self, k: int) -> None:
+        # só constrói os níveis que as janelas realmente usam (memória limitada)
+        while len(self._mn) <= k:
+            half = 1 << (len(self._mn) - 1)
+            mn, mx = self._mn[-1], self._mx[-1]
+            self._mn.append(list(map(min, mn, mn[half:])))
+            self._mx.append(list(map(max, mx, mx[half:])))
+
+    def bounds(self, t0: int, t1: int) -> Tuple[int, int]:
+        """Índices [lo, hi] dos pontos com t0 <= t <= t1 (lo > hi = vazio)."""
+        return bisect_left(self.times, t0), bisect_right(self.times, t1) - 1
+
+    def range_min(self, lo: int, hi: int) -> float:
+        k = (hi - lo + 1).bit_length() - 1
+        self._level(k)
+        row = self._mn[k]
+        return min(row[lo], row[hi - (1 << k) + 1])
+
+    def range_max(self, lo: int, hi: int) -> float:
+        k = (hi - lo + 1).bit_length() - 1
+        self._level(k)
+        row = self._mx[k]
+        return max(row[lo], row[hi - (1 << k) + 1])
+
+    def first_at_least(self, lo: int, hi: int, target: float) -> Optional[int]:
+        """Primeiro i em [lo, hi] com preço >= target (LONG)."""
+        k = (hi - lo + 1).bit_length() - 1
+        self._level(k)
+        i = lo
+        while k >= 0:
+            if i + (1 << k) - 1 <= hi and self._mx[k][i] < target:
+                i += 1 << k
+            k -= 1
+        return i if i <= hi else None
+
+    def first_at_most(self, lo: int, hi: int, target: float) -> Optional[int]:
+        """Primeiro i em [lo, hi] com preço <= target (SHORT)."""
+        k = (hi - lo + 1).bit_length() - 1
+        self._level(k)
+        i = lo
+        while k >= 0:
+            if i + (1 << k) - 1 <= hi and self._mn[k][i] > target:
+                i += 1 << k
+            k -= 1
+        return i if i <= hi else None
+
+
+def _eval_signal(prices: _PriceIndex, *, side: str, entry: float, target: float,
+                 t0: int, minutes: int) -> Dict[str, Any]:
     """
-    prices: lista (ts, price) já filtrada por moeda e ordenada
+    prices: índice da moeda (tempos em minutos, ordenados)
     retorna: hit(bool), time_to_hit_min (ou None), adverse_pct (pior antes do hit, ou dentro da janela)
     """
-    t1 = _window_end(t0, minutes)
     # pega pontos dentro da janela (inclui t0)
-    pts = [(t, p) for (t, p) in prices if t0 <= t <= t1]
-    if not pts:
+    lo, hi = prices.bounds(t0, t0 + minutes)
+    if lo > hi:
         return {"hit": False, "time_to_hit_min": None, "adverse_pct": None}
 
-    hit = False
-    t_hit = None
-
-    # adverso (pior movimento contra)
-    min_p = min(p for _, p in pts)
-    max_p = max(p for _, p in pts)
-
     if side == "LONG":
         # hit: algum preço >= target
-        for t, p in pts:
-            if p >= target:
-                hit = True
-                t_hit = t
-                break
-        # adverso: pior queda (min) em relação à entrada
-        adverse = (min_p - entry) / entry * 100.0
+        i_hit = prices.first_at_least(lo, hi, target)
     else:  # SHORT
-        for t, p in pts:
-            if p <= target:
-                hit = True
-                t_hit = t
-                break
-        # adverso: pior alta (max) contra a posição
-        adverse = (entry - max_p) / entry * 100.0
+        i_hit = prices.first_at_most(lo, hi, target)
 
+    hit = i_hit is not None
     time_to_hit = None
-    if hit and t_hit:
-        time_to_hit = int(round((t_hit - t0).total_seconds() / 60.0))
-
-        # recalcula adverso só até o hit (mais justo)
-        pts2 = [(t, p) for (t, p) in pts if t <= t_hit]
-        if pts2:
-            min_p2 = min(p for _, p in pts2)
-            max_p2 = max(p for _, p in pts2)
-            if side == "LONG":
-                adverse = (min_p2 - entry) / entry * 100.0
-            else:
-                adverse = (entry - max_p2) / entry * 100.0
+    if hit:
+        t_hit = prices.times[i_hit]
+        time_to_hit = t_hit - t0
+        # adverso só até o hit (mais justo) — inclui pontos com o mesmo ts do hit
+        hi = bisect_right(prices.times, t_hit, lo, hi + 1) - 1
+
+    if side == "LONG":
+        # adverso: pior queda (min) em relação à entrada
+        adverse = (prices.range_min(lo, hi) - entry) / entry * 100.0
+    else:
+        # adverso: pior alta (max) contra a posição
+        adverse = (entry - prices.range_max(lo, hi)) / entry * 100.0
 
     return {"hit": hit, "time_to_hit_min": time_to_hit, "adverse_pct": adverse}
 
 
-def main():
-    AUDIT_DIR.mkdir(parents=True, exist_ok=True)
+def _coin_stats(prices: _PriceIndex, sigs: List[Tuple[str, int, float, float]]) -> Dict[str, Any]:
+    """Acumula hits / tempo até o hit / adverso de todos os sinais de uma moeda."""
+    coin: Dict[str, Any] = {"signals": 0}
+    for side, t0, entry, target in sigs:
+        coin["signals"] += 1
 
-    # lê todos os arquivos do audit dir
-    prices_all: List[Dict[str, Any]] = []
-    signals_all: List[Dict[str, Any]] = []
+        # avalia cada janela
+        for label, mins in WINDOWS.items():
+            r = _eval_signal(prices, side=side, entry=entry, target=target, t0=t0, minutes=mins)
+            coin.setdefault(f"hit_{label}", 0)
+            if r["hit"]:
+                coin[f"hit_{label}"] += 1
+                # tempo médio para hit (por janela)
+                key_tt = f"tt_{label}_sum"
+                coin[key_tt] = coin.get(key_tt, 0) + int(r["time_to_hit_min"] or 0)
+                coin.setdefault(f"tt_{label}_count", 0)
+                coin[f"tt_{label}_count"] += 1
+
+            # adverso médio (por janela)
+            adv = r["adverse_pct"]
+            if adv is not None:
+                key_as = f"adv_{label}_sum"
+                coin[key_as] = coin.get(key_as, 0.0) + float(adv)
+                coin.setdefault(f"adv_{label}_count", 0)
+                coin[f"adv_{label}_count"] += 1
+    return coin
 
-    for p in sorted(AUDIT_DIR.glob("prices_*.jsonl")):
-        prices_all.extend(_read_jsonl(p))
-    for p in sorted(AUDIT_DIR.glob("signals_*.jsonl")):
-        signals_all.extend(_read_jsonl(p))
 
-    # indexa preços por moeda
-    prices_by_coin: Dict[str, List[Tuple[datetime, float]]] = {}
-    for row in prices_all:
+def _iter_prices(path: Path) -> Iterator[Tuple[str, int, float]]:
+    """(par, t_min, preço) de um arquivo prices_*.jsonl."""
+    for row in _iter_jsonl(path):
         par = str(row.get("par") or "").strip()
         ts = row.get("ts_brt")
         atual = row.get("atual")
         if not par or not ts:
             continue
         try:
-            t = _parse_ts(str(ts))
-            p = float(atual)
+            yield par, ts_to_min(str(ts)), float(atual)
         except Exception:
             continue
-        prices_by_coin.setdefault(par, []).append((t, p))
 
-    for par in prices_by_coin:
-        prices_by_coin[par].sort(key=lambda x: x[0])
-
-    # janelas aprovadas
-    WINDOWS = {
-        "30m": 30,
-        "1h": 60,
-        "4h": 240,
-        "24h": 1440,
-    }
-
-    # estatística por moeda
-    stats: Dict[str, Dict[str, Any]] = {}
 
-    for s in signals_all:
+def _iter_signals(path: Path) -> Iterator[Tuple[str, str, int, float, float]]:
+    """(par, side, t0_min, entrada, alvo) de um arquivo signals_*.jsonl."""
+    for s in _iter_jsonl(path):
         par = str(s.get("par") or "").strip()
         side = str(s.get("side") or "").upper()
         ts = s.get("ts_brt")
         if not par or not ts or side not in ("LONG", "SHORT"):
             continue
         try:
-            t0 = _parse_ts(str(ts))
+            t0 = ts_to_min(str(ts))
             entry = float(s.get("atual") or 0.0)
             target = float(s.get("alvo") or 0.0)
             if entry <= 0 or target <= 0:
                 continue
         except Exception:
             continue
+        yield par, side, t0, entry, target
+
+
+def _price_files(day: str) -> List[Path]:
+    return [AUDIT_DIR / f"prices_{day}.jsonl", bin_path(AUDIT_DIR, day)]
+
+
+class _PriceDays:
+    """Preços por dia, já agrupados por moeda. Guarda só os 2 últimos dias lidos
+    (o dia D+1 de um sinal é o dia D do próximo), então a memória fica limitada.
+
+    Se existir prices_D.bin (engine/pricecol) ele é usado no lugar do JSONL:
+    mmap + colunas, sem parsing linha a linha; o dia fica mapeado (PriceColumns,
+    .get(par) como o dict) e só as moedas com sinal viram lista."""
+
+    def __init__(self) -> None:
+        self._days: Dict[str, Any] = {}  # dia -> dict {par: série} ou PriceColumns aberto
+        self._coins: Optional[List[str]] = None
+
+    def _load(self, day: str) -> Any:
+        bp = bin_path(AUDIT_DIR, day)
+        if bp.exists():
+            if self._coins is None:
+                self._coins = load_coins(AUDIT_DIR)
+            return PriceColumns(bp, self._coins)
+        got: Dict[str, List[Tuple[int, float]]] = {}
+        for par, t, p in _iter_prices(AUDIT_DIR / f"prices_{day}.jsonl"):
+            got.setdefault(par, []).append((t, p))
+        return got
+
+    def get(self, day: str) -> Any:
+        got = self._days.get(day)
+        if got is None:
+            got = self._load(day)
+            while len(self._days) >= 2:
+                self._drop(next(iter(self._days)))
+            self._days[day] = got
+        return got
+
+    def _drop(self, day: str) -> None:
+        got = self._days.pop(day)
+        if isinstance(got, PriceColumns):
+            got.close()
+
+    def close(self) -> None:
+        while self._days:
+            self._drop(next(iter(self._days)))
+
+
+def _next_day(day: str) -> str:
+    return (datetime.strptime(day, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+
+
+def _file_key(path: Path) -> List[Any]:
+    try:
+        st = path.stat()
+        return [path.name, st.st_size, st.st_mtime_ns]
+    except OSError:
+        return [path.name, None, None]
+
+
+_CoinTask = Tuple[str, List[Tuple[str, int, float, float]], List[Tuple[int, float]]]
+
+
+def _day_tasks(day: str, signals_path: Path, prices: _PriceDays) -> List[_CoinTask]:
+    """(par, sinais, série) dos sinais de UM dia. A maior janela é 24h, então
+    bastam os preços do próprio dia e do dia seguinte."""
+    sigs_by_coin: Dict[str, List[Tuple[str, int, float, float]]] = {}
+    for par, side, t0, entry, target in _iter_signals(signals_path):
+        # mantém a ordem original dentro da moeda
+        sigs_by_coin.setdefault(par, []).append((side, t0, entry, target))
+
+    out: List[_CoinTask] = []
+    if not sigs_by_coin:
+        return out
+    d0, d1 = prices.get(day), prices.get(_next_day(day))
+    for par, sigs in sigs_by_coin.items():
+        series = d0.get(par, []) + d1.get(par, [])
+        if series:
+            out.append((par, sigs, series))
+    return out
 
-        price_series = prices_by_coin.get(par, [])
-        if not price_series:
-            continue
 
-        coin = stats.setdefault(par, {"signals": 0})
-        coin["signals"] += 1
+def _eval_coins(tasks: List[_CoinTask]) -> List[Dict[str, Any]]:
+    """Avalia um bloco de moedas (roda no processo pai ou num worker do pool)."""
+    return [_coin_stats(_PriceIndex(series), sigs) for _par, sigs, series in tasks]
 
-        # avalia cada janela
-        for label, mins in WINDOWS.items():
-            r = _eval_signal(price_series, side=side, entry=entry, target=target, t0=t0, minutes=mins)
-            coin.setdefault(f"hit_{label}", 0)
-            if r["hit"]:
-                coin[f"hit_{label}"] += 1
-                # tempo médio para hit (por janela)
-                key_tt = f"tt_{label}_sum"
-                coin[key_tt] = coin.get(key_tt, 0) + int(r["time_to_hit_min"] or 0)
-                coin.setdefault(f"tt_{label}_count", 0)
-                coin[f"tt_{label}_count"] += 1
 
-            # adverso médio (por janela)
-            adv = r["adverse_pct"]
-            if adv is not None:
-                key_as = f"adv_{label}_sum"
-                coin[key_as] = coin.get(key_as, 0.0) + float(adv)
-                coin.setdefault(f"adv_{label}_count", 0)
-                coin[f"adv_{label}_count"] += 1
+def _chunks(tasks: List[_CoinTask], n: int) -> List[List[_CoinTask]]:
+    # blocos contíguos: concatenar os resultados devolve a ordem original
+    size = max(1, -(-len(tasks) // max(1, n)))
+    return [tasks[i:i + size] for i in range(0, len(tasks), size)]
+
+
+def _merge_stats(dst: Dict[str, Dict[str, Any]], part: Dict[str, Dict[str, Any]]) -> None:
+    for par, st in part.items():
+        coin = dst.setdefault(par, {})
+        for k, v in st.items():
+            coin[k] = coin.get(k, 0) + v
+
+
+def _load_cache() -> Dict[str, Any]:
+    try:
+        c = json.loads(CACHE_PATH.read_text(encoding="utf-8"))
+        if c.get("version") == CACHE_VERSION and isinstance(c.get("days"), dict):
+            return c["days"]
+    except Exception:
+        pass
+    return {}
+
+
+class _Done:
+    """Resultado já pronto com a mesma interface de um Future."""
+
+    def __init__(self, value: Any):
+        self._value = value
+
+    def result(self) -> Any:
+        return self._value
+
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="Relatório de acerto dos sinais (janelas 30m/1h/4h/24h).")
+    ap.add_argument("--rebuild", action="store_true", help="ignora o cache de parciais e recalcula tudo")
+    ap.add_argument("--jobs", type=int, default=1,
+                    help="processos para avaliar as moedas em paralelo (0 = todos os núcleos)")
+    args = ap.parse_args(argv)
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+
+    AUDIT_DIR.mkdir(parents=True, exist_ok=True)
+
+    # Um dia de sinais D depende de signals_D, prices_D e prices_D+1 (.jsonl/.bin).
+    # Se nenhum desses arquivos mudou (tamanho/mtime), reaproveita a parcial do
+    # cache; dias cuja janela de 24h ainda está aberta mudam de chave sozinhos.
+    cached = {} if args.rebuild else _load_cache()
+    days_out: Dict[str, Any] = {}
+    prices = _PriceDays()
+    recomputed = 0
+
+    # estatística por moeda
+    stats: Dict[str, Dict[str, Any]] = {}
+
+    # --jobs N: as moedas de cada dia são divididas em N blocos no pool enquanto
+    # o processo pai já lê o próximo dia. As parciais são juntadas SEMPRE na
+    # ordem dos dias (e das moedas), então a saída é idêntica ao modo serial.
+    pool = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+    pending: Deque[Tuple[str, List[Any], List[_CoinTask], List[Any]]] = deque()
+
+    def _finish_oldest() -> None:
+        day, key, tasks, futs = pending.popleft()
+        results = [r for f in futs for r in f.result()]
+        part = {t[0]: r for t, r in zip(tasks, results)}
+        days_out[day] = {"key": key, "stats": part}
+        _merge_stats(stats, part)
+
+    try:
+        for sp in sorted(AUDIT_DIR.glob("signals_*.jsonl")):
+            day = sp.stem[len("signals_"):]
+            key = [_file_key(sp)] + [_file_key(p) for d in (day, _next_day(day)) for p in _price_files(d)]
+            hit = cached.get(day)
+            if hit and hit.get("key") == key:
+                part = hit.get("stats") or {}
+                tasks = [(par, [], []) for par in part]
+                futs = [_Done(list(part.values()))]
+            else:
+                tasks = _day_tasks(day, sp, prices)
+                if pool is None:
+                    futs = [_Done(_eval_coins(tasks))]
+                else:
+                    futs = [pool.submit(_eval_coins, c) for c in _chunks(tasks, jobs)]
+                recomputed += 1
+            pending.append((day, key, tasks, futs))
+            # limita quantos dias ficam em memória esperando o pool
+            while len(pending) > 2 * jobs:
+                _finish_oldest()
+        while pending:
+            _finish_oldest()
+    finally:
+        prices.close()
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    atomic_write_json(CACHE_PATH, {"version": CACHE_VERSION, "days": days_out})
 
     # escreve CSV por moeda
     fields = [
@@ -255,7 +469,7 @@ def main():
     with OUT_SUMMARY.open("w", encoding="utf-8") as f:
         json.dump(summary, f, ensure_ascii=False, indent=2)
 
-    print("OK. Relatórios gerados em:", str(AUDIT_DIR))
+    print(f"OK. Relatórios gerados em: {AUDIT_DIR} (dias recalculados: {recomputed}/{len(days_out)})")
 
 
 if __name__ == "__main__":
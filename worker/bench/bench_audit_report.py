@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Benchmark do audit_report (janelas 30m/1h/4h/24h).
+
+Gera um histórico sintético no MESMO formato de engine/audit.py
+(prices_YYYY-MM-DD.jsonl a cada 5 min + signals_YYYY-MM-DD.jsonl) num
+DATA_DIR temporário e mede o audit_report.main().
+
+Uso:
+  python worker/bench/bench_audit_report.py                      # 1 ano, 10 moedas
+  python worker/bench/bench_audit_report.py --coins 78 --days 365
+  python worker/bench/bench_audit_report.py --days 30 --check    # compara com a varredura antiga
+  python worker/bench/bench_audit_report.py --price-format bin   # histórico em engine/pricecol
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+WORKER_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(WORKER_DIR))
+
+from engine.pricecol import PriceColumns, PriceColumnWriter  # noqa: E402
+
+
+def _gen_history(audit_dir: Path, *, coins: int, days: int, signals_per_day: int, seed: int,
+                 price_format: str = "jsonl") -> Tuple[int, int]:
+    rnd = random.Random(seed)
+    writer = PriceColumnWriter(audit_dir) if price_format == "bin" else None
+    pares = [f"C{i:03d}" for i in range(coins)]
+    px = {p: 10.0 ** rnd.uniform(-2, 4) for p in pares}
+    t = datetime(2025, 1, 1)
+    n_prices = n_signals = 0
+    for _ in range(days):
+        d = t.strftime("%Y-%m-%d")
+        price_lines: List[str] = []
+        with (audit_dir / f"signals_{d}.jsonl").open("w", encoding="utf-8") as fs:
+            sig_slots = set(rnd.sample(range(288), min(288, signals_per_day)))
+            for slot in range(288):
+                ts = t.strftime("%Y-%m-%d %H:%M")
+                h = t.strftime("%H:%M")
+                batch = []
+                for par in pares:
+                    px[par] *= math.exp(rnd.gauss(0.0, 0.004))
+                    atual = round(px[par], 8)
+                    batch.append((par, atual))
+                    if slot in sig_slots:
+                        side = rnd.choice(("LONG", "SHORT"))
+                        dist = atual * rnd.uniform(0.005, 0.04)
+                        alvo = atual + dist if side == "LONG" else atual - dist
+                        fs.write(json.dumps({
+                            "date": d, "hora": h, "ts_brt": ts, "updated_at": ts,
+                            "par": par, "side": side, "atual": atual, "alvo": alvo,
+                        }) + "\n")
+                        n_signals += 1
+                n_prices += len(batch)
+                if writer is not None:
+                    writer.append(d, ts, batch)
+                else:
+                    price_lines.extend(json.dumps({
+                        "date": d, "hora": h, "ts_brt": ts, "updated_at": ts,
+                        "par": par, "atual": atual, "price_source": "BYBIT",
+                    }) + "\n" for par, atual in batch)
+                t += timedelta(minutes=5)
+        if price_lines:
+            (audit_dir / f"prices_{d}.jsonl").write_text("".join(price_lines), encoding="utf-8")
+    return n_prices, n_signals
+
+
+def _eval_scan(prices: List[Tuple[int, float]], *, side: str, entry: float, target: float,
+               t0: int, minutes: int) -> Dict:
+    """Versão antiga (varredura completa da série) — referência para --check."""
+    t1 = t0 + minutes
+    pts = [(t, p) for (t, p) in prices if t0 <= t <= t1]
+    if not pts:
+        return {"hit": False, "time_to_hit_min": None, "adverse_pct": None}
+    t_hit = None
+    for t, p in pts:
+        if (side == "LONG" and p >= target) or (side == "SHORT" and p <= target):
+            t_hit = t
+            break
+    if t_hit is not None:
+        pts = [(t, p) for (t, p) in pts if t <= t_hit]
+    if side == "LONG":
+        adverse = (min(p for _, p in pts) - entry) / entry * 100.0
+    else:
+        adverse = (entry - max(p for _, p in pts)) / entry * 100.0
+    return {
+        "hit": t_hit is not None,
+        "time_to_hit_min": (t_hit - t0) if t_hit is not None else None,
+        "adverse_pct": adverse,
+    }
+
+
+def _check(audit_report, audit_dir: Path, max_signals: int) -> None:
+    series: Dict[str, List[Tuple[int, float]]] = {}
+    days = audit_report._PriceDays()
+    for f in sorted(audit_dir.glob("signals_*.jsonl")):
+        day = days.get(f.stem[len("signals_"):])
+        pars = day.coin_index() if isinstance(day, PriceColumns) else day  # .bin fica mapeado
+        for par in pars:
+            series.setdefault(par, []).extend(day.get(par, []))
+    days.close()
+    idx = {par: audit_report._PriceIndex(list(s)) for par, s in series.items()}
+    n = 0
+    t_scan = t_idx = 0.0
+    for f in sorted(audit_dir.glob("signals_*.jsonl")):
+        for s in audit_report._iter_jsonl(f):
+            if n >= max_signals:
+                break
+            kw = dict(side=s["side"], entry=float(s["atual"]), target=float(s["alvo"]),
+                      t0=audit_report.ts_to_min(s["ts_brt"]))
+            for mins in audit_report.WINDOWS.values():
+                a = time.perf_counter()
+                r_old = _eval_scan(series[s["par"]], minutes=mins, **kw)
+                b = time.perf_counter()
+                r_new = audit_report._eval_signal(idx[s["par"]], minutes=mins, **kw)
+                c = time.perf_counter()
+                t_scan += b - a
+                t_idx += c - b
+                if r_old != r_new:
+                    raise SystemExit(f"DIVERGÊNCIA {s['par']} {s['ts_brt']} {mins}m: {r_old} != {r_new}")
+            n += 1
+    print(f"check: {n} sinais idênticos | varredura {t_scan:.3f}s | índice {t_idx:.3f}s")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--coins", type=int, default=10)
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--signals-per-day", type=int, default=6, help="sinais por moeda por dia")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--check", action="store_true", help="compara com a varredura antiga (lento)")
+    ap.add_argument("--check-max", type=int, default=2000)
+    ap.add_argument("--jobs", type=int, default=1, help="repassado ao audit_report (--jobs)")
+    ap.add_argument("--price-format", choices=("jsonl", "bin"), default="jsonl",
+                    help="formato do histórico de preços (bin = engine/pricecol)")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_audit_") as tmp:
+        os.environ["DATA_DIR"] = tmp
+        audit_dir = Path(tmp) / "audit"
+        audit_dir.mkdir(parents=True)
+
+        a = time.perf_counter()
+        n_prices, n_signals = _gen_history(audit_dir, coins=args.coins, days=args.days,
+                                           signals_per_day=args.signals_per_day, seed=args.seed,
+                                           price_format=args.price_format)
+        disk = sum(f.stat().st_size for f in audit_dir.glob("prices_*"))
+        print(f"gerado: {n_prices} preços ({disk / 1e6:.1f} MB, {args.price_format}), "
+              f"{n_signals} sinais em {time.perf_counter() - a:.1f}s")
+
+        import audit_report  # lê DATA_DIR na importação
+
+        a = time.perf_counter()
+        audit_report.main(["--rebuild", "--jobs", str(args.jobs)])
+        print(f"audit_report.main (completo, --jobs {args.jobs}): {time.perf_counter() - a:.2f}s")
+
+        # re-execução depois de um dia novo: só os dias cujos arquivos mudaram
+        # (o novo e, em produção, o anterior com a janela de 24h aberta)
+        last = sorted(audit_dir.glob("signals_*.jsonl"))[-1]
+        last.rename(audit_dir / "_last.jsonl")
+        audit_report.main([])
+        (audit_dir / "_last.jsonl").rename(last)
+        a = time.perf_counter()
+        audit_report.main([])
+        print(f"audit_report.main (incremental, +1 dia): {time.perf_counter() - a:.2f}s")
+
+        if args.check:
+            _check(audit_report, audit_dir, args.check_max)
+
+
+if __name__ == "__main__":
+    main()
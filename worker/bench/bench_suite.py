@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Suite de benchmarks dos caminhos quentes do worker, com dados sintéticos
+(bench/synth.py: GBM com regimes de volatilidade, seed fixa) e exchange
+simulada (nenhuma requisição de rede).
+
+Mede, por tamanho:
+  indicators.ema / rsi / atr, compute.mfe_mae_assert, compute.build_signal,
+  worker_pro.build_payload, audit_top10.run_audit_top10, audit_report.main
+
+Tamanhos (moedas x candles | histórico de preços do audit_report):
+  small   78 x 220    | 10 moedas x 7 dias
+  medium  300 x 1000  | 10 moedas x 90 dias
+  large   1000 x 5000 | 10 moedas x 365 dias
+
+Cada execução é acrescentada ao histórico JSON (--history) com o commit
+atual; a tabela mostra a variação contra a execução anterior e
+--fail-on-regression PCT sai com código 1 se algo ficou PCT% mais lento.
+
+Uso:
+  python worker/bench/bench_suite.py                       # small + medium
+  python worker/bench/bench_suite.py --sizes small,medium,large --repeat 3
+  python worker/bench/bench_suite.py --only build_signal,build_payload --fail-on-regression 20
+  python worker/bench/bench_suite.py --check               # só as verificações de comportamento
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+BENCH_DIR = Path(__file__).resolve().parent
+WORKER_DIR = BENCH_DIR.parent
+sys.path.insert(0, str(WORKER_DIR))
+
+# DATA_DIR é lido na importação dos módulos do worker: tudo vai para um diretório temporário
+_TMP = tempfile.TemporaryDirectory(prefix="bench_suite_")
+os.environ["DATA_DIR"] = _TMP.name
+
+import audit_report  # noqa: E402
+import worker_pro  # noqa: E402
+from bench_audit_report import _gen_history  # noqa: E402
+from engine import audit_top10, indicators, instruments, tickers  # noqa: E402
+from engine.delta import apply_patch, diff_payload  # noqa: E402
+from engine.compute import build_signal, mfe_mae_assert, _atr_last  # noqa: E402
+from engine.klines import INTERVAL_MS  # noqa: E402
+from engine.serve import pick_encoding  # noqa: E402
+from engine.tiers import COLD, HOT, classify  # noqa: E402
+from synth import market  # noqa: E402
+
+SIZES: Dict[str, Dict[str, int]] = {
+    "small": {"coins": 78, "bars": 220, "audit_coins": 10, "audit_days": 7},
+    "medium": {"coins": 300, "bars": 1000, "audit_coins": 10, "audit_days": 90},
+    "large": {"coins": 1000, "bars": 5000, "audit_coins": 10, "audit_days": 365},
+}
+
+DEFAULT_HISTORY = BENCH_DIR / "history.json"
+
+
+def _best_of(fn: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(max(1, repeat)):
+        a = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - a)
+    return best
+
+
+def _stub_exchange(mkt: Dict[str, Dict]) -> None:
+    """Exchange simulada: responde do dicionário gerado (símbolo = PAR + USDT)."""
+    def fetch_mark_price(symbol: str, source: str = "BINANCE", timeout: int = 10) -> float:
+        return mkt[symbol[:-4]]["mark"]
+
+    def fetch_klines(symbol: str, interval: str = "4h", limit: int = 200, source: str = "BINANCE", timeout: int = 15,
+                     *, start_ms=None, end_ms=None, with_time: bool = False):
+        kl = mkt[symbol[:-4]][interval]  # série inteira: mede o custo no tamanho pedido
+        if not with_time:
+            return kl
+        # open times alinhados terminando no candle aberto agora (série sem buracos)
+        step = INTERVAL_MS[interval]
+        last = int(time.time() * 1000) // step * step
+        return [[last - (len(kl) - 1 - i) * step] + k for i, k in enumerate(kl)]
+
+    worker_pro.fetch_mark_price = fetch_mark_price
+    worker_pro.fetch_klines = fetch_klines
+    audit_top10.fetch_mark_price = fetch_mark_price
+    instruments.FETCHERS = {}  # sem listagem: mapeamento fixo, nenhuma requisição
+    tickers.FETCHERS = {}      # sem snapshot em lote: mark por símbolo (stub acima)
+
+
+def _audit_top10_setup(data_dir: Path, mkt: Dict[str, Dict]) -> None:
+    """top10.json + 1 sinal aberto por moeda (alvo/invalidação longe: ficam abertos)."""
+    ttl = (datetime.now(timezone.utc) + timedelta(days=365)).isoformat().replace("+00:00", "Z")
+    opened = []
+    for i, (par, m) in enumerate(mkt.items()):
+        px = m["mark"]
+        opened.append({
+            "audit_id": f"bench{i:05d}", "ts_brt": "2025-01-01 00:00", "date": "2025-01-01", "hora": "00:00",
+            "par": par, "side": "LONG", "entrada": px, "alvo": px * 10, "invalidado": px / 10,
+            "ganho_pct": 900.0, "assert_pct": 60.0, "prazo": "4.0h", "price_source": "BYBIT",
+            "ttl_expira_em": ttl, "mfe_pct": 0.0, "mae_pct": 0.0,
+        })
+    top = [{"par": o["par"], "side": "LONG", "atual": o["entrada"], "alvo": o["entrada"] * 1.05,
+            "ganho_pct": 5.0, "assert_pct": 70.0, "prazo": "4.0h", "ttl_expira_em": ttl} for o in opened[:10]]
+    (data_dir / "audit").mkdir(parents=True, exist_ok=True)
+    (data_dir / "top10.json").write_text(json.dumps({"ok": True, "items": top}), encoding="utf-8")
+    (data_dir / "audit" / "top10_open.json").write_text(json.dumps(opened), encoding="utf-8")
+
+
+def run_size(size: str, *, repeat: int, seed: int, only: Optional[List[str]]) -> List[Dict[str, Any]]:
+    cfg = SIZES[size]
+    coins, bars = cfg["coins"], cfg["bars"]
+    a = time.perf_counter()
+    mkt = market(coins, bars, seed=seed)
+    print(f"[{size}] mercado sintético {coins} x {bars} em {time.perf_counter() - a:.1f}s")
+    _stub_exchange(mkt)
+
+    series = list(mkt.values())
+    c1 = [[k[3] for k in m["1h"]] for m in series]
+    hlc4 = [([k[1] for k in m["4h"]], [k[2] for k in m["4h"]], [k[3] for k in m["4h"]]) for m in series]
+    atr4 = [_atr_last(m["4h"]) for m in series]
+
+    settings = {"coins": list(mkt), "cycle_deadline_s": 1e9, "partial_publish_s": 1e9, "fetch_workers": 8}
+    worker_pro.load_settings = lambda *a, **k: settings
+
+    data_dir = Path(os.environ["DATA_DIR"])
+    audit_dir = data_dir / "audit"
+
+    def _audit_report() -> None:
+        with contextlib.redirect_stdout(io.StringIO()):
+            audit_report.main(["--rebuild"])
+
+    cases: Dict[str, Callable[[], Any]] = {
+        "indicators.ema": lambda: [indicators.ema(c, 50) for c in c1],
+        "indicators.rsi": lambda: [indicators.rsi(c, 14) for c in c1],
+        "indicators.atr": lambda: [indicators.atr(h, l, c, 14) for h, l, c in hlc4],
+        "compute.mfe_mae_assert": lambda: [mfe_mae_assert(m["4h"], "LONG", a * 1.5, a)
+                                           for m, a in zip(series, atr4)],
+        "compute.build_signal": lambda: [build_signal(par=p, ohlc_1h=m["1h"], ohlc_4h=m["4h"], mark_price=m["mark"],
+                                                      gain_min_pct=2.0, assert_min_pct=55.0)
+                                         for p, m in mkt.items()],
+        "worker_pro.build_payload": lambda: worker_pro.build_payload(),
+        "audit_top10.run_audit_top10": lambda: (_audit_top10_setup(data_dir, mkt),
+                                                audit_top10.run_audit_top10(data_dir=str(data_dir))),
+        "audit_report.main": _audit_report,
+    }
+    units = {"audit_top10.run_audit_top10": coins, "audit_report.main": cfg["audit_days"]}
+
+    out: List[Dict[str, Any]] = []
+    for name, fn in cases.items():
+        if only and not any(o in name for o in only):
+            continue
+        params = {"coins": coins, "bars": bars}
+        if name == "audit_report.main":
+            for f in audit_dir.glob("*"):
+                f.unlink()
+            _gen_history(audit_dir, coins=cfg["audit_coins"], days=cfg["audit_days"],
+                         signals_per_day=6, seed=seed)
+            params = {"coins": cfg["audit_coins"], "days": cfg["audit_days"]}
+        best = _best_of(fn, repeat)
+        n = units.get(name, coins)
+        out.append({"bench": name, "size": size, "params": params, "best_s": round(best, 6),
+                    "per_unit_ms": round(best / max(1, n) * 1000.0, 6)})
+        print(f"[{size}] {name:<30} {best * 1000:10.1f} ms")
+    return out
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=WORKER_DIR, capture_output=True,
+                              text=True, timeout=5).stdout.strip()
+    except Exception:
+        return ""
+
+
+# ---------- verificações de comportamento (--check) ----------
+def _check_tiers() -> None:
+    """NÃO ENTRAR logo abaixo dos mínimos é hot (pelos valores brutos); longe deles, cold."""
+    def _ne(par: str, ganho: float, assert_pct: float) -> Dict[str, Any]:
+        it = worker_pro._mk_item(par=par, side="NÃO ENTRAR", atual=1.0, alvo=1.0, ganho_pct=ganho,
+                                 assert_pct=assert_pct, data="", hora="", prazo="-", price_source="BYBIT",
+                                 ttl_expira_em="")
+        return dict(it, _ganho_raw=ganho, _assert_raw=assert_pct)
+
+    got = classify([_ne("NEAR", 1.9, 64.0), _ne("FAR", 0.4, 20.0)], top10=[], open_pars=set(),
+                   gain_min=2.0, assert_min=65.0)
+    if got != {"NEAR": HOT, "FAR": COLD}:
+        raise SystemExit(f"tiers: {got}")
+
+
+def _check_stale() -> None:
+    """Stale velho demais vira NÃO ENTRAR; stale dentro do limite fica, mas abaixo dos frescos no TOP10."""
+    def _long(par: str, assert_pct: float, stale_age_s: int = -1) -> Dict[str, Any]:
+        it = worker_pro._mk_item(par=par, side="LONG", atual=1.0, alvo=1.1, ganho_pct=3.0, assert_pct=assert_pct,
+                                 data="", hora="", prazo="4h", price_source="BYBIT", ttl_expira_em="")
+        return dict(it, stale=True, stale_age_s=stale_age_s) if stale_age_s >= 0 else it
+
+    items = worker_pro._expire_stale([_long("OLD", 95.0, 7200), _long("STALE", 90.0, 600), _long("FRESH", 70.0)], 1800)
+    if items[0]["side"] != "NÃO ENTRAR" or items[0]["ganho_pct"] != 0.0:
+        raise SystemExit(f"stale expirado: {items[0]}")
+    order = [x["par"] for x in worker_pro.build_top10({"items": items})["items"]]
+    if order != ["FRESH", "STALE"]:
+        raise SystemExit(f"top10 com stale: {order}")
+
+
+def _check_delta() -> None:
+    """apply_patch(prev, diff_payload(prev, cur)) == cur, com campos sumindo de item/todos/topo."""
+    rnd = random.Random(7)
+    keys = ("atual", "hora", "funding_rate_pct", "basis_pct", "stale_age_s", "price_diverged")
+
+    def _payload() -> Dict[str, Any]:
+        uni = {k: rnd.choice((1, 2)) for k in keys if rnd.random() < 0.3}
+        items = []
+        for par in sorted(rnd.sample(["BTC", "ETH", "SOL", "XRP", "ADA", "DOGE"], rnd.randint(1, 6))):
+            it = {"par": par, **uni}
+            it.update({k: rnd.choice((0, 1, 2)) for k in keys if k not in uni and rnd.random() < 0.6})
+            items.append(it)
+        top = {k: rnd.choice((1, 2)) for k in ("ok", "tiers", "shards") if rnd.random() < 0.6}
+        return {**top, "items": items}
+
+    prev = _payload()
+    for seq in range(1, 2001):
+        cur = _payload()
+        got = apply_patch(prev, diff_payload(prev, cur, seq))
+        got.pop("seq", None)
+        if got != cur:
+            raise SystemExit(f"delta: {prev} -> {cur} deu {got}")
+        prev = cur
+
+
+def _check_encoding() -> None:
+    """Accept-Encoding por tokens com q-value (q=0 recusa; nada de substring)."""
+    cases = {"": "identity", "gzip, deflate, br": "br", "br;q=0, gzip": "gzip", "br;q=0": "identity",
+             "gzip;q=0.5, br;q=0.4": "gzip", "*": "br", "*;q=0": "identity", "abr, gzipx": "identity"}
+    for accept, want in cases.items():
+        got = pick_encoding(accept)
+        if got != want:
+            raise SystemExit(f"pick_encoding({accept!r}) = {got}, esperado {want}")
+
+
+CHECKS: Dict[str, Callable[[], None]] = {
+    "serve.pick_encoding": _check_encoding,
+    "delta.roundtrip": _check_delta,
+    "tiers.classify": _check_tiers,
+    "worker_pro.stale": _check_stale,
+}
+
+
+def run_checks() -> int:
+    for name, fn in CHECKS.items():
+        fn()
+        print(f"check ok: {name}")
+    return 0
+
+
+def _load_history(path: Path) -> List[Dict[str, Any]]:
+    try:
+        obj = json.loads(path.read_text(encoding="utf-8"))
+        return obj if isinstance(obj, list) else []
+    except Exception:
+        return []
+
+
+def _previous(history: List[Dict[str, Any]], bench: str, size: str) -> Optional[float]:
+    for run in reversed(history):
+        for r in run.get("results") or []:
+            if r.get("bench") == bench and r.get("size") == size:
+                return float(r["best_s"])
+    return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default="small,medium", help="lista separada por vírgula: " + ",".join(SIZES))
+    ap.add_argument("--repeat", type=int, default=3, help="melhor de N execuções")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--only", default="", help="filtra benchmarks pelo nome (substring, vírgulas)")
+    ap.add_argument("--history", type=Path, default=DEFAULT_HISTORY)
+    ap.add_argument("--no-save", action="store_true", help="não grava no histórico")
+    ap.add_argument("--fail-on-regression", type=float, default=0.0, metavar="PCT",
+                    help="sai com 1 se algum benchmark ficou PCT%% mais lento que a execução anterior")
+    ap.add_argument("--check", action="store_true", help="só roda as verificações de comportamento (CHECKS)")
+    args = ap.parse_args(argv)
+    if args.check:
+        return run_checks()
+
+    sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    for s in sizes:
+        if s not in SIZES:
+            ap.error(f"tamanho desconhecido: {s}")
+    only = [o.strip() for o in args.only.split(",") if o.strip()] or None
+
+    results: List[Dict[str, Any]] = []
+    for s in sizes:
+        results.extend(run_size(s, repeat=args.repeat, seed=args.seed, only=only))
+
+    history = _load_history(args.history)
+    regressions = []
+    print(f"\n{'benchmark':<30} {'tamanho':<8} {'atual (ms)':>12} {'anterior':>12} {'variação':>9}")
+    for r in results:
+        prev = _previous(history, r["bench"], r["size"])
+        cur = r["best_s"]
+        prev_ms = f"{prev * 1000:12.1f}" if prev else f"{'-':>12}"
+        delta = f"{(cur / prev - 1) * 100:+8.1f}%" if prev else f"{'-':>9}"
+        print(f"{r['bench']:<30} {r['size']:<8} {cur * 1000:12.1f} {prev_ms} {delta}")
+        if prev and args.fail_on_regression > 0 and cur > prev * (1 + args.fail_on_regression / 100.0):
+            regressions.append(r)
+
+    if not args.no_save:
+        history.append({
+            "ts": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "results": results,
+        })
+        args.history.write_text(json.dumps(history, indent=1, ensure_ascii=False), encoding="utf-8")
+        print(f"\nhistórico: {args.history} ({len(history)} execuções)")
+
+    if regressions:
+        print(f"REGRESSÃO > {args.fail_on_regression:.0f}%: " + ", ".join(f"{r['bench']}[{r['size']}]" for r in regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
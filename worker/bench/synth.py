@@ -0,0 +1,72 @@
+"""
+Dados de mercado sintéticos e determinísticos (seed) para os benchmarks.
+
+GBM (random walk log-normal) com regimes de volatilidade: a cada candle há
+uma pequena chance de trocar de regime (calmo / normal / agitado), o que
+produz trechos de tendência e de lateralização parecidos com o mercado real
+— o suficiente para exercitar EMA/RSI/ATR e o mfe_mae_assert sem rede.
+"""
+
+from __future__ import annotations
+
+import math
+import random
+from typing import Dict, List, Sequence, Tuple
+
+# (vol por candle, drift por candle) de cada regime
+REGIMES: Sequence[Tuple[float, float]] = (
+    (0.003, 0.0000),   # calmo
+    (0.008, 0.0004),   # tendência
+    (0.020, -0.0006),  # agitado
+)
+SWITCH_P = 0.02
+
+
+def gbm_ohlc(n_bars: int, *, seed: int, start: float = 100.0, vol_scale: float = 1.0) -> List[List[float]]:
+    """n_bars candles [o, h, l, c] (mais velho -> mais novo), mesmo formato de engine/exchanges.
+    vol_scale: 2.0 ~ candles de 4h a partir dos regimes de 1h (sqrt(4))."""
+    rnd = random.Random(seed)
+    regime = rnd.randrange(len(REGIMES))
+    px = float(start)
+    out: List[List[float]] = []
+    for _ in range(int(n_bars)):
+        if rnd.random() < SWITCH_P:
+            regime = rnd.randrange(len(REGIMES))
+        vol, drift = REGIMES[regime]
+        vol *= vol_scale
+        o = px
+        px *= math.exp(drift - 0.5 * vol * vol + rnd.gauss(0.0, vol))
+        # pavios: excursão intra-candle além do corpo
+        h = max(o, px) * (1.0 + abs(rnd.gauss(0.0, vol * 0.5)))
+        lo = min(o, px) * (1.0 - min(0.5, abs(rnd.gauss(0.0, vol * 0.5))))
+        out.append([o, h, lo, px])
+    return out
+
+
+def mark_from(ohlc: List[List[float]], *, seed: int, spread: float = 0.0005) -> float:
+    """Mark price perto do último close (ruído de até `spread`)."""
+    rnd = random.Random(seed)
+    return float(ohlc[-1][3]) * (1.0 + rnd.uniform(-spread, spread))
+
+
+def coin_names(n_coins: int) -> List[str]:
+    return [f"C{i:04d}" for i in range(int(n_coins))]
+
+
+def market(n_coins: int, n_bars: int, *, seed: int, distinct: int = 64) -> Dict[str, Dict]:
+    """{PAR: {"1h": ohlc, "4h": ohlc, "mark": px}} para n_coins moedas.
+    Só `distinct` séries são geradas e repetidas entre as moedas (1000 moedas x
+    5000 candles inteiras não cabem bem em memória; o custo do cálculo é o mesmo)."""
+    rnd = random.Random(seed)
+    series = []
+    for j in range(max(1, min(int(n_coins), int(distinct)))):
+        start = 10.0 ** rnd.uniform(-3, 4)
+        series.append((
+            gbm_ohlc(n_bars, seed=seed * 1_000_003 + 2 * j, start=start),
+            gbm_ohlc(n_bars, seed=seed * 1_000_003 + 2 * j + 1, start=start, vol_scale=2.0),
+        ))
+    out: Dict[str, Dict] = {}
+    for i, par in enumerate(coin_names(n_coins)):
+        k1, k4 = series[i % len(series)]
+        out[par] = {"1h": k1, "4h": k4, "mark": mark_from(k1, seed=seed + i)}
+    return out
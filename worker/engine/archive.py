@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+"""engine/archive.py
+
+Arquivo histórico dos snapshots publicados (pro.json, top10.json), para
+responder "o que o painel mostrava ontem às 14:35?".
+
+Cada ciclo final vira um registro com diff POR ITEM contra o ciclo anterior,
+com keyframe (payload inteiro) a cada `keyframe_every` registros, no início de
+cada segmento diário e depois de todo restart:
+
+    DATA_DIR/archive/<stream>/<AAAA-MM-DD>.jsonl.gz   (dia em BRT)
+    DATA_DIR/archive/<stream>/<AAAA-MM-DD>.idx        "<t_ms> <offset> <k|d>" por registro
+
+Cada registro é um membro gzip próprio (o arquivo inteiro continua um .gz
+válido: zcat lê tudo); o índice guarda o offset de cada membro, então ler o
+snapshot de um instante = busca binária no índice + descomprimir do keyframe
+anterior até ele (no máximo keyframe_every registros).
+
+Registro:
+    {"t": ms, "k": {payload}}                          keyframe
+    {"t": ms, "m": {topo alterado}, "md": [topo removido],
+     "a": {campos iguais em todos os itens},
+     "u": {PAR: {campos alterados}}, "d": {PAR: [campos removidos]},
+     "r": [PAR removido], "o": [ordem dos PARs]}       diff (chaves vazias omitidas;
+                                                       "o" só quando a ordem muda)
+
+A reconstrução é exata (ordem do TOP10 inclusive), ao contrário dos patches do
+engine/delta que são para o painel ao vivo.
+"""
+
+import gzip
+import json
+import threading
+import time
+import zlib
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import DATA_DIR, TZ_BRT
+from .delta import KEY, _by_key, _uniform
+
+KEYFRAME_EVERY = 24  # 2h com ciclo de 5 min
+KEEP_DAYS = 90
+
+
+def _day(t_ms: int) -> str:
+    return datetime.fromtimestamp(t_ms / 1000.0, TZ_BRT).strftime("%Y-%m-%d")
+
+
+def _diff(prev: Dict[str, Any], cur: Dict[str, Any]) -> Dict[str, Any]:
+    rec: Dict[str, Any] = {}
+    m = {k: v for k, v in cur.items() if k != "items" and prev.get(k, object()) != v}
+    md = [k for k in prev if k != "items" and k not in cur]
+    items = list(cur.get("items") or [])
+    p_by, c_by = _by_key(list(prev.get("items") or [])), _by_key(items)
+    uni = _uniform(items)
+    u: Dict[str, Dict[str, Any]] = {}
+    d: Dict[str, List[str]] = {}
+    for par, it in c_by.items():
+        old = p_by.get(par) or {}
+        ch = {k: v for k, v in it.items() if k not in uni and old.get(k, object()) != v}
+        gone = [k for k in old if k not in it]
+        if ch or par not in p_by:
+            u[par] = ch  # item novo entra mesmo sem campo próprio (tudo em "a")
+        if gone:
+            d[par] = gone
+    order = [str(it.get(KEY)) for it in items]
+    for k, v in (("m", m), ("md", md), ("a", uni), ("u", u), ("d", d),
+                 ("r", [p for p in p_by if p not in c_by])):
+        if v:
+            rec[k] = v
+    if order != [str(it.get(KEY)) for it in prev.get("items") or []]:
+        rec["o"] = order
+    return rec
+
+
+def _apply(prev: Dict[str, Any], rec: Dict[str, Any]) -> Dict[str, Any]:
+    by = {k: dict(v) for k, v in _by_key(list(prev.get("items") or [])).items()}
+    for par in rec.get("r") or []:
+        by.pop(par, None)
+    for par, ch in (rec.get("u") or {}).items():
+        by.setdefault(par, {KEY: par}).update(ch)
+    for par, keys in (rec.get("d") or {}).items():
+        for k in keys:
+            by.get(par, {}).pop(k, None)
+    uni = rec.get("a") or {}
+    for it in by.values():
+        it.update(uni)
+    order = rec.get("o") or [str(it.get(KEY)) for it in prev.get("items") or []]
+    out = {k: v for k, v in prev.items() if k not in (rec.get("md") or ())}
+    out.update(rec.get("m") or {})
+    out["items"] = [by[p] for p in order if p in by]
+    return out
+
+
+class SnapshotArchive:
+    """Escrita (append) e leitura (at) do arquivo histórico. Um objeto por processo."""
+
+    def __init__(self, root: Optional[Path] = None, *, keyframe_every: int = KEYFRAME_EVERY,
+                 keep_days: int = KEEP_DAYS):
+        self.root = Path(root) if root is not None else Path(DATA_DIR) / "archive"
+        self.keyframe_every = max(1, int(keyframe_every))
+        self.keep_days = max(1, int(keep_days))
+        self._prev: Dict[str, Tuple[str, Dict[str, Any], int]] = {}  # stream -> (dia, payload, desde o keyframe)
+        self._lock = threading.Lock()
+
+    def _paths(self, stream: str, day: str) -> Tuple[Path, Path]:
+        base = self.root / stream
+        return base / f"{day}.jsonl.gz", base / f"{day}.idx"
+
+    # ---------- escrita ----------
+    def append(self, stream: str, payload: Dict[str, Any], t_ms: Optional[int] = None) -> None:
+        t_ms = int(time.time() * 1000) if t_ms is None else int(t_ms)
+        day = _day(t_ms)
+        with self._lock:
+            prev = self._prev.get(stream)
+            if prev is None or prev[0] != day or prev[2] + 1 >= self.keyframe_every:
+                rec, n = {"t": t_ms, "k": payload}, 0
+                if prev is None or prev[0] != day:
+                    self._prune(stream, day)
+            else:
+                rec, n = dict(_diff(prev[1], payload), t=t_ms), prev[2] + 1
+            seg, idx = self._paths(stream, day)
+            seg.parent.mkdir(parents=True, exist_ok=True)
+            data = gzip.compress(json.dumps(rec, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), mtime=0)
+            with seg.open("ab") as f:
+                off = f.tell()
+                f.write(data)
+            # índice depois do segmento: registro sem índice é só ignorado na leitura
+            with idx.open("a", encoding="utf-8") as f:
+                f.write(f"{t_ms} {off} {'k' if 'k' in rec else 'd'}\n")
+            self._prev[stream] = (day, payload, n)
+
+    def _prune(self, stream: str, today: str) -> None:
+        cutoff = (datetime.strptime(today, "%Y-%m-%d") - timedelta(days=self.keep_days)).strftime("%Y-%m-%d")
+        for p in (self.root / stream).glob("*.*"):
+            if p.name[:10] < cutoff:
+                try:
+                    p.unlink()
+                except OSError:
+                    pass
+
+    # ---------- leitura ----------
+    def days(self, stream: str) -> List[str]:
+        return sorted(p.name[:10] for p in (self.root / stream).glob("*.idx"))
+
+    def _index(self, stream: str, day: str) -> List[Tuple[int, int, bool]]:
+        out: List[Tuple[int, int, bool]] = []
+        try:
+            with self._paths(stream, day)[1].open("r", encoding="utf-8") as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) == 3:
+                        out.append((int(parts[0]), int(parts[1]), parts[2] == "k"))
+        except OSError:
+            pass
+        return out
+
+    def at(self, stream: str, t_ms: int) -> Optional[Dict[str, Any]]:
+        """Snapshot publicado em `t_ms` (o último registro com t <= t_ms), com "_archived_at" (ms)."""
+        t_ms = int(t_ms)
+        day = _day(t_ms)
+        for d in reversed([x for x in self.days(stream) if x <= day]):
+            index = self._index(stream, d)
+            i = bisect_right([r[0] for r in index], t_ms) - 1
+            if i >= 0:
+                return self._rebuild(stream, d, index, i)
+        return None
+
+    def _rebuild(self, stream: str, day: str, index: List[Tuple[int, int, bool]], i: int) -> Optional[Dict[str, Any]]:
+        k = i
+        while k >= 0 and not index[k][2]:
+            k -= 1
+        if k < 0:
+            return None  # diff sem keyframe (índice truncado): não dá para reconstruir
+        seg = self._paths(stream, day)[0]
+        payload: Optional[Dict[str, Any]] = None
+        with seg.open("rb") as f:
+            f.seek(index[k][1])
+            end = index[i + 1][1] if i + 1 < len(index) else None
+            blob = f.read() if end is None else f.read(end - index[k][1])
+        offs = [index[j][1] - index[k][1] for j in range(k, i + 1)] + [len(blob)]
+        for j in range(len(offs) - 1):
+            # só o primeiro membro do trecho (sobra de escrita interrompida fica em unused_data)
+            rec = json.loads(zlib.decompressobj(wbits=31).decompress(blob[offs[j]:offs[j + 1]]))
+            payload = rec["k"] if "k" in rec else _apply(payload or {}, rec)
+        if payload is not None:
+            payload = dict(payload, _archived_at=index[i][0])
+        return payload
+
+    def size_bytes(self, stream: str) -> int:
+        return sum(p.stat().st_size for p in (self.root / stream).glob("*.*"))
@@ -1,10 +1,17 @@
 from __future__ import annotations
 
 import json
+import os
+import queue
+import threading
 from pathlib import Path
-from typing import Any, Dict, Iterable, Optional
+from typing import Any, Dict, Iterable, List, Optional
 
 from .config import DATA_DIR, now_brt_str, GAIN_MIN_PCT
+from .pricecol import PriceColumnWriter
+
+# formatos do histórico de preços: "jsonl" (padrão), "bin" (engine/pricecol) ou "both"
+PRICE_FORMATS = ("jsonl", "bin", "both")
 
 
 def _audit_dir() -> Path:
@@ -13,29 +20,40 @@ def _audit_dir() -> Path:
     return d
 
 
-def _append_jsonl(path: Path, obj: Dict[str, Any]) -> None:
-    # JSONL: 1 objeto por linha
-    line = json.dumps(obj, ensure_ascii=False)
+def _append_lines(path: Path, lines: List[str], *, fsync: bool = False) -> None:
+    # JSONL: 1 objeto por linha; o lote inteiro sai num único write/append
+    if not lines:
+        return
     with path.open("a", encoding="utf-8") as f:
-        f.write(line + "\n")
+        f.write("".join(lines))
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+
 
+def _jsonl(obj: Dict[str, Any]) -> str:
+    return json.dumps(obj, ensure_ascii=False) + "\n"
 
-def log_prices(items: Iterable[Dict[str, Any]], *, updated_at: str) -> None:
+
+def log_prices(items: Iterable[Dict[str, Any]], *, updated_at: str,
+               now_brt: Optional[str] = None, fsync: bool = False) -> int:
     """
     Salva preços (ATUAL) para cada moeda a cada atualização.
     Usado para auditoria de acerto por janelas (30m/4h/24h).
+    Retorna o número de linhas gravadas.
     """
-    now_brt = now_brt_str()  # "YYYY-MM-DD HH:MM"
+    now_brt = now_brt or now_brt_str()  # "YYYY-MM-DD HH:MM" (rotação diária pelo dia)
     d, h = now_brt.split(" ", 1)
     out = _audit_dir() / f"prices_{d}.jsonl"
 
+    lines: List[str] = []
     for it in items:
         try:
             par = str(it.get("par") or "").strip()
             atual = float(it.get("atual") or 0.0)
             if not par or atual <= 0:
                 continue
-            _append_jsonl(out, {
+            lines.append(_jsonl({
                 "date": d,
                 "hora": h,
                 "ts_brt": now_brt,
@@ -43,22 +61,52 @@ def log_prices(items: Iterable[Dict[str, Any]], *, updated_at: str) -> None:
                 "par": par,
                 "atual": atual,
                 "price_source": it.get("price_source") or "",
-            })
+            }))
         except Exception:
             # auditoria nunca pode derrubar o worker
             continue
 
+    _append_lines(out, lines, fsync=fsync)
+    return len(lines)
+
+
+def log_prices_bin(items: Iterable[Dict[str, Any]], *, writer: Optional[PriceColumnWriter] = None,
+                   now_brt: Optional[str] = None, fsync: bool = False) -> int:
+    """
+    Mesmo conteúdo de log_prices (par + ATUAL), no formato binário de
+    engine/pricecol (prices_YYYY-MM-DD.bin, 16 bytes por moeda).
+    """
+    now_brt = now_brt or now_brt_str()
+    d = now_brt.split(" ", 1)[0]
+    writer = writer or PriceColumnWriter(_audit_dir())
+
+    rows = []
+    for it in items:
+        try:
+            par = str(it.get("par") or "").strip()
+            atual = float(it.get("atual") or 0.0)
+            if not par or atual <= 0:
+                continue
+            rows.append((par, atual))
+        except Exception:
+            continue
+
+    return writer.append(d, now_brt, rows, fsync=fsync)
 
-def log_signals(items: Iterable[Dict[str, Any]], *, updated_at: str, gain_min_pct: Optional[float] = None) -> None:
+
+def log_signals(items: Iterable[Dict[str, Any]], *, updated_at: str, gain_min_pct: Optional[float] = None,
+                now_brt: Optional[str] = None, fsync: bool = False) -> int:
     """
     Salva apenas sinais válidos (LONG/SHORT e ganho >= mínimo).
+    Retorna o número de linhas gravadas.
     """
-    now_brt = now_brt_str()
+    now_brt = now_brt or now_brt_str()
     d, h = now_brt.split(" ", 1)
     out = _audit_dir() / f"signals_{d}.jsonl"
 
     gmin = float(GAIN_MIN_PCT if gain_min_pct is None else gain_min_pct)
 
+    lines: List[str] = []
     for it in items:
         try:
             side = str(it.get("side") or "").upper()
@@ -68,7 +116,7 @@ def log_signals(items: Iterable[Dict[str, Any]], *, updated_at: str, gain_min_pc
             if ganho < gmin:
                 continue
 
-            _append_jsonl(out, {
+            lines.append(_jsonl({
                 "date": d,
                 "hora": h,
                 "ts_brt": now_brt,
@@ -84,6 +132,70 @@ def log_signals(items: Iterable[Dict[str, Any]], *, updated_at: str, gain_min_pc
                 "risco": it.get("risco") or "",
                 "prioridade": it.get("prioridade") or "",
                 "price_source": it.get("price_source") or "",
-            })
+            }))
         except Exception:
             continue
+
+    _append_lines(out, lines, fsync=fsync)
+    return len(lines)
+
+
+class AuditRecorder:
+    """
+    Grava preços/sinais de cada ciclo numa thread própria, fora do caminho
+    crítico do worker. submit() só enfileira; se o disco travar e a fila
+    encher, o lote é descartado (auditoria nunca segura o ciclo).
+    """
+
+    def __init__(self, *, fsync: bool = False, max_pending: int = 8, price_format: str = "jsonl"):
+        self.fsync = bool(fsync)
+        self.price_format = price_format if price_format in PRICE_FORMATS else "jsonl"
+        self.dropped = 0
+        self._bin: Optional[PriceColumnWriter] = None
+        self._q: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max(1, int(max_pending)))
+        self._t = threading.Thread(target=self._run, name="audit-recorder", daemon=True)
+        self._t.start()
+
+    def submit(self, *, prices: Iterable[Dict[str, Any]], signals: Iterable[Dict[str, Any]],
+               updated_at: str, gain_min_pct: Optional[float] = None, now_brt: Optional[str] = None) -> bool:
+        # o dia do arquivo é o do ciclo (capturado agora), não o da gravação
+        batch = {
+            "prices": list(prices),
+            "signals": list(signals),
+            "updated_at": updated_at,
+            "gain_min_pct": gain_min_pct,
+            "now_brt": now_brt or now_brt_str(),
+        }
+        try:
+            self._q.put_nowait(batch)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def close(self, timeout: float = 5.0) -> None:
+        try:
+            self._q.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._t.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            batch = self._q.get()
+            if batch is None:
+                return
+            try:
+                if self.price_format in ("jsonl", "both"):
+                    log_prices(batch["prices"], updated_at=batch["updated_at"],
+                               now_brt=batch["now_brt"], fsync=self.fsync)
+                if self.price_format in ("bin", "both"):
+                    if self._bin is None:
+                        self._bin = PriceColumnWriter(_audit_dir())
+                    log_prices_bin(batch["prices"], writer=self._bin,
+                                   now_brt=batch["now_brt"], fsync=self.fsync)
+                log_signals(batch["signals"], updated_at=batch["updated_at"],
+                            gain_min_pct=batch["gain_min_pct"], now_brt=batch["now_brt"], fsync=self.fsync)
+            except Exception:
+                # auditoria nunca pode derrubar o worker
+                continue
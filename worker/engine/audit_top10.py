@@ -22,8 +22,11 @@ from pathlib import Path
 from typing import Any, Dict, List, Optional
 from zoneinfo import ZoneInfo
 
+from .config import load_settings
 from .io import atomic_write_json
 from .exchanges import fetch_mark_price
+from .instruments import get_instruments, resolve_symbol
+from .tickers import configure_tickers
 
 TZ_BRT = ZoneInfo("America/Sao_Paulo")
 
@@ -99,17 +102,9 @@ def _append_jsonl(path: Path, obj: Dict[str, Any]) -> None:
         f.write(line + "\n")
 
 
-def _sym(par: str) -> str:
-    """Mesmo mapeamento do worker_pro.py (moedas muito baratas)."""
-    p = (par or "").upper().strip()
-    mult = {
-        "BONK": "1000BONK",
-        "FLOKI": "1000FLOKI",
-        "PEPE": "1000PEPE",
-        "SHIB": "1000SHIB",
-    }
-    base = mult.get(p, p)
-    return f"{base}USDT"
+def _sym(par: str, source: str = "BYBIT") -> Optional[str]:
+    """Mesmo mapeamento do worker_pro.py (engine/instruments); None = PAR não listado."""
+    return resolve_symbol(par, source)
 
 
 def _audit_id(par: str, side: str, entrada: float, alvo: float, ttl: str) -> str:
@@ -193,6 +188,7 @@ def run_audit_top10(*, data_dir: str, api_source: str = "BYBIT", max_last_closed
     """
     data_dir = data_dir or "/opt/ENTRADA-PRO/data"
     audit_dir = _audit_dir(data_dir)
+    get_instruments().refresh_if_due()  # 1x/dia; símbolos e multiplicadores por exchange
 
     top10 = _read_json(Path(data_dir) / "top10.json", default={})
     items = list((top10 or {}).get("items") or [])
@@ -253,6 +249,12 @@ def run_audit_top10(*, data_dir: str, api_source: str = "BYBIT", max_last_closed
             continue
 
     # ---------- ATUALIZA OPEN / FECHA ----------
+    # tickers em lote só quando há sinal aberto para precificar (mesmas settings de
+    # preço do worker); fora do snapshot (ou sem bulk_tickers): mark por símbolo
+    board = configure_tickers(load_settings()) if open_by_id else None
+    if board is not None:
+        board.refresh()
+
     new_open: List[Dict[str, Any]] = []
     closed_cycle: List[Dict[str, Any]] = []
     win = loss = expired = 0
@@ -266,8 +268,10 @@ def run_audit_top10(*, data_dir: str, api_source: str = "BYBIT", max_last_closed
             inv = float(s.get("invalidado") or 0.0)
             ttl_utc = _parse_iso_z(str(s.get("ttl_expira_em") or ""))
 
-            symbol = _sym(par)
-            px = float(fetch_mark_price(symbol, source=api_source, timeout=8) or 0.0)
+            symbol = _sym(par, api_source)
+            px = board.price_in(par, api_source) if (symbol and board is not None) else 0.0
+            if px <= 0 and symbol:
+                px = float(fetch_mark_price(symbol, source=api_source, timeout=8) or 0.0)
             if px <= 0:
                 new_open.append(s)
                 continue
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+"""engine/cache.py
+
+Cache "stale-while-revalidate" do último dado BOM de cada moeda (mark price e
+klines por intervalo), em memória; vai para o disco dentro do checkpoint
+(engine/state: to_json/load_json).
+
+- Busca OK -> put_*(): atualiza o cache e zera o backoff da chave.
+- Busca falhou -> get_*() devolve o último valor bom se ainda estiver dentro
+  do limite de idade (max_age_s), e revalidate() agenda nova tentativa numa
+  thread de fundo. O cálculo do ciclo segue com o dado levemente velho.
+- Chave em backoff (falhou há pouco): o worker nem tenta de novo no caminho
+  crítico; usa o cache e deixa a revalidação de fundo tentar (evita tempestade
+  de retries quando uma exchange soluça).
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# idade máxima (s) aceita para servir um dado antigo
+DEFAULT_MAX_AGE_S = {"mark": 900.0, "1h": 3600.0, "4h": 4 * 3600.0}
+
+BACKOFF_MIN_S = 30.0
+BACKOFF_MAX_S = 600.0
+
+Key = Tuple[str, str]  # ("mark", símbolo) | (intervalo, símbolo)
+
+
+class LastGoodCache:
+    def __init__(self, *, max_age_s: Optional[Dict[str, float]] = None, workers: int = 2):
+        self.max_age_s = dict(DEFAULT_MAX_AGE_S)
+        self.max_age_s.update({k: float(v) for k, v in (max_age_s or {}).items()})
+        self._data: Dict[Key, Tuple[Any, str, float]] = {}  # valor, fonte, ts (epoch)
+        self._fails: Dict[Key, Tuple[int, float]] = {}      # falhas seguidas, próxima tentativa
+        self._inflight: set = set()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix="revalidate")
+
+    # ---------- leitura / escrita ----------
+    def put(self, key: Key, value: Any, src: str) -> None:
+        with self._lock:
+            self._data[key] = (value, src, time.time())
+            self._fails.pop(key, None)
+
+    def get(self, key: Key) -> Optional[Tuple[Any, str, float]]:
+        """(valor, fonte, idade_s) se existir e estiver dentro do limite do tipo."""
+        with self._lock:
+            hit = self._data.get(key)
+        if hit is None:
+            return None
+        age = max(0.0, time.time() - hit[2])
+        if age > self.max_age_s.get(key[0], 0.0):
+            return None
+        return hit[0], hit[1], age
+
+    def put_mark(self, symbol: str, px: float, src: str) -> None:
+        self.put(("mark", symbol), float(px), src)
+
+    def get_mark(self, symbol: str) -> Optional[Tuple[float, str, float]]:
+        return self.get(("mark", symbol))
+
+    def put_klines(self, symbol: str, interval: str, kl: List[List[float]], src: str) -> None:
+        self.put((interval, symbol), kl, src)
+
+    def get_klines(self, symbol: str, interval: str) -> Optional[Tuple[List[List[float]], str, float]]:
+        return self.get((interval, symbol))
+
+    # ---------- falhas / revalidação ----------
+    def backing_off(self, key: Key) -> bool:
+        with self._lock:
+            f = self._fails.get(key)
+        return f is not None and time.time() < f[1]
+
+    def fail(self, key: Key) -> None:
+        with self._lock:
+            n = self._fails.get(key, (0, 0.0))[0] + 1
+            wait = min(BACKOFF_MAX_S, BACKOFF_MIN_S * (2 ** (n - 1)))
+            self._fails[key] = (n, time.time() + wait)
+
+    def revalidate(self, key: Key, fetch: Callable[[], Tuple[Any, str]]) -> None:
+        """Agenda UMA busca de fundo por chave; fetch() devolve (valor, fonte) ou valor vazio."""
+        with self._lock:
+            if key in self._inflight:
+                return
+            self._inflight.add(key)
+
+        def _run() -> None:
+            try:
+                value, src = fetch()
+                if value:
+                    self.put(key, value, src)
+                else:
+                    self.fail(key)
+            except Exception:
+                self.fail(key)
+            finally:
+                with self._lock:
+                    self._inflight.discard(key)
+
+        self._pool.submit(_run)
+
+    # ---------- disco ----------
+    def to_json(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = [[k[0], k[1], v, src, ts] for k, (v, src, ts) in self._data.items()]
+        return {"version": 1, "rows": rows}
+
+    def load_json(self, obj: Dict[str, Any]) -> int:
+        n = 0
+        if not isinstance(obj, dict) or obj.get("version") != 1:
+            return n
+        with self._lock:
+            for row in obj.get("rows") or []:
+                try:
+                    kind, symbol, value, src, ts = row
+                    self._data[(str(kind), str(symbol))] = (value, str(src), float(ts))
+                    n += 1
+                except Exception:
+                    continue
+        return n
@@ -11,10 +11,11 @@ Objetivo: gerar os campos do JSON de forma consistente e aplicar as regras:
 Obs: este arquivo NÃO depende do painel/API; é só cálculo do worker.
 """
 
+import threading
 from dataclasses import dataclass
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 
-from .indicators import ema, rsi, atr
+from .registry import Frame
 
 
 @dataclass
@@ -53,11 +54,13 @@ def _atr_last(ohlc: List[List[float]], period: int = 14) -> float:
     """ATR último valor a partir de lista [o,h,l,c]."""
     if not ohlc or len(ohlc) < period + 2:
         return 0.0
-    highs = [x[1] for x in ohlc]
-    lows = [x[2] for x in ohlc]
-    closes = [x[3] for x in ohlc]
-    a = atr(highs, lows, closes, period=period)
-    return float(a[-1]) if a else 0.0
+    return _frame_atr(Frame(ohlc), period)
+
+
+def _frame_atr(f: Frame, period: int = 14) -> float:
+    if len(f("close")) < period + 2:
+        return 0.0
+    return f.last("atr", period)
 
 
 def _fmt_prazo(hours: float) -> str:
@@ -70,11 +73,18 @@ def _fmt_prazo(hours: float) -> str:
 
 def direction_from_indicators(closes: List[float]) -> Tuple[str, float]:
     """Retorna (side, strength 0..1)"""
+    return direction_from_frame(Frame.from_closes(closes))
+
+
+def direction_from_frame(f: Frame) -> Tuple[str, float]:
+    """direction_from_indicators sobre um Frame (engine/registry): EMAs/RSI saem
+    dos nós memoizados, compartilhados com ATR e o que mais for pedido."""
+    closes = f("close")
     if not closes or len(closes) < 60:
         return ("NÃO ENTRAR", 0.0)
-    e20 = ema(closes, 20)
-    e50 = ema(closes, 50)
-    rs = rsi(closes, 14)
+    e20 = f("ema", "close", 20)
+    e50 = f("ema", "close", 50)
+    rs = f("rsi", 14)
     if not e20 or not e50 or not rs:
         return ("NÃO ENTRAR", 0.0)
 
@@ -119,9 +129,58 @@ def compute_target_price(atual: float, atr_val: float, side: str, gain_min_pct:
     return float(atual)
 
 
-def mfe_mae_assert(ohlc: List[List[float]], side: str, target_dist: float, atr_val: float, lookahead: int = 12) -> float:
+# Tabela por moeda para o mfe_mae_assert: para cada candle FECHADO i com janela
+# completa, (close_i, máx. high, mín. low) dos `lookahead` candles seguintes.
+# Só depende de candles fechados -> entre um fechamento de 4h e outro a tabela é
+# a mesma; quando fecha um candle novo a série desliza 1 posição e só as linhas
+# que tocam o candle novo são calculadas. O que muda a cada ciclo (mark ->
+# target_dist, ATR com o candle em formação) é só o filtro aplicado às linhas.
+Row = Tuple[float, float, float]
+
+_ASSERT_TABLES: Dict[Tuple[str, int], Tuple[List[List[float]], List[Row]]] = {}
+_ASSERT_LOCK = threading.Lock()
+_MAX_SHIFT = 4  # candles novos entre duas chamadas que ainda aproveitam a tabela
+
+
+def _window_rows(closed: List[List[float]], lookahead: int,
+                 prev: Optional[Tuple[List[List[float]], List[Row]]] = None) -> List[Row]:
+    n = len(closed)
+    m = max(0, n - lookahead)  # i + lookahead <= n - 1
+    rows: List[Optional[Row]] = [None] * m
+    if prev is not None and len(prev[0]) == n:
+        p_closed, p_rows = prev
+        for s in range(_MAX_SHIFT + 1):
+            # linha i só depende de closed[i..i+lookahead]: igual à linha i+s da tabela anterior
+            if closed[: n - s] == p_closed[s:]:
+                for i in range(max(0, m - s)):
+                    rows[i] = p_rows[i + s]
+                break
+    for i in range(m):
+        if rows[i] is None:
+            window = closed[i + 1 : i + 1 + lookahead]
+            rows[i] = (closed[i][3], max(x[1] for x in window), min(x[2] for x in window))
+    return rows  # type: ignore[return-value]
+
+
+def _assert_rows(ohlc: List[List[float]], lookahead: int, key: Optional[str]) -> List[Row]:
+    closed = ohlc[:-1]  # o último candle ainda está em formação
+    if key is None:
+        return _window_rows(closed, lookahead)
+    with _ASSERT_LOCK:
+        prev = _ASSERT_TABLES.get((key, lookahead))
+    if prev is not None and prev[0] == closed:
+        return prev[1]
+    rows = _window_rows(closed, lookahead, prev)
+    with _ASSERT_LOCK:
+        _ASSERT_TABLES[(key, lookahead)] = (closed, rows)
+    return rows
+
+
+def mfe_mae_assert(ohlc: List[List[float]], side: str, target_dist: float, atr_val: float, lookahead: int = 12,
+                   key: Optional[str] = None) -> float:
     """Assertividade histórica leve (0..100) usando janela de lookahead.
     Não precisa ser perfeito; precisa ser estável e numérico.
+    `key` (ex.: o PAR) guarda a tabela de MFE/MAE por candle entre chamadas.
     """
     if side not in ("LONG", "SHORT"):
         return 0.0
@@ -134,26 +193,17 @@ def mfe_mae_assert(ohlc: List[List[float]], side: str, target_dist: float, atr_v
 
     start = max(60, len(ohlc) - 180)
     end = len(ohlc) - lookahead - 1
-    for i in range(start, end):
-        entry = ohlc[i][3]
-        window = ohlc[i + 1 : i + 1 + lookahead]
-        if not window:
-            continue
-
-        if side == "LONG":
-            max_high = max(x[1] for x in window)
-            min_low = min(x[2] for x in window)
-            mfe = max_high - entry
-            mae = entry - min_low
-            if mae <= mae_limit and mfe >= target_dist:
+    rows = _assert_rows(ohlc, lookahead, key)
+    if side == "LONG":
+        for entry, max_high, min_low in rows[start:end]:
+            # mfe = max_high - entry ; mae = entry - min_low
+            if entry - min_low <= mae_limit and max_high - entry >= target_dist:
                 successes += 1
             total += 1
-        else:
-            min_low = min(x[2] for x in window)
-            max_high = max(x[1] for x in window)
-            mfe = entry - min_low
-            mae = max_high - entry
-            if mae <= mae_limit and mfe >= target_dist:
+    else:
+        for entry, max_high, min_low in rows[start:end]:
+            # mfe = entry - min_low ; mae = max_high - entry
+            if max_high - entry <= mae_limit and entry - min_low >= target_dist:
                 successes += 1
             total += 1
 
@@ -192,21 +242,36 @@ def classify_qualitatives(strength: float, atr_pct: float, gain_pct: float) -> T
     return zona, risco, prioridade
 
 
-def build_signal(
-    par: str,
-    ohlc_1h,
-    ohlc_4h,
-    mark_price: float,
-    gain_min_pct: float,
-    assert_min_pct: float,
-) -> Signal:
-    """Calcula sinal + métricas conforme as regras do projeto (SEM 'NÃO ENTRAR')."""
+def _market_blocks(market: Dict, side: str, max_funding_pct: float, min_turnover_usdt: float) -> bool:
+    funding = market.get("funding_rate_pct")
+    if max_funding_pct > 0 and funding is not None:
+        if (side == "LONG" and funding >= max_funding_pct) or (side == "SHORT" and funding <= -max_funding_pct):
+            return True
+    turnover = market.get("turnover_24h_usdt")
+    return min_turnover_usdt > 0 and turnover is not None and turnover < min_turnover_usdt
+
+
+@dataclass
+class PreparedSignal:
+    """Parte do sinal que NÃO depende dos limiares (direção, ATR, preço atual):
+    calculada 1x por moeda/ciclo e reaproveitada por todos os perfis."""
+    par: str
+    side: str
+    atual: float
+    atr_val: float
+    ohlc_4h: List[List[float]]
+
+
+def prepare_signal(par: str, ohlc_1h, ohlc_4h, mark_price: float) -> Optional[PreparedSignal]:
+    """Direção + ATR de uma moeda; None quando não há preço possível."""
 
     # FALLBACK B: se mark_price falhar, usa último close do 4h (senão 1h)
     o1 = _to_ohlc_list(ohlc_1h)
     o4 = _to_ohlc_list(ohlc_4h)
-    c1 = _closes(o1)
-    c4 = _closes(o4)
+    # 1 Frame por timeframe: colunas/diffs/TR calculados 1x e compartilhados (engine/registry)
+    f1, f4 = Frame(o1), Frame(o4)
+    c1 = f1("close")
+    c4 = f4("close")
 
     atual = float(mark_price or 0.0)
     if atual <= 0:
@@ -215,19 +280,16 @@ def build_signal(
         elif c1:
             atual = float(c1[-1])
         else:
-            # Sem preço possível -> mantém numérico estável, mas SEM 'NÃO ENTRAR'
-            return Signal(par, "LONG", 0.0, 0.0, 0.0, 0.0, "-", "", "", "")
+            return None
 
-    side_1h, s1 = direction_from_indicators(c1) if c1 else ("NÃO ENTRAR", 0.0)
-    side_4h, s4 = direction_from_indicators(c4) if c4 else ("NÃO ENTRAR", 0.0)
+    side_1h, s1 = direction_from_frame(f1) if c1 else ("NÃO ENTRAR", 0.0)
+    side_4h, s4 = direction_from_frame(f4) if c4 else ("NÃO ENTRAR", 0.0)
 
     # SIDE SEMPRE definido (1 linha por moeda):
     if side_4h in ("LONG", "SHORT"):
         side_candidate = side_4h
-        strength = float(s4)
     elif side_1h in ("LONG", "SHORT"):
         side_candidate = side_1h
-        strength = float(s1)
     else:
         # fallback simples quando os indicadores não definirem direção
         if len(c4) >= 2:
@@ -236,17 +298,34 @@ def build_signal(
             side_candidate = "LONG" if c1[-1] >= c1[-2] else "SHORT"
         else:
             side_candidate = "LONG"
-        strength = 0.0
 
     # ATR (usa 4h como principal)
-    atr_val = _atr_last(o4, 14) if o4 else 0.0
+    atr_val = _frame_atr(f4, 14) if o4 else 0.0
     if atr_val <= 0:
-        atr_val = _atr_last(o1, 14) if o1 else 0.0
+        atr_val = _frame_atr(f1, 14) if o1 else 0.0
 
     # Se ATR falhar, usa fallback proporcional (evita alvo=atual sempre)
     if atr_val <= 0 and atual > 0:
         atr_val = atual * 0.003  # 0.30% do preço (mínimo estável)
 
+    return PreparedSignal(par=par, side=side_candidate, atual=atual, atr_val=atr_val, ohlc_4h=o4)
+
+
+def finish_signal(
+    prep: Optional[PreparedSignal],
+    par: str,
+    gain_min_pct: float,
+    assert_min_pct: float,
+    market: Optional[Dict] = None,
+    max_funding_pct: float = 0.0,
+    min_turnover_usdt: float = 0.0,
+) -> Signal:
+    """Parte do sinal que depende dos limiares (alvo, ganho, assert, filtros)."""
+    if prep is None:
+        # Sem preço possível -> mantém numérico estável, mas SEM 'NÃO ENTRAR'
+        return Signal(par, "LONG", 0.0, 0.0, 0.0, 0.0, "-", "", "", "")
+    atual, atr_val, side_candidate, o4 = prep.atual, prep.atr_val, prep.side, prep.ohlc_4h
+
     alvo = compute_target_price(atual, atr_val, side_candidate, gain_min_pct)
     alvo = float(alvo)
 
@@ -254,10 +333,12 @@ def build_signal(
     ganho_pct = float(compute_gain_pct(atual, alvo, side_candidate))
 
     target_dist = abs(alvo - atual)
-    assert_pct = float(mfe_mae_assert(o4, side_candidate, target_dist, atr_val, lookahead=12)) if o4 else 0.0
+    assert_pct = float(mfe_mae_assert(o4, side_candidate, target_dist, atr_val, lookahead=12, key=par)) if o4 else 0.0
 
     # aplica filtros mínimos (segurança): só LONG/SHORT quando passa nos mínimos
     passes = (float(ganho_pct) >= float(gain_min_pct)) and (float(assert_pct) >= float(assert_min_pct))
+    if passes and market:
+        passes = not _market_blocks(market, side_candidate, max_funding_pct, min_turnover_usdt)
     if not passes:
         return Signal(
             par=par,
@@ -293,3 +374,30 @@ def build_signal(
         risco=risco,
         prioridade=prioridade,
     )
+
+
+def build_signal(
+    par: str,
+    ohlc_1h,
+    ohlc_4h,
+    mark_price: float,
+    gain_min_pct: float,
+    assert_min_pct: float,
+    market: Optional[Dict] = None,
+    max_funding_pct: float = 0.0,
+    min_turnover_usdt: float = 0.0,
+) -> Signal:
+    """Calcula sinal + métricas conforme as regras do projeto (SEM 'NÃO ENTRAR').
+
+    Filtros opcionais com os campos de mercado do ticker em lote (engine/tickers;
+    0 = desligado, campo ausente = não filtra):
+    - max_funding_pct: LONG com funding >= +max ou SHORT com funding <= -max
+      (lado lotado pagando caro) vira NÃO ENTRAR;
+    - min_turnover_usdt: giro 24h abaixo do mínimo vira NÃO ENTRAR.
+
+    Vários conjuntos de limiares sobre os mesmos dados (perfis): prepare_signal
+    1x e finish_signal por perfil.
+    """
+    return finish_signal(prepare_signal(par, ohlc_1h, ohlc_4h, mark_price), par,
+                         gain_min_pct, assert_min_pct, market=market,
+                         max_funding_pct=max_funding_pct, min_turnover_usdt=min_turnover_usdt)
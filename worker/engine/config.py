@@ -1,12 +1,20 @@
 # engine/config.py
 import json
 import os
-from typing import List
+import re
+from datetime import datetime
+from typing import Dict, List
+from zoneinfo import ZoneInfo
+
+# Diretório de dados (mesmo default do worker_pro.py / worker_audit_top10.py)
+DATA_DIR = os.getenv("DATA_DIR", "/opt/ENTRADA-PRO/data")
+TZ_BRT = ZoneInfo("America/Sao_Paulo")
 
 # Default thresholds (can be overridden by settings.json)
 # ENTRADA-PRO: defaults seguem o contrato do BLOCO 1 (55/2).
 DEFAULT_GAIN_MIN_PCT = float(os.getenv("GAIN_MIN_PCT", "2"))
 DEFAULT_ASSERT_MIN_PCT = float(os.getenv("ASSERT_MIN_PCT", "55"))
+GAIN_MIN_PCT = DEFAULT_GAIN_MIN_PCT
 
 # Default coins (can be overridden by settings.json)
 DEFAULT_COINS = [
@@ -15,6 +23,11 @@ DEFAULT_COINS = [
   "PEPE","POL","RATS","RENDER","RNDR","RUNE","SEI","SHIB","SOL","SUI","TIA","TON","TRX","UNI","WIF","XRP","XLM","XTZ"
 ]
 
+def now_brt_str() -> str:
+    """Agora em BRT no formato dos logs de auditoria: "YYYY-MM-DD HH:MM"."""
+    return datetime.now(TZ_BRT).strftime("%Y-%m-%d %H:%M")
+
+
 def _try_load_json(paths: List[str]) -> dict:
     for p in paths:
         if not p:
@@ -50,7 +63,40 @@ def get_thresholds(settings: dict):
     assert_min = float(settings.get("assert_min_pct", DEFAULT_ASSERT_MIN_PCT))
     return gain, assert_min
 
+def get_profiles(settings: dict) -> Dict[str, Dict[str, float]]:
+    """Perfis de limiares extras (settings "profiles"), cada um publicado em
+    pro_<perfil>.json / top10_<perfil>.json sobre os MESMOS dados do ciclo:
+
+        "profiles": {"conservador": {"gain_min_pct": 3, "assert_min_pct": 65},
+                     "agressivo":   {"gain_min_pct": 1.5, "assert_min_pct": 45}}
+
+    Campo ausente herda o valor principal (inclusive os filtros filter_*).
+    Nome só com [a-z0-9_-] (vira nome de arquivo); inválido é ignorado."""
+    gain, assert_min = get_thresholds(settings)
+    base = {
+        "gain_min_pct": gain,
+        "assert_min_pct": assert_min,
+        "filter_max_funding_pct": float(settings.get("filter_max_funding_pct", 0.0) or 0.0),
+        "filter_min_turnover_usdt": float(settings.get("filter_min_turnover_usdt", 0.0) or 0.0),
+    }
+    out: Dict[str, Dict[str, float]] = {}
+    for name, cfg in (settings.get("profiles") or {}).items():
+        name = str(name).strip().lower()
+        if not re.fullmatch(r"[a-z0-9_-]+", name) or not isinstance(cfg, dict):
+            continue
+        out[name] = {k: float(cfg.get(k, v) or 0.0) for k, v in base.items()}
+    return out
+
 def get_coins(settings: dict) -> List[str]:
+    # 0) opt-in: todos os perps USDT listados, filtrados por giro 24h (engine/instruments)
+    if str(settings.get("universe") or "").lower() == "all_usdt_perps":
+        from .instruments import get_instruments  # import tardio: instruments importa config
+        inst = get_instruments()
+        inst.refresh_if_due()
+        lst = inst.universe(min_turnover_usdt=float(settings.get("universe_min_turnover_usdt", 20_000_000)))
+        if lst:
+            return lst
+
     # 1) coins dentro do próprio settings.json
     coins = settings.get("coins") or settings.get("COINS") or None
     if coins and isinstance(coins, list) and all(isinstance(x, str) for x in coins):
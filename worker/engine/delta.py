@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+"""engine/delta.py
+
+Canal de deltas do pro.json: a cada ciclo o worker calcula o que mudou por
+item (chave = par) em relação ao payload anterior e publica um patch com
+número de sequência. O cliente guarda o "seq" do último pro.json que aplicou
+e busca só os patches posteriores; se ficou para trás demais (o log só guarda
+os últimos N), recarrega o snapshot completo.
+
+Patch:
+    {
+      "seq": 12,
+      "meta":   {"updated_at": ..., ...},        # campos do topo que mudaram
+      "remove": ["PAR", ...],                    # itens que saíram
+      "upsert": {"BTC": {"atual": 1.2, ...}},    # item novo (inteiro) ou só os campos alterados
+      "all":    {"hora": "14:35", ...},          # campo igual em TODOS os itens (data/hora/ttl)
+      "unset":  {"BTC": ["funding_rate_pct"]},   # campos que sumiram do item
+      "unset_all":  ["diversified"],             # campos que sumiram de TODOS os itens
+      "unset_meta": ["tiers"],                   # campos que sumiram do topo
+      "reset":  false                            # true = "upsert" tem a lista completa
+    }
+
+"unset"/"unset_all"/"unset_meta" só aparecem quando não estão vazios.
+Aplicação (ver apply_patch): remove -> upsert -> unset -> all; a volta é
+exata: apply_patch(prev, diff_payload(prev, cur, seq)) == cur (+ "seq").
+"""
+
+import json
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional
+
+KEY = "par"
+
+
+def _by_key(items: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    return {str(it.get(KEY)): it for it in items if it.get(KEY)}
+
+
+def _uniform(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Campos com o mesmo valor em todos os itens (ex.: data, hora, ttl_expira_em)."""
+    if not items:
+        return {}
+    first = items[0]
+    return {k: v for k, v in first.items() if k != KEY and all(it.get(k, object()) == v for it in items[1:])}
+
+
+def diff_payload(prev: Optional[Dict[str, Any]], cur: Dict[str, Any], seq: int) -> Dict[str, Any]:
+    cur_items = list(cur.get("items") or [])
+    meta = {k: v for k, v in cur.items() if k not in ("items", "seq")}
+    if prev is None:
+        return {"seq": seq, "meta": meta, "remove": [], "upsert": _by_key(cur_items), "all": {}, "reset": True}
+
+    prev_items = list(prev.get("items") or [])
+    p_by, c_by = _by_key(prev_items), _by_key(cur_items)
+    p_all, c_all = _uniform(prev_items), _uniform(cur_items)
+
+    all_changed = {k: v for k, v in c_all.items() if p_all.get(k, object()) != v}
+    # campo uniforme no anterior que não existe em nenhum item atual: some de todos de uma vez
+    unset_all = sorted(k for k in p_all if k not in c_all and not any(k in it for it in cur_items))
+    upsert: Dict[str, Dict[str, Any]] = {}
+    unset: Dict[str, List[str]] = {}
+    for par, it in c_by.items():
+        old = p_by.get(par)
+        if old is None:
+            upsert[par] = dict(it)
+            continue
+        # campos uniformes ficam por conta do "all"
+        ch = {k: v for k, v in it.items() if k not in c_all and old.get(k, object()) != v}
+        if ch:
+            upsert[par] = ch
+        gone = [k for k in old if k not in it and k not in unset_all]
+        if gone:
+            unset[par] = gone
+
+    patch = {
+        "seq": seq,
+        "meta": {k: v for k, v in meta.items() if prev.get(k, object()) != v},
+        "remove": sorted(par for par in p_by if par not in c_by),
+        "upsert": upsert,
+        "all": all_changed,
+        "reset": False,
+    }
+    unset_meta = sorted(k for k in prev if k not in ("items", "seq") and k not in cur)
+    for k, v in (("unset", unset), ("unset_all", unset_all), ("unset_meta", unset_meta)):
+        if v:
+            patch[k] = v
+    return patch
+
+
+def apply_patch(payload: Dict[str, Any], patch: Dict[str, Any]) -> Dict[str, Any]:
+    """Implementação de referência do lado do cliente (mantém a ordem por PAR)."""
+    if patch.get("reset"):
+        by = {}
+    else:
+        by = {k: dict(v) for k, v in _by_key(list(payload.get("items") or [])).items()}
+    for par in patch.get("remove") or []:
+        by.pop(par, None)
+    for par, ch in (patch.get("upsert") or {}).items():
+        by.setdefault(par, {KEY: par}).update(ch)
+    for par, keys in (patch.get("unset") or {}).items():
+        for k in keys:
+            by.get(par, {}).pop(k, None)
+    unset_all = patch.get("unset_all") or ()
+    for it in by.values():
+        for k in unset_all:
+            it.pop(k, None)
+        it.update(patch.get("all") or {})
+    out = {k: v for k, v in payload.items() if k not in (patch.get("unset_meta") or ())}
+    out.update(patch.get("meta") or {})
+    out["seq"] = patch["seq"]
+    out["items"] = [by[k] for k in sorted(by)]
+    return out
+
+
+class DeltaLog:
+    """Log circular dos últimos `keep` patches (thread-safe: worker + servidor)."""
+
+    def __init__(self, *, keep: int = 36):
+        self.keep = max(1, int(keep))
+        self.seq = 0
+        self._prev: Optional[Dict[str, Any]] = None
+        self._patches: Deque[Dict[str, Any]] = deque(maxlen=self.keep)
+        self._lock = threading.Lock()
+
+    def load(self, log_path: Path, snapshot_path: Path) -> None:
+        """Continua a sequência depois de um restart. O payload anterior só é
+        reaproveitado se o pro.json em disco for exatamente o do último seq."""
+        try:
+            log = json.loads(Path(log_path).read_text(encoding="utf-8"))
+            self.seq = int(log.get("seq") or 0)
+            self._patches.extend(log.get("patches") or [])
+            snap = json.loads(Path(snapshot_path).read_text(encoding="utf-8"))
+            if int(snap.get("seq") or -1) == self.seq:
+                self._prev = snap
+        except Exception:
+            pass
+
+    def push(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Calcula o patch do ciclo e grava payload["seq"]."""
+        with self._lock:
+            self.seq += 1
+            patch = diff_payload(self._prev, payload, self.seq)
+            payload["seq"] = self.seq
+            self._patches.append(patch)
+            self._prev = payload
+            return patch
+
+    def since(self, seq: int) -> Dict[str, Any]:
+        """Patches com seq > `seq`; "full": true quando o cliente precisa do snapshot."""
+        with self._lock:
+            if seq >= self.seq:
+                return {"ok": True, "seq": self.seq, "full": False, "patches": []}
+            out = [p for p in self._patches if p["seq"] > seq]
+            if not out or out[0]["seq"] != seq + 1 or any(p.get("reset") for p in out):
+                return {"ok": True, "seq": self.seq, "full": True, "patches": []}
+            return {"ok": True, "seq": self.seq, "full": False, "patches": out}
+
+    def document(self) -> Dict[str, Any]:
+        """Conteúdo do pro_delta.json (arquivo estático para o painel)."""
+        with self._lock:
+            patches = list(self._patches)
+            return {
+                "ok": True,
+                "seq": self.seq,
+                "oldest_seq": patches[0]["seq"] if patches else self.seq,
+                "patches": patches,
+            }
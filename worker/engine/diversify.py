@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+"""engine/diversify.py
+
+Diversificação opcional do TOP10 por correlação (settings "top10_max_corr").
+
+Em dia de risk-on o TOP10 puro (ASSERT desc -> GANHO desc -> PRAZO asc ->
+PAR asc) enche de LONG em alts que andam juntas: na prática é um trade só.
+Aqui a lista já ordenada é percorrida na mesma ordem e um candidato é pulado
+se a correlação DIRECIONAL dos retornos de 1h com algum já escolhido passa do
+limite (LONG x LONG e SHORT x SHORT usam a correlação; LONG x SHORT usa o
+negativo dela: posições opostas em moedas correlacionadas se protegem).
+
+- Retornos: log-retornos das últimas `window` horas (closes de 1h que o ciclo
+  já buscou; nenhuma requisição extra).
+- Com numpy: matriz de correlação de todas as moedas numa passada (Z @ Z.T).
+  Sem numpy: vetores normalizados só das moedas que o guloso visita e produto
+  escalar só dos pares consultados (no máximo k por candidato).
+- Moeda sem histórico suficiente não é bloqueada (correlação desconhecida).
+"""
+
+import math
+from typing import Dict, List, Optional, Sequence
+
+try:  # opcional: sem numpy cai no caminho em Python puro
+    import numpy as np  # type: ignore
+except ImportError:  # pragma: no cover
+    np = None
+
+CLOSES_KEEP = 73  # closes de 1h guardados por moeda (janela máxima: 72h de retornos)
+DEFAULT_WINDOW = 48
+
+
+def _zscores(closes: Sequence[float], window: int) -> Optional[List[float]]:
+    """Log-retornos normalizados (média 0, norma sqrt(window)); None se não dá para calcular."""
+    if not closes or len(closes) < window + 1:
+        return None
+    tail = closes[-(window + 1):]
+    try:
+        r = [math.log(tail[i + 1] / tail[i]) for i in range(window)]
+    except (ValueError, ZeroDivisionError):
+        return None
+    mean = sum(r) / window
+    var = sum((x - mean) ** 2 for x in r) / window
+    if var <= 0:
+        return None
+    sd = math.sqrt(var)
+    return [(x - mean) / sd for x in r]
+
+
+def _sign(item: Dict) -> float:
+    return -1.0 if item.get("side") == "SHORT" else 1.0
+
+
+def pick_diversified(ranked: List[Dict], closes: Dict[str, Sequence[float]], *, k: int = 10,
+                     max_corr: float = 0.8, window: int = DEFAULT_WINDOW) -> List[Dict]:
+    """Até k itens de `ranked` (já na ordem do TOP10), pulando os correlacionados demais."""
+    window = max(2, min(int(window), CLOSES_KEEP - 1))
+    z: Dict[str, Optional[List[float]]] = {}
+
+    def _z(par: str) -> Optional[List[float]]:
+        if par not in z:
+            z[par] = _zscores(closes.get(par) or [], window)
+        return z[par]
+
+    corr = None
+    index: Dict[str, int] = {}
+    if np is not None:
+        # matriz inteira numa passada (vetorizado)
+        pars = [p for p in (it.get("par") for it in ranked) if _z(p) is not None]
+        if pars:
+            m = np.asarray([z[p] for p in pars], dtype=float)
+            corr = (m @ m.T) / window
+            index = {p: i for i, p in enumerate(pars)}
+
+    def _corr(a: str, b: str) -> float:
+        if corr is not None:
+            return float(corr[index[a], index[b]])
+        return sum(x * y for x, y in zip(z[a], z[b])) / window
+
+    chosen: List[Dict] = []
+    for it in ranked:
+        if len(chosen) >= k:
+            break
+        par = it.get("par")
+        if _z(par) is not None:
+            s = _sign(it)
+            if any(z.get(c.get("par")) is not None and s * _sign(c) * _corr(par, c.get("par")) > max_corr
+                   for c in chosen):
+                continue
+        chosen.append(it)
+    return chosen
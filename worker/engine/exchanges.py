@@ -1,6 +1,6 @@
 from __future__ import annotations
 import requests
-from typing import Dict, List, Tuple, Optional
+from typing import Any, Dict, List, Tuple, Optional
 
 BINANCE_BASE = "https://fapi.binance.com"
 BYBIT_BASE = "https://api.bybit.com"
@@ -10,41 +10,84 @@ def _get_json(url: str, params: dict, timeout: int = 10) -> dict:
     r.raise_for_status()
     return r.json()
 
-def binance_mark_last(symbol: str) -> Dict[str, float]:
-    # premiumIndex endpoint returns markPrice, indexPrice, lastFundingRate, etc.
-    j = _get_json(f"{BINANCE_BASE}/fapi/v1/premiumIndex", {"symbol": symbol}, timeout=10)
+def _num(v: Any) -> Optional[float]:
+    try:
+        return float(v) if v not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _binance_ticker(j: dict) -> Dict[str, Optional[float]]:
+    # premiumIndex: markPrice, indexPrice, lastFundingRate, nextFundingTime (sem last/OI/giro)
     return {
-        "mark": float(j.get("markPrice")),
-        "last": float(j.get("lastPrice")),
-        "index": float(j.get("indexPrice")),
+        "mark": _num(j.get("markPrice")),
+        "last": _num(j.get("lastPrice")),
+        "index": _num(j.get("indexPrice")),
+        "funding_rate": _num(j.get("lastFundingRate")),
+        "next_funding_ms": _num(j.get("nextFundingTime")),
+        "open_interest": None,
+        "open_interest_usdt": None,
+        "turnover_24h": None,
     }
 
-def binance_klines(symbol: str, interval: str = "4h", limit: int = 200) -> List[List[float]]:
-    j = _get_json(f"{BINANCE_BASE}/fapi/v1/klines", {"symbol": symbol, "interval": interval, "limit": limit}, timeout=15)
+def binance_mark_last(symbol: str) -> Dict[str, Optional[float]]:
+    # premiumIndex endpoint returns markPrice, indexPrice, lastFundingRate, etc.
+    j = _get_json(f"{BINANCE_BASE}/fapi/v1/premiumIndex", {"symbol": symbol}, timeout=10)
+    return _binance_ticker(j)
+
+def binance_tickers(timeout: int = 10) -> Dict[str, Dict[str, Optional[float]]]:
+    """premiumIndex SEM symbol: todos os perps numa requisição -> {símbolo: ticker}."""
+    j = _get_json(f"{BINANCE_BASE}/fapi/v1/premiumIndex", {}, timeout=timeout)
+    return {str(t.get("symbol")): _binance_ticker(t) for t in (j or []) if t.get("symbol")}
+
+def binance_klines(symbol: str, interval: str = "4h", limit: int = 200, *, start_ms: Optional[int] = None,
+                   end_ms: Optional[int] = None, with_time: bool = False) -> List[List[float]]:
+    params: Dict[str, Any] = {"symbol": symbol, "interval": interval, "limit": limit}
+    if start_ms is not None:
+        params["startTime"] = int(start_ms)
+    if end_ms is not None:
+        params["endTime"] = int(end_ms)
+    j = _get_json(f"{BINANCE_BASE}/fapi/v1/klines", params, timeout=15)
     # each kline: [openTime, open, high, low, close, volume, closeTime, ...]
     out=[]
     for k in j:
-        out.append([float(k[1]), float(k[2]), float(k[3]), float(k[4])])
+        row = [float(k[1]), float(k[2]), float(k[3]), float(k[4])]
+        out.append([int(k[0])] + row if with_time else row)
     return out
 
-def bybit_mark_last(symbol: str) -> Dict[str, float]:
+def _bybit_ticker(t: dict) -> Dict[str, Optional[float]]:
+    return {
+        "mark": _num(t.get("markPrice")),
+        "last": _num(t.get("lastPrice")),
+        "index": _num(t.get("indexPrice")),
+        "funding_rate": _num(t.get("fundingRate")),
+        "next_funding_ms": _num(t.get("nextFundingTime")),
+        "open_interest": _num(t.get("openInterest")),
+        "open_interest_usdt": _num(t.get("openInterestValue")),
+        "turnover_24h": _num(t.get("turnover24h")),
+    }
+
+def bybit_mark_last(symbol: str) -> Dict[str, Optional[float]]:
     j = _get_json(f"{BYBIT_BASE}/v5/market/tickers", {"category":"linear", "symbol": symbol}, timeout=10)
     lst = (j.get("result") or {}).get("list") or []
     if not lst:
         raise RuntimeError("bybit ticker empty")
-    t = lst[0]
-    return {
-        "mark": float(t.get("markPrice")),
-        "last": float(t.get("lastPrice")),
-        "index": float(t.get("indexPrice")),
-    }
+    return _bybit_ticker(lst[0])
 
+def bybit_tickers(timeout: int = 10) -> Dict[str, Dict[str, Optional[float]]]:
+    """tickers category=linear SEM symbol: todos os perps numa requisição -> {símbolo: ticker}."""
+    j = _get_json(f"{BYBIT_BASE}/v5/market/tickers", {"category": "linear"}, timeout=timeout)
+    lst = (j.get("result") or {}).get("list") or []
+    return {str(t.get("symbol")): _bybit_ticker(t) for t in lst if t.get("symbol")}
 
-def bybit_klines(symbol: str, interval: str = "4h", limit: int = 200) -> List[List[float]]:
+
+def bybit_klines(symbol: str, interval: str = "4h", limit: int = 200, *, start_ms: Optional[int] = None,
+                 end_ms: Optional[int] = None, with_time: bool = False) -> List[List[float]]:
     """Bybit v5 kline.
 
     interval na API é em minutos (string): 1,3,5,15,30,60,120,240,360,720,D,W,M.
     Vamos mapear os intervalos que usamos no worker.
+    with_time: cada linha vira [open_ms, o, h, l, c] (validação em engine/klines).
     """
     map_iv = {
         "1m": "1",
@@ -60,17 +103,19 @@ def bybit_klines(symbol: str, interval: str = "4h", limit: int = 200) -> List[Li
         "1d": "D",
     }
     iv = map_iv.get(interval, interval)
-    j = _get_json(
-        f"{BYBIT_BASE}/v5/market/kline",
-        {"category": "linear", "symbol": symbol, "interval": iv, "limit": int(limit)},
-        timeout=15,
-    )
+    params: Dict[str, Any] = {"category": "linear", "symbol": symbol, "interval": iv, "limit": int(limit)}
+    if start_ms is not None:
+        params["start"] = int(start_ms)
+    if end_ms is not None:
+        params["end"] = int(end_ms)
+    j = _get_json(f"{BYBIT_BASE}/v5/market/kline", params, timeout=15)
     lst = (j.get("result") or {}).get("list") or []
     # Bybit retorna mais novo -> mais velho. Vamos inverter para oldest->newest.
     out: List[List[float]] = []
     for k in reversed(lst):
         # [startTime, open, high, low, close, volume, turnover]
-        out.append([float(k[1]), float(k[2]), float(k[3]), float(k[4])])
+        row = [float(k[1]), float(k[2]), float(k[3]), float(k[4])]
+        out.append([int(k[0])] + row if with_time else row)
     return out
 
 
@@ -82,9 +127,52 @@ def fetch_mark_price(symbol: str, source: str = "BINANCE", timeout: int = 10) ->
     return float(binance_mark_last(symbol).get("mark"))
 
 
-def fetch_klines(symbol: str, interval: str = "4h", limit: int = 200, source: str = "BINANCE", timeout: int = 15):
-    """Wrapper usado pelo worker (retorna lista [o,h,l,c])."""
+def fetch_klines(symbol: str, interval: str = "4h", limit: int = 200, source: str = "BINANCE", timeout: int = 15,
+                 *, start_ms: Optional[int] = None, end_ms: Optional[int] = None, with_time: bool = False):
+    """Wrapper usado pelo worker (retorna lista [o,h,l,c]; with_time: [open_ms,o,h,l,c]).
+    start_ms/end_ms: só o intervalo pedido (reparo de buracos, engine/klines)."""
     source = (source or "").upper()
+    kw = dict(start_ms=start_ms, end_ms=end_ms, with_time=with_time)
     if source == "BYBIT":
-        return bybit_klines(symbol, interval=interval, limit=limit)
-    return binance_klines(symbol, interval=interval, limit=limit)
+        return bybit_klines(symbol, interval=interval, limit=limit, **kw)
+    return binance_klines(symbol, interval=interval, limit=limit, **kw)
+
+
+# ---------- metadados de instrumentos (engine/instruments, 1x por dia) ----------
+def binance_instruments(timeout: int = 20) -> List[Dict[str, Any]]:
+    """Perps lineares USDT em negociação: [{"symbol", "base", "turnover_24h"}]."""
+    info = _get_json(f"{BINANCE_BASE}/fapi/v1/exchangeInfo", {}, timeout=timeout)
+    tick = _get_json(f"{BINANCE_BASE}/fapi/v1/ticker/24hr", {}, timeout=timeout)
+    vol = {t.get("symbol"): float(t.get("quoteVolume") or 0.0) for t in (tick or [])}
+    out: List[Dict[str, Any]] = []
+    for s in info.get("symbols") or []:
+        if s.get("contractType") != "PERPETUAL" or s.get("quoteAsset") != "USDT" or s.get("status") != "TRADING":
+            continue
+        sym = str(s.get("symbol"))
+        out.append({"symbol": sym, "base": str(s.get("baseAsset") or sym[:-4]), "turnover_24h": vol.get(sym, 0.0)})
+    return out
+
+
+def bybit_instruments(timeout: int = 20) -> List[Dict[str, Any]]:
+    """Mesmo formato de binance_instruments (instruments-info é paginado por cursor)."""
+    rows: List[Dict[str, Any]] = []
+    cursor = ""
+    for _ in range(20):
+        params = {"category": "linear", "limit": 1000}
+        if cursor:
+            params["cursor"] = cursor
+        j = _get_json(f"{BYBIT_BASE}/v5/market/instruments-info", params, timeout=timeout)
+        res = j.get("result") or {}
+        rows.extend(res.get("list") or [])
+        cursor = res.get("nextPageCursor") or ""
+        if not cursor:
+            break
+    tick = _get_json(f"{BYBIT_BASE}/v5/market/tickers", {"category": "linear"}, timeout=timeout)
+    vol = {t.get("symbol"): float(t.get("turnover24h") or 0.0) for t in ((tick.get("result") or {}).get("list") or [])}
+    out: List[Dict[str, Any]] = []
+    for s in rows:
+        if s.get("contractType") != "LinearPerpetual" or s.get("quoteCoin") != "USDT" or s.get("status") != "Trading":
+            continue
+        sym = str(s.get("symbol"))
+        out.append({"symbol": sym, "base": str(s.get("baseCoin") or sym[:-4]), "turnover_24h": vol.get(sym, 0.0)})
+    return out
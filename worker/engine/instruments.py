@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+"""engine/instruments.py
+
+Cache de metadados de instrumentos (perps lineares USDT) de cada exchange,
+atualizado 1x por dia a partir do endpoint de instrumentos:
+
+    PAR  -> {"BYBIT": ("1000BONKUSDT", 1000), "BINANCE": ("1000BONKUSDT", 1000)}
+
+- symbol(par, fonte): símbolo daquela exchange, ou None quando a listagem é
+  conhecida e o PAR não está nela (cache negativo: RNDR, MATIC, FTM... não
+  gastam mais requisições que falham em todo ciclo).
+- Sem listagem daquela exchange (primeira subida offline, endpoint fora), cai
+  no mapeamento fixo antigo (default_symbol). PAR com dois contratos (PEPE e
+  1000PEPE) fica com o do mapeamento antigo quando ele está listado.
+- Renomeações (MATIC -> POL, RNDR -> RENDER) não são seguidas: o PAR antigo só
+  sai da listagem (cache negativo).
+- universe(): universo opcional "todos os perps USDT" filtrado por giro 24h
+  (settings "universe": "all_usdt_perps", ver engine/config.get_coins).
+
+Arquivo: DATA_DIR/cache/instruments.json.
+"""
+
+import json
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .config import DATA_DIR
+from .exchanges import binance_instruments, bybit_instruments
+from .io import atomic_write_json
+
+SOURCES = ("BYBIT", "BINANCE")
+
+REFRESH_S = 24 * 3600.0
+RETRY_S = 3600.0           # endpoint falhou: tenta de novo em 1h (mantém a listagem antiga)
+MAX_AGE_S = 3 * REFRESH_S  # listagem mais velha que isso não serve para cache negativo
+
+# mapeamento fixo antigo (fallback sem listagem)
+LEGACY_MULT = {
+    "BONK": "1000BONK",
+    "FLOKI": "1000FLOKI",
+    "PEPE": "1000PEPE",
+    "SHIB": "1000SHIB",
+}
+
+_MULT_PREFIX = re.compile(r"^(10+)([A-Z][A-Z0-9]*)$")   # 1000BONK, 1000000MOG
+_MULT_SUFFIX = re.compile(r"^([A-Z][A-Z0-9]*?[A-Z])(10+)$")  # SHIB1000 (Bybit)
+
+Fetcher = Callable[[], List[Dict[str, Any]]]
+FETCHERS: Dict[str, Fetcher] = {"BYBIT": bybit_instruments, "BINANCE": binance_instruments}
+
+
+def default_symbol(par: str) -> str:
+    p = (par or "").upper().strip()
+    return f"{LEGACY_MULT.get(p, p)}USDT"
+
+
+def split_multiplier(base: str) -> Tuple[str, int]:
+    """"1000BONK" -> ("BONK", 1000); "SHIB1000" -> ("SHIB", 1000); "BTC" -> ("BTC", 1)."""
+    b = (base or "").upper().strip()
+    m = _MULT_PREFIX.match(b)
+    if m:
+        return m.group(2), int(m.group(1))
+    m = _MULT_SUFFIX.match(b)
+    if m:
+        return m.group(1), int(m.group(2))
+    return b, 1
+
+
+def _pick_key(par: str, sym: str, mult: int) -> Tuple[bool, int]:
+    return sym != default_symbol(par), int(mult)
+
+
+class InstrumentCache:
+    def __init__(self, path: Optional[Path] = None, *, refresh_s: float = REFRESH_S):
+        self.path = Path(path) if path is not None else Path(DATA_DIR) / "cache" / "instruments.json"
+        self.refresh_s = float(refresh_s)
+        # fonte -> PAR -> [símbolo, multiplicador, giro 24h USDT]
+        self._table: Dict[str, Dict[str, List[Any]]] = {}
+        self._refreshed: Dict[str, float] = {}   # fonte -> epoch da listagem
+        self._next_try: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    # ---------- consulta ----------
+    def _known(self, source: str) -> Optional[Dict[str, List[Any]]]:
+        t = self._table.get(source)
+        if not t or time.time() - self._refreshed.get(source, 0.0) > MAX_AGE_S:
+            return None
+        return t
+
+    def symbol(self, par: str, source: str) -> Optional[str]:
+        t = self._known(source.upper())
+        if t is None:
+            return default_symbol(par)
+        row = t.get((par or "").upper().strip())
+        return row[0] if row else None
+
+    def multiplier(self, par: str, source: str) -> int:
+        t = self._known(source.upper())
+        row = (t or {}).get((par or "").upper().strip())
+        if row:
+            return int(row[1])
+        return 1000 if (par or "").upper().strip() in LEGACY_MULT else 1
+
+    def sources(self, par: str, order=SOURCES) -> List[Tuple[str, str]]:
+        """[(fonte, símbolo)] só das exchanges que listam o PAR (na ordem dada)."""
+        out = []
+        for src in order:
+            sym = self.symbol(par, src)
+            if sym:
+                out.append((src, sym))
+        return out
+
+    def universe(self, *, min_turnover_usdt: float = 0.0) -> List[str]:
+        """PARs listados em alguma exchange com giro 24h >= mínimo (ordem alfabética)."""
+        best: Dict[str, float] = {}
+        for src in SOURCES:
+            for par, row in (self._known(src) or {}).items():
+                best[par] = max(best.get(par, 0.0), float(row[2] or 0.0))
+        return sorted(p for p, v in best.items() if v >= float(min_turnover_usdt))
+
+    # ---------- atualização ----------
+    def refresh_if_due(self, fetchers: Optional[Dict[str, Fetcher]] = None) -> bool:
+        """Atualiza as listagens vencidas (>= refresh_s). Nunca levanta exceção."""
+        fetchers = fetchers or FETCHERS
+        now = time.time()
+        changed = False
+        for src, fetch in fetchers.items():
+            if now - self._refreshed.get(src, 0.0) < self.refresh_s or now < self._next_try.get(src, 0.0):
+                continue
+            try:
+                rows = fetch()
+            except Exception:
+                rows = []
+            if not rows:
+                self._next_try[src] = now + RETRY_S
+                continue
+            table: Dict[str, List[Any]] = {}
+            for r in rows:
+                sym = str(r.get("symbol") or "")
+                base = sym[:-4] if sym.endswith("USDT") else str(r.get("base") or "")
+                par, mult = split_multiplier(base)
+                old = table.get(par)
+                # mesmo PAR em dois contratos (ex.: PEPE e 1000PEPE): fica o do mapeamento
+                # antigo (default_symbol) se listado — klines, cache e histórico da auditoria
+                # foram gravados nessa unidade —, senão o de menor multiplicador
+                if old is None or _pick_key(par, sym, mult) < _pick_key(par, old[0], old[1]):
+                    table[par] = [sym, mult, float(r.get("turnover_24h") or 0.0)]
+            with self._lock:
+                self._table[src] = table
+                self._refreshed[src] = now
+            changed = True
+        if changed:
+            try:
+                self.save()
+            except Exception:
+                pass
+        return changed
+
+    # ---------- disco ----------
+    def save(self) -> None:
+        with self._lock:
+            obj = {"version": 1, "refreshed_at": dict(self._refreshed), "instruments": dict(self._table)}
+        atomic_write_json(self.path, obj)
+
+    def load(self) -> None:
+        try:
+            obj = json.loads(self.path.read_text(encoding="utf-8"))
+            if obj.get("version") != 1:
+                return
+            self._table = {str(k): dict(v) for k, v in (obj.get("instruments") or {}).items()}
+            self._refreshed = {str(k): float(v) for k, v in (obj.get("refreshed_at") or {}).items()}
+        except Exception:
+            return
+
+
+_SHARED: Optional[InstrumentCache] = None
+_SHARED_LOCK = threading.Lock()
+
+
+def get_instruments() -> InstrumentCache:
+    """Instância do processo (worker_pro, audit_top10 e config.get_coins usam a mesma)."""
+    global _SHARED
+    with _SHARED_LOCK:
+        if _SHARED is None:
+            _SHARED = InstrumentCache()
+        return _SHARED
+
+
+def resolve_symbol(par: str, source: str) -> Optional[str]:
+    return get_instruments().symbol(par, source)
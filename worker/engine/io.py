@@ -1,11 +1,113 @@
 from __future__ import annotations
-import json, os
+import gzip, hashlib, json, os
+from dataclasses import dataclass
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Optional, Tuple
 
-def atomic_write_json(fp: Path, obj: Any) -> None:
+try:  # opcional: sem o pacote "brotli" o .br simplesmente não é gerado
+    import brotli  # type: ignore
+except ImportError:  # pragma: no cover
+    brotli = None
+
+
+def _atomic_write_bytes(fp: Path, data: bytes, *, fsync: bool = True) -> None:
     fp.parent.mkdir(parents=True, exist_ok=True)
     tmp = fp.with_suffix(fp.suffix + ".tmp")
-    data = json.dumps(obj, ensure_ascii=False, separators=(",", ":"), indent=2)
-    tmp.write_text(data, encoding="utf-8")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
     os.replace(tmp, fp)
+
+
+def encode_json(obj: Any) -> bytes:
+    """JSON compacto (sem indentação), UTF-8."""
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def atomic_write_json(fp: Path, obj: Any) -> None:
+    _atomic_write_bytes(Path(fp), encode_json(obj))
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    body: bytes
+    gz: bytes
+    etag: str
+    sha256: str
+    br: Optional[bytes] = None
+
+
+def encode_snapshot(obj: Any, *, br: bool = False) -> Snapshot:
+    """Serializa UMA vez: corpo compacto + gzip (+ brotli) + ETag do conteúdo."""
+    body = encode_json(obj)
+    sha = hashlib.sha256(body).hexdigest()
+    return Snapshot(
+        body=body,
+        gz=gzip.compress(body, compresslevel=6, mtime=0),
+        etag='"' + sha[:20] + '"',
+        sha256=sha,
+        br=brotli.compress(body, quality=5) if (br and brotli is not None) else None,
+    )
+
+
+class SnapshotWriter:
+    """
+    Grava snapshots do painel (pro.json, top10.json, ...) prontos para o
+    servidor web entregar direto do disco:
+
+        pro.json                compacto
+        pro.json.gz             gzip_static
+        pro.json.br             brotli_static (se o pacote brotli existir)
+        pro.json.manifest.json  {"version", "etag", "sha256", "bytes", ...}
+
+    Se o hash do conteúdo não mudou desde a última gravação, nada é escrito.
+    Cada arquivo é atômico (tmp + fsync + rename); o .json principal e o
+    manifesto vão por último, depois das versões comprimidas.
+    """
+
+    def __init__(self, *, gz: bool = True, br: bool = True, fsync: bool = True):
+        self.gz = bool(gz)
+        self.br = bool(br) and brotli is not None
+        self.fsync = bool(fsync)
+        self._last: Dict[str, Tuple[str, int]] = {}  # path -> (sha256, version)
+
+    def _previous(self, fp: Path) -> Tuple[str, int]:
+        key = str(fp)
+        if key not in self._last:
+            # primeira gravação do processo: continua a versão do manifesto em disco
+            try:
+                m = json.loads(Path(str(fp) + ".manifest.json").read_text(encoding="utf-8"))
+                self._last[key] = (str(m.get("sha256") or ""), int(m.get("version") or 0))
+            except Exception:
+                self._last[key] = ("", 0)
+        return self._last[key]
+
+    def write(self, fp: Path, obj: Any) -> Tuple[Snapshot, bool]:
+        """Retorna (snapshot, gravou?)."""
+        fp = Path(fp)
+        snap = encode_snapshot(obj, br=self.br)
+        sha, version = self._previous(fp)
+        if sha == snap.sha256 and fp.exists():
+            return snap, False
+
+        version += 1
+        if self.gz:
+            _atomic_write_bytes(Path(str(fp) + ".gz"), snap.gz, fsync=self.fsync)
+        if snap.br is not None:
+            _atomic_write_bytes(Path(str(fp) + ".br"), snap.br, fsync=self.fsync)
+        _atomic_write_bytes(fp, snap.body, fsync=self.fsync)
+        manifest = {
+            "version": version,
+            "etag": snap.etag,
+            "sha256": snap.sha256,
+            "bytes": len(snap.body),
+            "gz_bytes": len(snap.gz) if self.gz else None,
+            "br_bytes": len(snap.br) if snap.br is not None else None,
+            "written_at": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+        }
+        _atomic_write_bytes(Path(str(fp) + ".manifest.json"), encode_json(manifest), fsync=self.fsync)
+        self._last[str(fp)] = (snap.sha256, version)
+        return snap, True
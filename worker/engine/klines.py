@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+"""engine/klines.py
+
+Integridade dos klines antes de EMA/RSI/ATR/mfe_mae_assert. As exchanges
+devolvem [open_ms, o, h, l, c] (engine/exchanges, with_time=True) e aqui:
+
+- ordena por open_ms (Bybit vem do mais novo para o mais velho);
+- remove duplicados (mesmo open_ms: fica a última ocorrência);
+- descarta candles desalinhados (open_ms fora da grade do intervalo);
+- acha os buracos (entre candles e no fim da série, só candle JÁ fechado);
+- repara SÓ os intervalos que faltam com pedidos startTime/endTime
+  (fetch_range), no máximo `max_repairs` pedidos por série.
+
+Contadores (somados por ciclo em payload["klines_integrity"], ao lado de
+miss_klines):
+    out_of_order, duplicates, misaligned   linhas corrigidas/descartadas
+    gaps, missing_bars                     buracos achados / candles faltando
+    repair_requests, repaired_bars         pedidos feitos / candles recuperados
+    unrepaired_bars                        continuaram faltando
+"""
+
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+INTERVAL_MS = {
+    "1m": 60_000, "3m": 180_000, "5m": 300_000, "15m": 900_000, "30m": 1_800_000,
+    "1h": 3_600_000, "2h": 7_200_000, "4h": 14_400_000, "6h": 21_600_000,
+    "12h": 43_200_000, "1d": 86_400_000,
+}
+COUNTERS = ("out_of_order", "duplicates", "misaligned", "gaps", "missing_bars",
+            "repair_requests", "repaired_bars", "unrepaired_bars")
+MAX_REPAIRS = 3
+
+# (start_ms, end_ms) -> linhas [open_ms, o, h, l, c] daquele intervalo
+RangeFetcher = Callable[[int, int], Sequence[Sequence[float]]]
+
+
+def new_stats() -> Dict[str, int]:
+    return {k: 0 for k in COUNTERS}
+
+
+def add_stats(into: Dict[str, int], other: Optional[Dict[str, int]]) -> Dict[str, int]:
+    for k, v in (other or {}).items():
+        into[k] = into.get(k, 0) + int(v or 0)
+    return into
+
+
+def _normalize(rows: Sequence[Sequence[float]], step: int, stats: Dict[str, int]) -> Dict[int, List[float]]:
+    """open_ms -> [o, h, l, c] (ordenado, sem duplicado nem desalinhado)."""
+    by: Dict[int, List[float]] = {}
+    last = None
+    for r in rows:
+        t = int(r[0])
+        if last is not None and t < last:
+            stats["out_of_order"] += 1
+        last = t
+        if t % step:
+            stats["misaligned"] += 1
+            continue
+        if t in by:
+            stats["duplicates"] += 1
+        by[t] = [float(x) for x in r[1:5]]
+    return by
+
+
+def _gaps(times: List[int], step: int, now_ms: int) -> List[Tuple[int, int]]:
+    """Intervalos [ini, fim] (open_ms) faltando entre candles e no fim da série."""
+    out = []
+    for a, b in zip(times, times[1:]):
+        if b - a > step:
+            out.append((a + step, b - step))
+    if times:
+        # fim: candle aberto agora é floor(now); falta algo só se um candle JÁ fechado não veio
+        expected_last = now_ms - now_ms % step
+        if expected_last - times[-1] > step:
+            out.append((times[-1] + step, expected_last - step))
+    return out
+
+
+def validate_klines(rows: Sequence[Sequence[float]], interval: str, *, limit: Optional[int] = None,
+                    fetch_range: Optional[RangeFetcher] = None, max_repairs: int = MAX_REPAIRS,
+                    stats: Optional[Dict[str, int]] = None,
+                    now_ms: Optional[int] = None) -> List[List[float]]:
+    """Linhas [open_ms,o,h,l,c] -> [o,h,l,c] validadas (mais velho -> mais novo)."""
+    stats = new_stats() if stats is None else stats
+    for k in COUNTERS:
+        stats.setdefault(k, 0)
+    step = INTERVAL_MS.get(interval)
+    if not step or not rows:
+        return [[float(x) for x in r[1:5]] for r in rows]
+    now_ms = int(time.time() * 1000) if now_ms is None else int(now_ms)
+
+    by = _normalize(rows, step, stats)
+    gaps = _gaps(sorted(by), step, now_ms)
+    stats["gaps"] += len(gaps)
+    missing = sum((b - a) // step + 1 for a, b in gaps)
+    stats["missing_bars"] += missing
+
+    if gaps and fetch_range is not None:
+        # maiores primeiro: com limite de pedidos, recupera o máximo de candles
+        for a, b in sorted(gaps, key=lambda g: g[0] - g[1])[:max(0, int(max_repairs))]:
+            stats["repair_requests"] += 1
+            try:
+                got = fetch_range(a, b) or []
+            except Exception:
+                continue
+            for r in got:
+                t = int(r[0])
+                if a <= t <= b and t % step == 0 and t not in by:
+                    by[t] = [float(x) for x in r[1:5]]
+                    stats["repaired_bars"] += 1
+        left = _gaps(sorted(by), step, now_ms)
+        stats["unrepaired_bars"] += sum((b - a) // step + 1 for a, b in left)
+    else:
+        stats["unrepaired_bars"] += missing
+
+    out = [by[t] for t in sorted(by)]
+    return out[-int(limit):] if limit else out
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+"""engine/pricecol.py
+
+Formato binário compacto do histórico de preços da auditoria (alternativa ao
+prices_YYYY-MM-DD.jsonl, que repete date/hora/ts_brt/updated_at/par/... em
+toda linha).
+
+- audit/prices_YYYY-MM-DD.bin: registros fixos de 16 bytes, little-endian
+    uint32  t_min    minutos desde 1970 do ts_brt ("YYYY-MM-DD HH:MM", BRT)
+    uint16  coin_id  índice em price_coins.json
+    uint16  (reservado, 0)
+    float64 preço
+- audit/price_coins.json: {"coins": [...]} dicionário de moedas (só cresce)
+
+Cada ciclo grava o lote inteiro num único append. A leitura faz mmap do
+arquivo e expõe as colunas (ts / coin_id / preço) como memoryviews sem
+parsing; um registro final incompleto (gravação interrompida) é ignorado.
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .io import atomic_write_json
+
+RECORD = struct.Struct("<IHHd")
+COINS_FILE = "price_coins.json"
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+@lru_cache(maxsize=4096)  # > 2 dias de minutos: cobre as duas janelas de preço do audit_report
+def ts_to_min(ts_brt: str) -> int:
+    """"YYYY-MM-DD HH:MM" (BRT "ingênuo") -> minutos desde 1970.
+
+    Única conversão usada pela gravação (.bin) e pelo audit_report (.jsonl);
+    todas as moedas de um ciclo compartilham o mesmo ts_brt, então o cache
+    evita um strptime por linha."""
+    return int((datetime.strptime(ts_brt, "%Y-%m-%d %H:%M") - _EPOCH).total_seconds() // 60)
+
+
+def bin_path(audit_dir: Path, day: str) -> Path:
+    return Path(audit_dir) / f"prices_{day}.bin"
+
+
+def load_coins(audit_dir: Path) -> List[str]:
+    try:
+        obj = json.loads((Path(audit_dir) / COINS_FILE).read_text(encoding="utf-8"))
+        lst = obj.get("coins") if isinstance(obj, dict) else None
+        if isinstance(lst, list):
+            return [str(x) for x in lst]
+    except Exception:
+        pass
+    return []
+
+
+class PriceColumnWriter:
+    """Append de lotes (par, preço) no .bin do dia, mantendo o dicionário de moedas."""
+
+    def __init__(self, audit_dir: Path):
+        self.audit_dir = Path(audit_dir)
+        self._coins = load_coins(self.audit_dir)
+        self._ids = {c: i for i, c in enumerate(self._coins)}
+
+    def _coin_id(self, par: str) -> int:
+        cid = self._ids.get(par)
+        if cid is None:
+            cid = len(self._coins)
+            if cid > 0xFFFF:
+                raise ValueError("price_coins.json: limite de 65536 moedas")
+            self._coins.append(par)
+            self._ids[par] = cid
+            # o dicionário precisa existir antes de qualquer registro que o use
+            atomic_write_json(self.audit_dir / COINS_FILE, {"coins": self._coins})
+        return cid
+
+    def append(self, day: str, ts_brt: str, rows: Iterable[Tuple[str, float]], *, fsync: bool = False) -> int:
+        t = ts_to_min(ts_brt)
+        buf = bytearray()
+        for par, price in rows:
+            buf += RECORD.pack(t, self._coin_id(par), 0, float(price))
+        if not buf:
+            return 0
+        with bin_path(self.audit_dir, day).open("ab") as f:
+            f.write(buf)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        return len(buf) // RECORD.size
+
+
+class PriceColumns:
+    """
+    Leitura de um prices_YYYY-MM-DD.bin via mmap.
+
+        with PriceColumns(path, coins) as pc:
+            pc.ts, pc.coin_ids, pc.prices   # memoryviews (zero-copy)
+            pc.coin_index()                 # {par: array de índices dos registros}
+            pc.get(par, [])                 # [(t_min, preço), ...] só dessa moeda
+
+    Os registros das moedas vêm intercalados (um lote por ciclo), então o
+    agrupamento é por índice: uma passada na coluna coin_id, e ts/preço só são
+    lidos (das views) para as moedas pedidas."""
+
+    def __init__(self, path: Path, coins: List[str]):
+        self.coins = coins
+        self._f = None
+        self._mm: Optional[mmap.mmap] = None
+        self._mv: Optional[memoryview] = None
+        self.ts = self.coin_ids = self.prices = memoryview(b"").cast("B")
+        self._index: Optional[Dict[str, array]] = None
+
+        self._f = Path(path).open("rb")
+        size = Path(path).stat().st_size
+        n = size // RECORD.size
+        if n <= 0:
+            return
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        if sys.byteorder == "little":
+            self._mv = memoryview(self._mm)[: n * RECORD.size]
+            self.ts = self._mv.cast("I")[0::4]
+            self.coin_ids = self._mv.cast("H")[2::8]
+            self.prices = self._mv.cast("d")[1::2]
+        else:  # big-endian: sem views nativas, desempacota
+            recs = list(RECORD.iter_unpack(self._mm[: n * RECORD.size]))
+            self.ts = memoryview(struct.pack(f"={n}I", *(r[0] for r in recs))).cast("I")
+            self.coin_ids = memoryview(struct.pack(f"={n}H", *(r[1] for r in recs))).cast("H")
+            self.prices = memoryview(struct.pack(f"={n}d", *(r[3] for r in recs))).cast("d")
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def coin_index(self) -> Dict[str, array]:
+        if self._index is None:
+            by_id: Dict[int, array] = {}
+            for i, cid in enumerate(self.coin_ids):
+                idx = by_id.get(cid)
+                if idx is None:
+                    idx = by_id[cid] = array("I")
+                idx.append(i)
+            coins = self.coins
+            self._index = {coins[cid]: idx for cid, idx in by_id.items() if cid < len(coins)}
+        return self._index
+
+    def get(self, par: str, default: Optional[List[Tuple[int, float]]] = None) -> Optional[List[Tuple[int, float]]]:
+        """Série (t_min, preço) da moeda, na ordem do arquivo (mesma interface de dict.get)."""
+        idx = self.coin_index().get(par)
+        if idx is None:
+            return default
+        ts, prices = self.ts, self.prices
+        return [(ts[i], prices[i]) for i in idx]
+
+    def close(self) -> None:
+        for v in (self.ts, self.coin_ids, self.prices, self._mv):
+            if v is not None:
+                v.release()
+        if self._mm is not None:
+            self._mm.close()
+        if self._f is not None:
+            self._f.close()
+        self._mm = self._mv = self._f = None
+
+    def __enter__(self) -> "PriceColumns":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
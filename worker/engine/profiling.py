@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+"""engine/profiling.py
+
+Perfil opcional dos ciclos dos workers (sem precisar anexar debugger no
+serviço do systemd). Desligado por padrão; liga por env ou settings.json:
+
+    PROFILE=cprofile|tracemalloc|both      settings "profile": {"mode": ...,
+    PROFILE_EVERY=N   (1 ciclo a cada N)                         "every": N,
+    PROFILE_SLOW_S=X  (só ciclos >= X s)                         "slow_s": X,
+    PROFILE_KEEP=20   (ciclos guardados)                         "keep": 20}
+
+Saída em DATA_DIR/profiles/<worker>_<AAAAMMDD-HHMMSS>_c<ciclo>_<dur>s.*:
+    .prof        cProfile (abrir com pstats/snakeviz)
+    .txt         top funções por tempo acumulado
+    _alloc.txt   top alocações (tracemalloc) por linha
+
+Com PROFILE_SLOW_S o perfil precisa rodar em TODO ciclo (não dá para saber
+antes que o ciclo vai ser lento) e só é gravado quando passa do limite.
+Desligado, cycle() devolve um nullcontext: custo zero.
+"""
+
+import contextlib
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Any, ContextManager, Dict, Iterator, List, Optional
+
+from .config import DATA_DIR
+
+MODES = ("cprofile", "tracemalloc", "both")
+TOP_N = 40
+
+
+class CycleProfiler:
+    def __init__(self, name: str, *, mode: str = "cprofile", every: int = 0, slow_s: float = 0.0,
+                 keep: int = 20, out_dir: Optional[Path] = None):
+        self.name = name
+        self.mode = mode if mode in MODES else "cprofile"
+        self.every = max(0, int(every))
+        self.slow_s = max(0.0, float(slow_s))
+        self.keep = max(1, int(keep))
+        self.out_dir = Path(out_dir) if out_dir is not None else Path(DATA_DIR) / "profiles"
+        self.n = 0
+
+    @contextlib.contextmanager
+    def cycle(self) -> Iterator[None]:
+        self.n += 1
+        sampled = self.every > 0 and self.n % self.every == 0
+        if not sampled and self.slow_s <= 0:
+            yield
+            return
+
+        prof = cProfile.Profile() if self.mode in ("cprofile", "both") else None
+        threads: List[cProfile.Profile] = []
+        trace = self.mode in ("tracemalloc", "both") and not tracemalloc.is_tracing()
+        if trace:
+            tracemalloc.start(10)
+        if prof is not None:
+            if sys.version_info < (3, 12):
+                # até o 3.11 o cProfile só enxerga a própria thread: cada thread criada
+                # durante o ciclo (pool de busca/cálculo) ganha o seu e tudo é somado no fim
+                threading.setprofile(lambda *_: _thread_profile(threads))
+            prof.enable()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            dur = time.perf_counter() - t0
+            if prof is not None:
+                prof.disable()
+                threading.setprofile(None)
+            snap = tracemalloc.take_snapshot() if trace else None
+            if trace:
+                tracemalloc.stop()
+            if sampled or dur >= self.slow_s > 0:
+                try:
+                    self._write(prof, threads, snap, dur)
+                except Exception:
+                    pass  # perfil nunca pode derrubar o worker
+
+    def _write(self, prof: Optional[cProfile.Profile], threads: List[cProfile.Profile],
+               snap: Optional[tracemalloc.Snapshot], dur: float) -> None:
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        stem = f"{self.name}_{datetime.now().strftime('%Y%m%d-%H%M%S')}_c{self.n}_{dur:.1f}s"
+        if prof is not None:
+            buf = io.StringIO()
+            stats = pstats.Stats(prof, stream=buf)
+            for p in threads:
+                stats.add(p)
+            stats.dump_stats(str(self.out_dir / f"{stem}.prof"))
+            stats.sort_stats("cumulative").print_stats(TOP_N)
+            (self.out_dir / f"{stem}.txt").write_text(buf.getvalue(), encoding="utf-8")
+        if snap is not None:
+            stats = snap.filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            )).statistics("lineno")
+            total = sum(s.size for s in stats)
+            lines = [f"ciclo {self.n} | {dur:.2f}s | alocado (vivo no fim do ciclo): {total / 1e6:.1f} MB", ""]
+            lines += [str(s) for s in stats[:TOP_N]]
+            (self.out_dir / f"{stem}_alloc.txt").write_text("\n".join(lines) + "\n", encoding="utf-8")
+        self._prune()
+
+    def _prune(self) -> None:
+        # retenção por ciclo (todos os arquivos do mesmo stem saem juntos)
+        files = sorted(self.out_dir.glob(f"{self.name}_*"), key=lambda p: p.stat().st_mtime, reverse=True)
+        stems = []
+        for f in files:
+            stem = f.name.split(".", 1)[0].removesuffix("_alloc")
+            if stem not in stems:
+                stems.append(stem)
+        for stem in stems[self.keep:]:
+            for f in self.out_dir.glob(f"{stem}*"):
+                with contextlib.suppress(OSError):
+                    f.unlink()
+
+
+def _thread_profile(threads: List[cProfile.Profile]) -> None:
+    p = cProfile.Profile()
+    threads.append(p)
+    sys.setprofile(None)
+    p.enable()  # troca o gancho desta thread pelo do cProfile
+
+
+class _Off:
+    def cycle(self) -> ContextManager[None]:
+        return contextlib.nullcontext()
+
+
+def cycle_profiler(name: str, settings: Optional[Dict[str, Any]] = None) -> Any:
+    """CycleProfiler configurado por env/settings, ou um objeto cujo cycle() não faz nada."""
+    cfg = dict((settings or {}).get("profile") or {})
+    mode = (os.getenv("PROFILE") or cfg.get("mode") or "").strip().lower()
+    if mode not in MODES:
+        return _Off()
+    every = int(os.getenv("PROFILE_EVERY") or cfg.get("every") or 0)
+    slow_s = float(os.getenv("PROFILE_SLOW_S") or cfg.get("slow_s") or 0.0)
+    if every <= 0 and slow_s <= 0:
+        every = 1
+    keep = int(os.getenv("PROFILE_KEEP") or cfg.get("keep") or 20)
+    return CycleProfiler(name, mode=mode, every=every, slow_s=slow_s, keep=keep)
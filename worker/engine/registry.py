@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+"""engine/registry.py
+
+Registro de indicadores como grafo de dependências sobre intermediários
+compartilhados. Um Frame = UMA moeda num timeframe; cada nó é calculado na
+primeira vez que alguém pede e fica memoizado no Frame:
+
+    columns ── open / high / low / close ─┬─ diff ─┬─ gains ──┬─ wilder ── rsi
+                                          │        └─ losses ─┘
+                                          ├─ tr ── wilder ── atr
+                                          ├─ ema(close, n) ── macd_line ── ema ── macd
+                                          └─ rolling_sum(src, n) ── sma / bollinger
+
+Então EMA20 + EMA50 + RSI14 + ATR14 (+ o que vier) fazem UMA passada para
+separar as colunas, UMA para diff/gains/losses, UMA para o TR, e cada
+indicador novo custa só o próprio laço final.
+
+Indicador novo = função registrada com @node("nome") recebendo (frame, *args):
+
+    @node("minha_media")
+    def _minha_media(f: Frame, n: int) -> List[float]:
+        return [a + b for a, b in zip(f("sma", "close", n), f("ema", "close", n))]
+
+    f = Frame(ohlc); f("minha_media", 20)
+
+`src` dos nós genéricos (rolling_sum/sma/ema/wilder) é o nome de um nó sem
+argumentos ("close", "tr", ...) ou uma tupla com argumentos (("macd_line", 12, 26)).
+Os valores batem exatamente com engine/indicators (ema/rsi/atr): mesmas
+operações, na mesma ordem.
+"""
+
+import math
+from typing import Any, Callable, Dict, List, Sequence, Tuple, Union
+
+Src = Union[str, Tuple[Any, ...]]
+NODES: Dict[str, Callable[..., Any]] = {}
+
+
+def node(name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    def deco(fn: Callable[..., Any]) -> Callable[..., Any]:
+        NODES[name] = fn
+        return fn
+    return deco
+
+
+class Frame:
+    """Série [o,h,l,c] (mais velho -> mais novo) de uma moeda/timeframe, com nós memoizados."""
+    __slots__ = ("ohlc", "_memo")
+
+    def __init__(self, ohlc: Sequence[Sequence[float]]):
+        self.ohlc = ohlc
+        self._memo: Dict[Tuple[Any, ...], Any] = {}
+
+    @classmethod
+    def from_closes(cls, closes: Sequence[float]) -> "Frame":
+        f = cls([])
+        f._memo[("close",)] = list(closes)
+        return f
+
+    def __call__(self, name: str, *args: Any) -> Any:
+        key = (name,) + args
+        try:
+            return self._memo[key]
+        except KeyError:
+            pass
+        val = NODES[name](self, *args)
+        self._memo[key] = val
+        return val
+
+    def last(self, name: str, *args: Any, default: float = 0.0) -> float:
+        v = self(name, *args)
+        return float(v[-1]) if v else default
+
+    def src(self, s: Src) -> List[float]:
+        return self(*s) if isinstance(s, tuple) else self(s)
+
+
+# ---------- intermediários ----------
+@node("columns")
+def _columns(f: Frame) -> Tuple[List[float], List[float], List[float], List[float]]:
+    if not f.ohlc:
+        return [], [], [], []
+    cols = list(zip(*f.ohlc))  # transpõe numa passada (linhas [o,h,l,c,...])
+    return list(cols[0]), list(cols[1]), list(cols[2]), list(cols[3])
+
+
+@node("open")
+def _open(f: Frame) -> List[float]:
+    return f("columns")[0]
+
+
+@node("high")
+def _high(f: Frame) -> List[float]:
+    return f("columns")[1]
+
+
+@node("low")
+def _low(f: Frame) -> List[float]:
+    return f("columns")[2]
+
+
+@node("close")
+def _close(f: Frame) -> List[float]:
+    return f("columns")[3]
+
+
+@node("diff")
+def _diff(f: Frame) -> List[float]:
+    c = f("close")
+    return [c[i] - c[i - 1] for i in range(1, len(c))]
+
+
+@node("gains")
+def _gains(f: Frame) -> List[float]:
+    return [d if d > 0.0 else 0.0 for d in f("diff")]
+
+
+@node("losses")
+def _losses(f: Frame) -> List[float]:
+    return [-d if d < 0.0 else 0.0 for d in f("diff")]
+
+
+@node("tr")
+def _tr(f: Frame) -> List[float]:
+    h, l, c = f("high"), f("low"), f("close")
+    return [max(h[i] - l[i], abs(h[i] - c[i - 1]), abs(l[i] - c[i - 1])) for i in range(1, len(c))]
+
+
+@node("rolling_sum")
+def _rolling_sum(f: Frame, src: Src, n: int) -> List[float]:
+    v = f.src(src)
+    if n < 1 or len(v) < n:
+        return []
+    s = sum(v[:n])
+    out = [s]
+    for i in range(n, len(v)):
+        s += v[i] - v[i - n]
+        out.append(s)
+    return out  # length = len(v)-n+1
+
+
+# ---------- médias ----------
+@node("sma")
+def _sma(f: Frame, src: Src, n: int) -> List[float]:
+    return [s / n for s in f("rolling_sum", src, n)]
+
+
+@node("ema")
+def _ema(f: Frame, src: Src, n: int) -> List[float]:
+    v = f.src(src)
+    if len(v) < n or n <= 1:
+        return []
+    k = 2 / (n + 1)
+    prev = sum(v[:n]) / n  # semente = SMA (mesma soma do 1º rolling_sum)
+    out = [prev]
+    for x in v[n:]:
+        prev = (x - prev) * k + prev
+        out.append(prev)
+    return out  # length = len(v)-n+1
+
+
+@node("wilder")
+def _wilder(f: Frame, src: Src, n: int) -> List[float]:
+    v = f.src(src)
+    if n < 1 or len(v) < n:
+        return []
+    prev = sum(v[:n]) / n
+    out = [prev]
+    for x in v[n:]:
+        prev = (prev * (n - 1) + x) / n
+        out.append(prev)
+    return out
+
+
+# ---------- indicadores ----------
+@node("rsi")
+def _rsi(f: Frame, n: int = 14) -> List[float]:
+    out = []
+    for ag, al in zip(f("wilder", "gains", n), f("wilder", "losses", n)):
+        out.append(100.0 if al == 0 else 100 - (100 / (1 + ag / al)))
+    return out  # length = len(close)-n
+
+
+@node("atr")
+def _atr(f: Frame, n: int = 14) -> List[float]:
+    return f("wilder", "tr", n)  # length = len(close)-n
+
+
+@node("close_sq")
+def _close_sq(f: Frame) -> List[float]:
+    return [c * c for c in f("close")]
+
+
+@node("bollinger")
+def _bollinger(f: Frame, n: int = 20, k: float = 2.0) -> Tuple[List[float], List[float], List[float]]:
+    """(meio, superior, inferior) com desvio populacional; somas móveis compartilhadas."""
+    s, s2 = f("rolling_sum", "close", n), f("rolling_sum", "close_sq", n)
+    mid, up, lo = [], [], []
+    for a, b in zip(s, s2):
+        m = a / n
+        sd = math.sqrt(max(0.0, b / n - m * m))
+        mid.append(m)
+        up.append(m + k * sd)
+        lo.append(m - k * sd)
+    return mid, up, lo
+
+
+@node("macd_line")
+def _macd_line(f: Frame, fast: int = 12, slow: int = 26) -> List[float]:
+    ef, es = f("ema", "close", fast), f("ema", "close", slow)
+    off = len(ef) - len(es)
+    return [ef[i + off] - es[i] for i in range(len(es))] if es else []
+
+
+@node("macd")
+def _macd(f: Frame, fast: int = 12, slow: int = 26, signal: int = 9) -> Tuple[List[float], List[float], List[float]]:
+    """(linha, sinal, histograma), alinhados pelo fim."""
+    line = f("macd_line", fast, slow)
+    sig = f("ema", ("macd_line", fast, slow), signal)
+    off = len(line) - len(sig)
+    return line, sig, [line[i + off] - sig[i] for i in range(len(sig))]
@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+"""engine/serve.py
+
+Servidor HTTP opcional (asyncio, sem dependências) dentro do próprio worker.
+
+- Mantém em memória o último pro/top10/resumo da auditoria já serializado
+  (JSON compacto) e já comprimido (gzip/brotli), com ETag — o mesmo
+  Snapshot que engine/io.SnapshotWriter grava em disco.
+- GET /api/pro | /api/top10 | /api/audit/summary | /api/health
+  * If-None-Match igual ao ETag -> 304 sem corpo
+  * Accept-Encoding (com q-values, pick_encoding): br / gzip -> corpo pré-comprimido
+- GET /api/pro/delta?since=N: patches de engine/delta posteriores ao seq N
+  ("full": true -> buscar /api/pro de novo)
+- GET /api/stream: Server-Sent Events; cada publish() empurra o snapshot novo
+  para todos os clientes conectados (event: pro | top10 | audit_summary).
+
+O custo por requisição não depende do payload (nada é lido do disco nem
+serializado na hora). O loop asyncio roda numa thread daemon; publish() pode
+ser chamado da thread do worker.
+"""
+
+import asyncio
+import json
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Set, Tuple
+
+from .delta import DeltaLog
+from .io import Snapshot, encode_json, encode_snapshot
+
+ROUTES = {
+    "/api/pro": "pro",
+    "/api/top10": "top10",
+    "/api/audit/summary": "audit_summary",
+    "/audit/summary": "audit_summary",
+}
+
+# preferência do servidor entre codificações de mesmo q (melhor compressão primeiro)
+ENCODINGS = ("br", "gzip", "identity")
+
+
+def pick_encoding(accept: str, available: Tuple[str, ...] = ENCODINGS) -> str:
+    """Melhor codificação de `available` pelo Accept-Encoding (tokens com q-value).
+
+    q=0 recusa; "*" vale para o que não foi citado; identity é aceita salvo
+    recusa explícita. Sem nada aceitável, identity (em vez de 406)."""
+    q: Dict[str, float] = {}
+    for part in (accept or "").split(","):
+        token, _, params = part.partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        val = 1.0
+        for p in params.split(";"):
+            k, _, v = p.partition("=")
+            if k.strip().lower() == "q":
+                try:
+                    val = max(0.0, min(1.0, float(v.strip())))
+                except ValueError:
+                    val = 0.0
+        q["gzip" if token == "x-gzip" else token] = val
+    star = q.get("*")
+    best, best_q = "identity", 0.0
+    for enc in available:
+        # identity não citada: aceitável, mas perde para qualquer compressão aceita
+        v = q.get(enc, star if star is not None else (0.001 if enc == "identity" else 0.0))
+        if v > best_q:
+            best, best_q = enc, v
+    return best
+
+
+SSE_HEARTBEAT_S = 15.0
+SSE_QUEUE_MAX = 16
+
+
+class SnapshotServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 8091):
+        self.host = host
+        self.port = int(port)
+        self._snaps: Dict[str, Snapshot] = {}
+        self._files: Dict[str, Tuple[int, int]] = {}
+        self._subs: Set["asyncio.Queue[Tuple[str, Snapshot]]"] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.delta: Optional[DeltaLog] = None
+
+    # ---------- lado do worker (thread síncrona) ----------
+    def start(self, timeout: float = 5.0) -> None:
+        self._thread = threading.Thread(target=self._run, name="snapshot-server", daemon=True)
+        self._thread.start()
+        self._ready.wait(timeout)
+
+    def publish(self, name: str, obj: Any = None, *, snap: Optional[Snapshot] = None) -> Snapshot:
+        snap = snap or encode_snapshot(obj)
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._set, name, snap)
+        else:
+            self._snaps[name] = snap
+        return snap
+
+    def publish_file(self, name: str, path: Path) -> None:
+        """Publica um JSON do disco só se mudou (tamanho/mtime), ex.: top10_summary.json."""
+        try:
+            st = Path(path).stat()
+            key = (st.st_size, st.st_mtime_ns)
+            if self._files.get(name) == key:
+                return
+            obj = json.loads(Path(path).read_text(encoding="utf-8"))
+            self._files[name] = key
+            self.publish(name, obj)
+        except Exception:
+            return
+
+    # ---------- loop asyncio ----------
+    def _run(self) -> None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            server = loop.run_until_complete(asyncio.start_server(self._handle, self.host, self.port))
+        except Exception as e:
+            print(f"[SERVE] falha ao abrir {self.host}:{self.port}: {e}")
+            self._ready.set()
+            return
+        self._loop = loop
+        self._ready.set()
+        print(f"[SERVE] ouvindo {self.host}:{self.port}")
+        try:
+            loop.run_forever()
+        finally:
+            server.close()
+
+    def _set(self, name: str, snap: Snapshot) -> None:
+        if self._snaps.get(name) is not None and self._snaps[name].etag == snap.etag:
+            return
+        self._snaps[name] = snap
+        for q in list(self._subs):
+            if q.full():
+                try:
+                    q.get_nowait()  # cliente lento: descarta o mais antigo
+                except asyncio.QueueEmpty:
+                    pass
+            q.put_nowait((name, snap))
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                req = await _read_request(reader)
+                if req is None:
+                    break
+                method, path, query, headers = req
+                keep = headers.get("connection", "").lower() != "close"
+                if method not in ("GET", "HEAD"):
+                    await _respond(writer, 405, b'{"ok":false,"error":"METHOD_NOT_ALLOWED"}', keep=keep)
+                elif path == "/api/stream":
+                    await self._stream(writer)
+                    break
+                elif path == "/api/pro/delta":
+                    await self._send_delta(writer, query, keep)
+                elif path == "/api/health":
+                    await _respond(writer, 200, b'{"ok":true,"service":"entrada-pro-worker"}',
+                                   keep=keep, head=method == "HEAD")
+                else:
+                    await self._send_snapshot(writer, method, path, headers, keep)
+                if not keep:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            try:
+                writer.close()
+            except Exception:
+                pass
+
+    async def _send_snapshot(self, writer: asyncio.StreamWriter, method: str, path: str,
+                             headers: Dict[str, str], keep: bool) -> None:
+        name = ROUTES.get(path)
+        if name is None:
+            await _respond(writer, 404, b'{"ok":false,"error":"NOT_FOUND"}', keep=keep)
+            return
+        snap = self._snaps.get(name)
+        if snap is None:
+            await _respond(writer, 503, b'{"ok":false,"error":"FILE_NOT_FOUND"}', keep=keep)
+            return
+        extra = {"ETag": snap.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        inm = headers.get("if-none-match", "")
+        if inm and (inm.strip() == "*" or snap.etag in [x.strip() for x in inm.split(",")]):
+            await _respond(writer, 304, b"", keep=keep, extra=extra)
+            return
+        body = snap.body
+        enc = pick_encoding(headers.get("accept-encoding", ""),
+                            ENCODINGS if snap.br is not None else ("gzip", "identity"))
+        if enc == "br":
+            body = snap.br
+            extra["Content-Encoding"] = "br"
+        elif enc == "gzip":
+            body = snap.gz
+            extra["Content-Encoding"] = "gzip"
+        await _respond(writer, 200, body, keep=keep, extra=extra, head=method == "HEAD")
+
+    async def _send_delta(self, writer: asyncio.StreamWriter, query: Dict[str, str], keep: bool) -> None:
+        if self.delta is None:
+            await _respond(writer, 404, b'{"ok":false,"error":"NOT_FOUND"}', keep=keep)
+            return
+        try:
+            since = int(query.get("since") or 0)
+        except ValueError:
+            since = 0
+        await _respond(writer, 200, encode_json(self.delta.since(since)), keep=keep,
+                       extra={"Cache-Control": "no-cache"})
+
+    async def _stream(self, writer: asyncio.StreamWriter) -> None:
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream; charset=utf-8\r\n"
+            b"Cache-Control: no-cache\r\n"
+            b"Connection: keep-alive\r\n"
+            b"X-Accel-Buffering: no\r\n\r\n"
+        )
+        q: "asyncio.Queue[Tuple[str, Snapshot]]" = asyncio.Queue(maxsize=SSE_QUEUE_MAX)
+        self._subs.add(q)
+        try:
+            # estado atual primeiro, depois só atualizações
+            for name, snap in list(self._snaps.items()):
+                writer.write(_sse(name, snap))
+            await writer.drain()
+            while True:
+                try:
+                    name, snap = await asyncio.wait_for(q.get(), timeout=SSE_HEARTBEAT_S)
+                    writer.write(_sse(name, snap))
+                except asyncio.TimeoutError:
+                    writer.write(b": ping\n\n")
+                await writer.drain()
+        finally:
+            self._subs.discard(q)
+
+
+def _sse(name: str, snap: Snapshot) -> bytes:
+    # JSON compacto nunca tem quebra de linha -> uma única linha data:
+    return b"event: " + name.encode() + b"\nid: " + snap.etag.strip('"').encode() + b"\ndata: " + snap.body + b"\n\n"
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], Dict[str, str]]]:
+    line = await reader.readline()
+    if not line:
+        return None
+    parts = line.decode("latin-1").split()
+    if len(parts) < 2:
+        return None
+    headers: Dict[str, str] = {}
+    while True:
+        h = await reader.readline()
+        if not h or h in (b"\r\n", b"\n"):
+            break
+        k, _, v = h.decode("latin-1").partition(":")
+        headers[k.strip().lower()] = v.strip()
+    path, _, qs = parts[1].partition("?")
+    query = {k: v for k, _, v in (x.partition("=") for x in qs.split("&") if x)}
+    return parts[0].upper(), path, query, headers
+
+
+_REASONS = {200: "OK", 304: "Not Modified", 404: "Not Found", 405: "Method Not Allowed", 503: "Service Unavailable"}
+
+
+async def _respond(writer: asyncio.StreamWriter, status: int, body: bytes, *, keep: bool = True,
+                   extra: Optional[Dict[str, str]] = None, head: bool = False) -> None:
+    lines = [f"HTTP/1.1 {status} {_REASONS.get(status, 'OK')}"]
+    if status != 304:
+        lines.append("Content-Type: application/json; charset=utf-8")
+        lines.append(f"Content-Length: {len(body)}")
+    for k, v in (extra or {}).items():
+        lines.append(f"{k}: {v}")
+    lines.append("Connection: " + ("keep-alive" if keep else "close"))
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+    if body and not head and status != 304:
+        writer.write(body)
+    await writer.drain()
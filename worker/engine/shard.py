@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+"""engine/shard.py
+
+Modo "sharded": N processos worker_pro.py (SHARD_INDEX=0..N-1, SHARD_COUNT=N)
+dividem a lista de moedas por hash estável do PAR; cada um grava só o seu
+pedaço em DATA_DIR/shards/pro_<i>of<N>.json e o worker_merge.py junta tudo
+em pro.json/top10.json.
+
+Arquivo de shard:
+    {
+      "shard": 0, "shards": 4,
+      "written_at": 1717000000.0,
+      "final": true,                  # false = parcial do ciclo em andamento
+      "signals": true,                # false = ciclo só-hot: itens não vão para o log de sinais
+      "payload": {...},               # pro.json do pedaço (já limpo)
+      "prices": [...],                # marks observados no ciclo (log de auditoria)
+      "closes": {PAR: [...]},         # closes de 1h (TOP10 diversificado, engine/diversify)
+      "profiles": {PAR: {perfil: {...}}}  # colunas de cada perfil de limiares (item["_profiles"])
+    }
+
+O merger tolera shard ausente ou atrasado: reaproveita a última saída boa
+daquele shard (em memória ou em disco) e marca os itens como stale quando
+ela passa de `late_s`; moedas de shard que nunca publicou viram placeholder.
+"""
+
+import json
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .io import atomic_write_json
+from .klines import add_stats, new_stats
+
+
+def shard_of(par: str, count: int) -> int:
+    # crc32: estável entre processos/execuções (hash() do Python não é)
+    return zlib.crc32(str(par).upper().encode("utf-8")) % max(1, int(count))
+
+
+def shard_coins(coins: List[str], index: int, count: int) -> List[str]:
+    return [c for c in coins if shard_of(c, count) == int(index)]
+
+
+def shard_path(data_dir: str, index: int, count: int) -> Path:
+    return Path(data_dir) / "shards" / f"pro_{int(index)}of{int(count)}.json"
+
+
+def write_shard(data_dir: str, index: int, count: int, payload: Dict[str, Any], *,
+                prices: List[Dict[str, Any]], final: bool, signals: bool = True,
+                closes: Optional[Dict[str, List[float]]] = None,
+                profiles: Optional[Dict[str, Dict[str, Any]]] = None) -> None:
+    atomic_write_json(shard_path(data_dir, index, count), {
+        "shard": int(index),
+        "shards": int(count),
+        "written_at": time.time(),
+        "final": bool(final),
+        "signals": bool(signals),
+        "payload": payload,
+        "prices": list(prices or []),
+        "closes": dict(closes or {}),
+        "profiles": dict(profiles or {}),
+    })
+
+
+class ShardMerger:
+    def __init__(self, data_dir: str, count: int, *, late_s: float = 600.0):
+        self.data_dir = data_dir
+        self.count = max(1, int(count))
+        self.late_s = float(late_s)
+        self._last: Dict[int, Dict[str, Any]] = {}   # última saída boa de cada shard
+        self._seen: Dict[int, float] = {}            # written_at já entregue ao merge
+        self._logged: Dict[int, float] = {}          # written_at (final) já enviado à auditoria
+
+    def _read(self, index: int) -> Optional[Dict[str, Any]]:
+        try:
+            doc = json.loads(shard_path(self.data_dir, index, self.count).read_text(encoding="utf-8"))
+            if int(doc.get("shards") or 0) != self.count or not isinstance(doc.get("payload"), dict):
+                return None
+            self._last[index] = doc
+        except Exception:
+            pass  # ausente/ilegível: fica com a última saída boa
+        return self._last.get(index)
+
+    def merge(self, coins: List[str], placeholder: Callable[[str], Dict[str, Any]], *,
+              force: bool = False) -> Optional[Dict[str, Any]]:
+        """Payload no formato de worker_pro.build_payload ("_prices"/"_signals"/"_closes" privados),
+        ou None se nenhum shard mudou desde o último merge (e não for `force`)."""
+        now = time.time()
+        docs = {i: self._read(i) for i in range(self.count)}
+        stamp = {i: float(d.get("written_at") or 0.0) for i, d in docs.items() if d is not None}
+        if not force and stamp == self._seen:
+            return None
+        self._seen = stamp
+
+        by_par: Dict[str, Dict[str, Any]] = {}
+        prices: List[Dict[str, Any]] = []
+        signals: List[Dict[str, Any]] = []
+        closes: Dict[str, List[float]] = {}
+        missing: List[int] = []
+        late: List[int] = []
+        meta: Dict[str, Any] = {}
+        miss_mark = miss_kl = 0
+        integrity = new_stats()
+        partial = False
+        full_cycle = False  # algum shard entregou ciclo final completo (não só-hot)
+        newest = -1.0
+
+        for i in range(self.count):
+            doc = docs[i]
+            if doc is None:
+                missing.append(i)
+                partial = True
+                continue
+            p = doc["payload"]
+            age = max(0.0, now - stamp[i])
+            is_late = age > self.late_s
+            if is_late:
+                late.append(i)
+            if stamp[i] > newest:
+                newest, meta = stamp[i], p
+            miss_mark += int(p.get("miss_mark") or 0)
+            miss_kl += int(p.get("miss_klines") or 0)
+            add_stats(integrity, p.get("klines_integrity"))
+            partial = partial or bool(p.get("partial")) or not doc.get("final")
+            closes.update(doc.get("closes") or {})
+
+            fresh_final = bool(doc.get("final")) and self._logged.get(i) != stamp[i]
+            if fresh_final:
+                self._logged[i] = stamp[i]
+                prices.extend(doc.get("prices") or [])
+                full_cycle = full_cycle or bool(doc.get("signals", True))
+            profiles = doc.get("profiles") or {}
+            for it in p.get("items") or []:
+                it = dict(it)
+                if it.get("par") in profiles:
+                    it["_profiles"] = profiles[it.get("par")]
+                if is_late:
+                    it["stale"] = True
+                    it["stale_age_s"] = max(int(it.get("stale_age_s") or 0), int(age))
+                by_par[str(it.get("par"))] = it
+                if fresh_final and doc.get("signals", True) and not it.get("stale"):
+                    signals.append(it)
+
+        # a lista de moedas manda: moeda nova (ou de shard ausente) sai como placeholder
+        items = [by_par.get(par) or placeholder(par) for par in coins]
+        items.sort(key=lambda x: x.get("par") or "")
+
+        out = {k: v for k, v in meta.items() if k not in ("items", "seq")}
+        out.update({
+            "ok": True,
+            "miss_mark": miss_mark,
+            "miss_klines": miss_kl,
+            "klines_integrity": integrity,
+            "partial": partial,
+            "stale_count": sum(1 for it in items if it.get("stale")),
+            "warm": any(bool((d or {}).get("payload", {}).get("warm")) for d in docs.values()),
+            "shards": {"count": self.count, "missing": missing, "late": late},
+            "items": items,
+            "_prices": prices,
+            "_signals": signals,
+            "_closes": closes,
+            "_hot": not full_cycle,  # make_publisher: fora do arquivo histórico
+        })
+        return out
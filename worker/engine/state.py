@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+"""engine/state.py
+
+Checkpoint do estado do worker para "warm start" depois de restart/deploy.
+
+Gravado ao fim de cada ciclo (um único arquivo, atômico):
+
+    {
+      "version": 1,
+      "saved_at": 1717000000.0,
+      "cache": {...},                         # LastGoodCache.to_json(): marks + klines 1h/4h
+      "last_good": {"BTC": [item, ts], ...}   # último item bom de cada moeda (= payload anterior)
+    }
+
+Na subida o worker restaura o cache e o last_good e publica na hora um
+payload "warm" (itens do checkpoint marcados stale com a idade real); o
+primeiro ciclo completo substitui moeda a moeda pelos parciais normais.
+Os indicadores são recalculados dos klines do cache, não há estado próprio.
+"""
+
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from .cache import LastGoodCache
+from .io import atomic_write_json
+
+CHECKPOINT_VERSION = 1
+
+LastGood = Dict[str, Tuple[Dict[str, Any], float]]
+
+
+def save_checkpoint(path: Path, *, cache: Optional[LastGoodCache], last_good: LastGood) -> None:
+    atomic_write_json(Path(path), {
+        "version": CHECKPOINT_VERSION,
+        "saved_at": time.time(),
+        "cache": cache.to_json() if cache is not None else None,
+        "last_good": {par: [item, ts] for par, (item, ts) in list(last_good.items())},
+    })
+
+
+def load_checkpoint(path: Path, *, cache: Optional[LastGoodCache], last_good: LastGood) -> bool:
+    """Restaura cache/last_good a partir do checkpoint. False se não existe/é inválido."""
+    try:
+        obj = json.loads(Path(path).read_text(encoding="utf-8"))
+    except Exception:
+        return False
+    if not isinstance(obj, dict) or obj.get("version") != CHECKPOINT_VERSION:
+        return False
+
+    if cache is not None and obj.get("cache"):
+        cache.load_json(obj["cache"])
+    for par, row in (obj.get("last_good") or {}).items():
+        try:
+            item, ts = row
+            if isinstance(item, dict):
+                last_good[str(par)] = (item, float(ts))
+        except Exception:
+            continue
+    return True
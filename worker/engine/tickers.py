@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+"""engine/tickers.py
+
+Snapshot em lote dos tickers de perps, 1 requisição por exchange por ciclo:
+
+    BYBIT    /v5/market/tickers?category=linear   mark, index, funding, próximo
+                                                  funding, open interest, giro 24h
+    BINANCE  /fapi/v1/premiumIndex (sem symbol)   mark, index, funding, próximo funding
+
+O worker tira o mark daqui (nenhuma requisição por moeda quando o PAR está no
+snapshot) e de brinde ganha os campos de mercado de cada item:
+
+    funding_rate_pct, next_funding_at, index_price, basis_pct,
+    open_interest_usdt, turnover_24h_usdt
+
+que também alimentam os filtros opcionais do build_signal (funding extremo,
+giro baixo). Snapshot mais velho que max_age_s não é usado: o worker volta ao
+mark por símbolo (engine/exchanges.fetch_mark_price) como antes.
+
+Preço de consenso (padrão; settings "price_consensus": false desliga): os dois
+snapshots são buscados em paralelo e o preço de cada moeda é a mediana de
+mark + index de todas as exchanges que a listam (já na unidade do contrato da
+1ª fonte: 1000BONK x BONK via multiplicador de engine/instruments). Valor a
+mais de reject_pct% da mediana é descartado (print ruim de uma exchange não
+vira "atual"/"alvo"/"entrada") e a mediana é refeita só com o que sobrou.
+Campos extras do item: price_venues, price_spread_pct (maior distância entre
+os marks das exchanges) e price_diverged (spread > diverge_pct ou algum valor
+descartado). index_price/basis_pct continuam sendo os da 1ª fonte (mark e
+index da mesma exchange). price_source vira a lista de fontes usadas ("BYBIT+BINANCE").
+"""
+
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .exchanges import binance_tickers, bybit_tickers
+from .instruments import get_instruments
+
+MAX_AGE_S = 120.0
+REJECT_PCT = 1.0    # distância da mediana para descartar um valor
+DIVERGE_PCT = 0.25  # spread entre marks das exchanges que marca price_diverged
+
+Fetcher = Callable[[], Dict[str, Dict[str, Any]]]
+FETCHERS: Dict[str, Fetcher] = {"BYBIT": bybit_tickers, "BINANCE": binance_tickers}
+
+
+class TickerBoard:
+    def __init__(self, *, max_age_s: float = MAX_AGE_S, consensus: bool = True,
+                 reject_pct: float = REJECT_PCT, diverge_pct: float = DIVERGE_PCT):
+        self.max_age_s = float(max_age_s)
+        self.configure(consensus=consensus, reject_pct=reject_pct, diverge_pct=diverge_pct)
+        self._snap: Dict[str, Dict[str, Dict[str, Any]]] = {}  # fonte -> símbolo -> ticker
+        self._at: Dict[str, float] = {}                         # fonte -> epoch do snapshot
+        self._memo: Dict[str, Optional[Dict[str, Any]]] = {}    # PAR -> ticker (até o próximo refresh)
+        self._lock = threading.Lock()
+
+    def configure(self, *, consensus: bool, reject_pct: float, diverge_pct: float) -> None:
+        self.consensus = bool(consensus)
+        self.reject_pct = max(0.0, float(reject_pct))
+        self.diverge_pct = max(0.0, float(diverge_pct))
+        self._memo = {}
+
+    def refresh(self, fetchers: Optional[Dict[str, Fetcher]] = None) -> None:
+        """Busca o snapshot de cada fonte EM PARALELO; falha mantém o anterior (que envelhece sozinho)."""
+        fetchers = FETCHERS if fetchers is None else fetchers
+        if not fetchers:
+            return
+
+        def _one(fn: Fetcher) -> Optional[Dict[str, Dict[str, Any]]]:
+            try:
+                return fn()
+            except Exception:
+                return None
+
+        with ThreadPoolExecutor(max_workers=len(fetchers), thread_name_prefix="tickers") as pool:
+            got = dict(zip(fetchers, pool.map(_one, fetchers.values())))
+        with self._lock:
+            for src, snap in got.items():
+                if snap:
+                    self._snap[src] = snap
+                    self._at[src] = time.time()
+            self._memo = {}
+
+    def _venues(self, par: str, now: float) -> List[Tuple[str, Dict[str, Any], float]]:
+        """[(fonte, ticker, fator para a unidade da 1ª fonte)] com mark > 0 em snapshot fresco."""
+        inst = get_instruments()
+        out = []
+        base_mult = None
+        for src, symbol in inst.sources(par):
+            if now - self._at.get(src, 0.0) > self.max_age_s:
+                continue
+            t = (self._snap.get(src) or {}).get(symbol)
+            if not t or (t.get("mark") or 0.0) <= 0:
+                continue
+            mult = float(inst.multiplier(par, src) or 1)
+            base_mult = mult if base_mult is None else base_mult
+            out.append((src, t, base_mult / mult))
+        return out
+
+    def ticker(self, par: str) -> Optional[Dict[str, Any]]:
+        """Ticker da moeda: com consenso, "mark" é o preço de consenso entre as exchanges;
+        sem, é o da primeira fonte (ordem de engine/instruments). None = fora dos snapshots."""
+        with self._lock:
+            if par in self._memo:
+                hit = self._memo[par]
+                return dict(hit) if hit is not None else None
+            venues = self._venues(par, time.time())
+            out = None
+            if venues:
+                src, first, _ = venues[0]
+                out = dict(first, source=src, unit_source=src)  # unit_source: unidade do "mark"
+                if self.consensus:
+                    # mark/index da MESMA exchange ficam para o basis (market_fields)
+                    out["venue_mark"] = first["mark"]
+                    out.update(self._consensus(venues))
+                    # campo que a 1ª fonte não informa (giro/OI na Binance) vem das outras
+                    for _src, t, f in venues[1:]:
+                        for k in ("open_interest_usdt", "turnover_24h"):
+                            if out.get(k) is None and t.get(k) is not None:
+                                out[k] = t[k]
+            self._memo[par] = out
+            return dict(out) if out is not None else None
+
+    def _consensus(self, venues: List[Tuple[str, Dict[str, Any], float]]) -> Dict[str, Any]:
+        vals: List[Tuple[str, float]] = []
+        marks: List[float] = []
+        for src, t, f in venues:
+            marks.append(float(t["mark"]) * f)
+            vals.append((src, float(t["mark"]) * f))
+            if (t.get("index") or 0.0) > 0:
+                vals.append((src, float(t["index"]) * f))
+        med = statistics.median(v for _, v in vals)
+        keep = [(s, v) for s, v in vals if abs(v - med) / med * 100.0 <= self.reject_pct] if self.reject_pct > 0 else vals
+        rejected = len(vals) - len(keep)
+        px = statistics.median(v for _, v in keep) if keep else med
+        spread = (max(marks) - min(marks)) / px * 100.0 if len(marks) > 1 else 0.0
+        used = [s for s, _, _ in venues if any(s == k for k, _ in keep)]
+        return {
+            "mark": px,
+            "source": "+".join(used) or venues[0][0],
+            "venues": len(venues),
+            "spread_pct": round(spread, 6),
+            "diverged": bool(rejected or spread > self.diverge_pct),
+        }
+
+    def price_in(self, par: str, source: str) -> float:
+        """Mark (consenso, se ligado) na unidade do contrato de `source`; 0.0 = fora dos snapshots."""
+        t = self.ticker(par)
+        if t is None:
+            return 0.0
+        inst = get_instruments()
+        return float(t["mark"]) * float(inst.multiplier(par, source) or 1) / float(inst.multiplier(par, t["unit_source"]) or 1)
+
+    def consensus_all(self, pars: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """ticker() de várias moedas de uma vez (só as que estão nos snapshots)."""
+        out = {}
+        for par in pars:
+            t = self.ticker(par)
+            if t is not None:
+                out[par] = t
+        return out
+
+
+def market_fields(ticker: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Campos de mercado do item (só os que a fonte informa)."""
+    if not ticker:
+        return {}
+    out: Dict[str, Any] = {}
+    # basis de UMA exchange (mark e index dela), nunca consenso menos index de outra fonte
+    mark, index = ticker.get("venue_mark", ticker.get("mark")) or 0.0, ticker.get("index") or 0.0
+    if ticker.get("funding_rate") is not None:
+        out["funding_rate_pct"] = round(float(ticker["funding_rate"]) * 100.0, 6)
+    if ticker.get("next_funding_ms"):
+        out["next_funding_at"] = (datetime.fromtimestamp(float(ticker["next_funding_ms"]) / 1000.0, tz=timezone.utc)
+                                  .isoformat().replace("+00:00", "Z"))
+    if index > 0:
+        out["index_price"] = float(index)
+        out["basis_pct"] = round((mark - index) / index * 100.0, 6)
+    if ticker.get("open_interest_usdt") is not None:
+        out["open_interest_usdt"] = float(ticker["open_interest_usdt"])
+    if ticker.get("turnover_24h") is not None:
+        out["turnover_24h_usdt"] = float(ticker["turnover_24h"])
+    if "venues" in ticker:
+        out["price_venues"] = int(ticker["venues"])
+        out["price_spread_pct"] = float(ticker["spread_pct"])
+        out["price_diverged"] = bool(ticker["diverged"])
+    return out
+
+
+def configure_tickers(settings: Dict[str, Any]) -> Optional[TickerBoard]:
+    """Board configurado pelas settings (bulk_tickers/price_consensus/consensus_*_pct);
+    None com "bulk_tickers": false (quem chama usa o mark por símbolo)."""
+    if not settings.get("bulk_tickers", True):
+        return None
+    board = get_tickers()
+    board.configure(consensus=bool(settings.get("price_consensus", True)),
+                    reject_pct=float(settings.get("consensus_reject_pct", REJECT_PCT)),
+                    diverge_pct=float(settings.get("consensus_diverge_pct", DIVERGE_PCT)))
+    return board
+
+
+_BOARD: Optional[TickerBoard] = None
+_BOARD_LOCK = threading.Lock()
+
+
+def get_tickers() -> TickerBoard:
+    global _BOARD
+    with _BOARD_LOCK:
+        if _BOARD is None:
+            _BOARD = TickerBoard()
+        return _BOARD
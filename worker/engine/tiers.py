@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+"""engine/tiers.py
+
+Cadência de atualização por moeda (settings "tiered_refresh": true):
+
+- hot:  está no TOP10, tem sinal aberto na auditoria (audit/top10_open.json)
+        ou está perto dos mínimos de GANHO/ASSERT -> mark a cada hot_refresh_s
+        (30–60 s), recalculado com os klines do cache. Vale também para NÃO
+        ENTRAR logo abaixo dos mínimos (valores brutos _ganho_raw/_assert_raw
+        do item, já que o item NÃO ENTRAR sai com ganho/assert zerados)
+- warm: sinal válido (LONG/SHORT) fora do grupo hot -> ciclo normal de 5 min
+- cold: demais NÃO ENTRAR ou ASSERT bem abaixo do mínimo -> só recalcula quando
+        fecha um candle novo de 1h (no resto dos ciclos repete o último item)
+
+A classificação sai sozinha do último payload + top10_open.json; moeda sem
+item anterior é tratada como warm.
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+HOT, WARM, COLD = "hot", "warm", "cold"
+
+BAR_S = 3600  # candle de referência para as moedas cold (1h)
+
+
+def open_signal_pars(data_dir: str) -> Set[str]:
+    try:
+        rows = json.loads((Path(data_dir) / "audit" / "top10_open.json").read_text(encoding="utf-8"))
+        return {str(x.get("par")) for x in rows if isinstance(x, dict) and x.get("par")}
+    except Exception:
+        return set()
+
+
+def classify(items: Iterable[Dict], *, top10: Iterable[str], open_pars: Set[str],
+             gain_min: float, assert_min: float, near_gain_pct: float = 0.5,
+             near_assert_pct: float = 5.0, cold_assert_gap: float = 15.0) -> Dict[str, str]:
+    hot = set(top10) | set(open_pars)
+    out: Dict[str, str] = {}
+    for it in items:
+        par = str(it.get("par") or "")
+        if not par:
+            continue
+        if par in hot:
+            out[par] = HOT
+            continue
+        side = it.get("side")
+        # NÃO ENTRAR sai com ganho/assert zerados: vale o valor bruto do sinal
+        ganho = float(it.get("_ganho_raw", it.get("ganho_pct")) or 0.0)
+        assert_pct = float(it.get("_assert_raw", it.get("assert_pct")) or 0.0)
+        if side not in ("LONG", "SHORT"):
+            # logo abaixo dos mínimos (nos dois critérios): pode virar sinal no próximo mark
+            below = "_ganho_raw" in it and ganho >= gain_min - near_gain_pct and assert_pct >= assert_min - near_assert_pct
+            out[par] = HOT if below else COLD
+        elif assert_pct < assert_min - cold_assert_gap:
+            out[par] = COLD
+        elif abs(ganho - gain_min) <= near_gain_pct or abs(assert_pct - assert_min) <= near_assert_pct:
+            out[par] = HOT
+        else:
+            out[par] = WARM
+    # moedas de shard/lista que ainda não têm item: warm
+    for par in hot:
+        out.setdefault(par, HOT)
+    return out
+
+
+def due_coins(coins: List[str], tiers: Dict[str, str], computed_at: Dict[str, float], now: float) -> List[str]:
+    """Moedas do ciclo completo: hot + warm + cold cujo candle de 1h fechou desde o último cálculo."""
+    out = []
+    for par in coins:
+        t = tiers.get(par, WARM)
+        last = computed_at.get(par)
+        if t != COLD or last is None or int(last // BAR_S) != int(now // BAR_S):
+            out.append(par)
+    return out
+
+
+def counts(tiers: Dict[str, str], coins: Optional[List[str]] = None) -> Dict[str, int]:
+    keys = coins if coins is not None else list(tiers)
+    out = {HOT: 0, WARM: 0, COLD: 0}
+    for par in keys:
+        out[tiers.get(par, WARM)] += 1
+    return out
@@ -3,12 +3,17 @@ import os
 import time
 
 from engine.audit_top10 import run_audit_top10
+from engine.config import load_settings
+from engine.profiling import cycle_profiler
 
 def main() -> None:
     data_dir = os.environ.get("DATA_DIR", "/opt/ENTRADA-PRO/data").strip()
+    # perfil opcional por ciclo (PROFILE=cprofile|tracemalloc|both; engine/profiling)
+    profiler = cycle_profiler("worker_audit_top10", load_settings())
     while True:
         try:
-            run_audit_top10(data_dir=data_dir)
+            with profiler.cycle():
+                run_audit_top10(data_dir=data_dir)
         except Exception:
             pass
         time.sleep(900)
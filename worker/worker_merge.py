@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# worker/worker_merge.py
+# Modo sharded (SHARD_COUNT=N): junta data/shards/pro_<i>of<N>.json gravados
+# pelos N worker_pro.py (SHARD_INDEX=0..N-1) em data/pro.json + data/top10.json.
+# - FULL continua em ordem alfabética; TOP10 pela mesma regra de build_top10
+# - shard ausente/atrasado: reaproveita a última saída dele (itens stale)
+# - log de auditoria é gravado só aqui (um escritor), 1x por ciclo final de cada shard
+
+import os
+import time
+from typing import Dict
+
+from engine.config import load_settings, get_coins
+from engine.shard import ShardMerger
+from worker_pro import (
+    DATA_DIR, _now_brt, _stale_item, _ttl_iso,
+    make_publisher, make_recorder, record_cycle, shard_config,
+)
+
+
+def _placeholder(par: str) -> Dict:
+    # moeda sem nenhuma saída de shard ainda: mesma linha "sem números" do worker
+    _, date_brt, time_brt = _now_brt()
+    return _stale_item(par, None, time.time(), date_brt=date_brt, time_brt=time_brt, ttl=_ttl_iso(6))
+
+
+def main():
+    settings = load_settings()
+    shard = shard_config(settings)
+    if shard is None:
+        raise SystemExit("worker_merge.py só faz sentido com SHARD_COUNT > 1")
+
+    merger = ShardMerger(DATA_DIR, shard[1], late_s=float(settings.get("shard_late_s", 600)))
+    publish = make_publisher(settings)
+    recorder = make_recorder(settings)
+    every_s = float(settings.get("merge_interval_s", 10))
+
+    while True:
+        raw = merger.merge(get_coins(load_settings()), _placeholder)
+        if raw is not None:
+            payload = publish(raw)
+            if raw["_prices"] or raw["_signals"]:
+                record_cycle(recorder, raw, payload, signals=raw["_signals"])
+        time.sleep(every_s)
+
+
+if __name__ == "__main__":
+    main()
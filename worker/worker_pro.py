@@ -7,29 +7,41 @@
 # - 1 linha por moeda
 # - Fallback B do mark_price é tratado dentro do build_signal (compute.py)
 
-import json
+import math
 import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timedelta, timezone
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 from zoneinfo import ZoneInfo
 
-from engine.config import load_settings, get_thresholds, get_coins
+from engine.config import load_settings, get_thresholds, get_coins, get_profiles
 from engine.exchanges import fetch_mark_price, fetch_klines
-from engine.compute import build_signal
+from engine.compute import Signal, finish_signal, prepare_signal
+from engine.archive import SnapshotArchive
+from engine.audit import AuditRecorder
+from engine.cache import LastGoodCache
+from engine.delta import DeltaLog
+from engine.diversify import CLOSES_KEEP, DEFAULT_WINDOW, pick_diversified
+from engine.instruments import default_symbol, get_instruments
+from engine.io import SnapshotWriter
+from engine.klines import add_stats, new_stats, validate_klines
+from engine.profiling import cycle_profiler
+from engine.serve import SnapshotServer
+from engine.shard import shard_coins, write_shard
+from engine.state import load_checkpoint, save_checkpoint
+from engine.tickers import configure_tickers, get_tickers, market_fields
+from engine.tiers import HOT, classify, counts, due_coins, open_signal_pars
 
 DATA_DIR = os.getenv("DATA_DIR", "/opt/ENTRADA-PRO/data")
 TZ_BRT = ZoneInfo("America/Sao_Paulo")
+FULL_CYCLE_S = 300  # ciclo completo (5 min)
 
 def _sym(par: str) -> str:
-    p = par.upper()
-    mult = {
-        "BONK": "1000BONK",
-        "FLOKI": "1000FLOKI",
-        "PEPE": "1000PEPE",
-        "SHIB": "1000SHIB",
-    }
-    base = mult.get(p, p)
-    return f"{base}USDT"
+    # símbolo "canônico" (chave do cache); o de cada exchange vem de engine/instruments
+    return default_symbol(par)
 
 def _now_brt():
     dt = datetime.now(TZ_BRT)
@@ -40,9 +52,9 @@ def _ttl_iso(minutes: int = 6) -> str:
     return (datetime.now(timezone.utc) + timedelta(minutes=minutes)).isoformat().replace("+00:00", "Z")
 
 
-def _safe_mark(symbol: str) -> Tuple[float, str]:
-    # tenta BYBIT primeiro, depois BINANCE
-    for src in ("BYBIT", "BINANCE"):
+def _safe_mark(par: str) -> Tuple[float, str]:
+    # tenta BYBIT primeiro, depois BINANCE (só onde o PAR está listado)
+    for src, symbol in get_instruments().sources(par):
         try:
             px = fetch_mark_price(symbol, source=src, timeout=5)
             if px is not None and float(px) > 0:
@@ -52,10 +64,18 @@ def _safe_mark(symbol: str) -> Tuple[float, str]:
     return 0.0, "NONE"
 
 
-def _safe_klines(symbol: str, interval: str, limit: int = 220):
-    for src in ("BYBIT", "BINANCE"):
+def _safe_klines(par: str, interval: str, limit: int = 220, stats: Optional[Dict[str, int]] = None):
+    # com open time: ordem/duplicados/desalinhados/buracos tratados em engine/klines
+    for src, symbol in get_instruments().sources(par):
         try:
-            kl = fetch_klines(symbol, interval=interval, limit=limit, source=src, timeout=10)
+            rows = fetch_klines(symbol, interval=interval, limit=limit, source=src, timeout=10, with_time=True)
+
+            def _range(start_ms: int, end_ms: int, symbol=symbol, src=src):
+                n = min(1000, int(limit))
+                return fetch_klines(symbol, interval=interval, limit=n, source=src, timeout=10,
+                                    start_ms=start_ms, end_ms=end_ms, with_time=True)
+
+            kl = validate_klines(rows or [], interval, limit=limit, fetch_range=_range, stats=stats)
             if kl and len(kl) >= 20:
                 return kl, src
         except Exception:
@@ -63,6 +83,66 @@ def _safe_klines(symbol: str, interval: str, limit: int = 220):
     return None, "NONE"
 
 
+def _mark_swr(par: str, cache: Optional[LastGoodCache]) -> Tuple[float, str, float]:
+    """_safe_mark + último mark bom (engine/cache). Retorna (px, fonte, idade_s)."""
+    if cache is None:
+        px, src = _safe_mark(par)
+        return px, src, 0.0
+    symbol = _sym(par)
+    key = ("mark", symbol)
+    if cache.backing_off(key):
+        hit = cache.get_mark(symbol)
+        if hit is not None:
+            cache.revalidate(key, lambda: _safe_mark(par))
+            return hit
+    px, src = _safe_mark(par)
+    if px > 0:
+        cache.put_mark(symbol, px, src)
+        return px, src, 0.0
+    cache.fail(key)
+    hit = cache.get_mark(symbol)
+    if hit is not None:
+        cache.revalidate(key, lambda: _safe_mark(par))
+        return hit
+    return 0.0, "NONE", 0.0
+
+
+def _mark_board(par: str, cache: Optional[LastGoodCache]) -> Tuple[float, str, float, Optional[Dict]]:
+    """Mark do snapshot em lote (engine/tickers, sem requisição por moeda); fora dele, _mark_swr.
+    Retorna (px, fonte, idade_s, ticker)."""
+    tick = get_tickers().ticker(par)
+    if tick is None:
+        return (*_mark_swr(par, cache), None)
+    if cache is not None:
+        cache.put_mark(_sym(par), float(tick["mark"]), tick["source"])
+    return float(tick["mark"]), tick["source"], 0.0, tick
+
+
+def _klines_swr(par: str, interval: str, cache: Optional[LastGoodCache], limit: int = 220,
+                stats: Optional[Dict[str, int]] = None):
+    """_safe_klines + últimos klines bons (engine/cache). Retorna (klines, fonte, idade_s)."""
+    if cache is None:
+        kl, src = _safe_klines(par, interval, limit, stats)
+        return kl, src, 0.0
+    symbol = _sym(par)
+    key = (interval, symbol)
+    if cache.backing_off(key):
+        hit = cache.get_klines(symbol, interval)
+        if hit is not None:
+            cache.revalidate(key, lambda: _safe_klines(par, interval, limit))
+            return hit
+    kl, src = _safe_klines(par, interval, limit, stats)
+    if kl:
+        cache.put_klines(symbol, interval, kl, src)
+        return kl, src, 0.0
+    cache.fail(key)
+    hit = cache.get_klines(symbol, interval)
+    if hit is not None:
+        cache.revalidate(key, lambda: _safe_klines(par, interval, limit))
+        return hit
+    return None, "NONE", 0.0
+
+
 def _mk_item(
     par: str,
     side: str,
@@ -76,6 +156,7 @@ def _mk_item(
     price_source: str,
     ttl_expira_em: str,
     nao_entrar_motivo: str = "",
+    data_age_s: float = 0.0,
 ) -> Dict:
     # REGRA FORÇADA: NÃO ENTRAR => não exibir números no FULL
     if side == "NÃO ENTRAR":
@@ -101,6 +182,11 @@ def _mk_item(
         # Mantido por compatibilidade: agora sempre vazio
         "nao_entrar_motivo": "",
         "ttl_expira_em": ttl_expira_em,
+        # item repetido do último ciclo bom (moeda não terminou no prazo)
+        "stale": False,
+        "stale_age_s": 0,
+        # idade do dado mais velho usado (mark/klines vindos do cache); 0 = tudo fresco
+        "data_age_s": int(data_age_s or 0),
     }
 
 
@@ -119,98 +205,202 @@ def _prazo_min(p: str) -> float:
     return 1e9
 
 
-def build_payload() -> Dict:
-    settings = load_settings()
-    gain_min, assert_min = get_thresholds(settings)  # mantidos no payload (info)
-    coins = get_coins(settings)
-
-    dt_brt, date_brt, time_brt = _now_brt()
-    ttl = _ttl_iso(6)
+def _fetch_coin(par: str, *, cache: Optional[LastGoodCache] = None, marks_only: bool = False) -> Dict:
+    """Estágio de busca (só I/O): mark + klines 1h/4h de UMA moeda.
+    marks_only: só o mark é buscado; klines vêm do cache (se houver)."""
+    mark, mark_src, age_m, tick = _mark_board(par, cache)
+    hit1 = hit4 = None
+    if marks_only and cache is not None:
+        hit1, hit4 = cache.get_klines(_sym(par), "1h"), cache.get_klines(_sym(par), "4h")
+    integrity = new_stats()
+    k1, _src1, age_1 = hit1 if hit1 is not None else _klines_swr(par, "1h", cache, 220, integrity)
+    k4, _src4, age_4 = hit4 if hit4 is not None else _klines_swr(par, "4h", cache, 220, integrity)
+    return {"mark": mark, "mark_src": mark_src, "age_m": age_m, "k1": k1, "k4": k4,
+            "age": max(age_m, age_1, age_4), "ticker": tick, "integrity": integrity}
+
+
+def _compute_coin(par: str, fetched: Dict, *, gain_min: float, assert_min: float,
+                  date_brt: str, time_brt: str, ttl: str,
+                  max_funding_pct: float = 0.0, min_turnover_usdt: float = 0.0,
+                  profiles: Optional[Dict[str, Dict[str, float]]] = None) -> Dict:
+    """Estágio de cálculo (só CPU): sinal + item do painel a partir do que _fetch_coin trouxe.
+    `profiles` (engine/config.get_profiles): limiares extras sobre a mesma direção/ATR."""
+    mark, mark_src, k1, k4 = fetched["mark"], fetched["mark_src"], fetched["k1"], fetched["k4"]
+    price = None
+    if mark > 0 and fetched["age_m"] <= 0:
+        # só preço observado AGORA vai para o log de auditoria
+        price = {"par": par, "atual": float(mark), "price_source": mark_src}
+
+    miss_mark = mark <= 0
+    miss_kl = (not k1) or (not k4)
+    market = market_fields(fetched.get("ticker"))
+
+    # FALLBACK: se mark vier 0/None, usa último close do 4h (senão 1h)
+    if (not mark) or float(mark) <= 0:
+        try:
+            if k4 and len(k4) >= 2:
+                mark = float(k4[-1][3])
+            elif k1 and len(k1) >= 2:
+                mark = float(k1[-1][3])
+        except Exception:
+            pass
 
+    # Sempre calcula (sem "NÃO ENTRAR"). Direção/ATR 1x; limiares por perfil.
+    prep = prepare_signal(par, ohlc_1h=(k1 or []), ohlc_4h=(k4 or []), mark_price=float(mark or 0.0))
+    sig = finish_signal(
+        prep,
+        par,
+        gain_min_pct=float(gain_min),
+        assert_min_pct=float(assert_min),
+        market=market,
+        max_funding_pct=float(max_funding_pct),
+        min_turnover_usdt=float(min_turnover_usdt),
+    )
+
+    # segurança operacional (NÃO ENTRAR por instabilidade)
+    nao_motivo = ""
+    if (mark_src == "NONE") or (not mark) or (float(mark) <= 0):
+        side = "NÃO ENTRAR"
+        nao_motivo = "SEM_PRECO_ATUAL"
+    elif (not k1) or (not k4):
+        side = "NÃO ENTRAR"
+        nao_motivo = "SEM_KLINES"
+    elif sig.side in ("LONG","SHORT"):
+        side = sig.side
+    else:
+        side = "NÃO ENTRAR"
+        nao_motivo = "SINAL_INVALIDO"
+
+    # SAÍDA FINAL (não depende de mutar sig)
+    if side == "NÃO ENTRAR":
+        out_atual = 0.0
+        out_alvo = 0.0
+        out_ganho = 0.0
+        out_assert = 0.0
+        out_prazo = "-"
+    else:
+        out_atual = sig.atual
+        out_alvo = sig.alvo
+        out_ganho = sig.ganho_pct
+        out_assert = sig.assert_pct
+        out_prazo = sig.prazo
+
+    item = _mk_item(
+        par=par,
+        side=side,
+        atual=out_atual,
+        alvo=out_alvo,
+        ganho_pct=out_ganho,
+        assert_pct=out_assert,
+        data=date_brt,
+        hora=time_brt,
+        prazo=out_prazo,
+        price_source=mark_src,
+        ttl_expira_em=ttl,
+        data_age_s=fetched["age"],
+    )
+    item.update(market)
+    usable = mark_src != "NONE" and bool(mark) and float(mark) > 0 and bool(k1) and bool(k4)
+    if usable:
+        # privado (sai no _clean_item): ganho/assert antes de NÃO ENTRAR zerar, para
+        # o engine/tiers achar a moeda logo abaixo dos mínimos
+        item["_ganho_raw"] = float(sig.ganho_pct)
+        item["_assert_raw"] = float(sig.assert_pct)
+    if profiles:
+        # privado (sai no _clean_item): colunas de cada perfil, ver profile_payload
+        item["_profiles"] = {
+            name: _signal_fields(finish_signal(
+                prep, par, gain_min_pct=p["gain_min_pct"], assert_min_pct=p["assert_min_pct"], market=market,
+                max_funding_pct=p["filter_max_funding_pct"], min_turnover_usdt=p["filter_min_turnover_usdt"],
+            ), usable)
+            for name, p in profiles.items()
+        }
+    if k1:
+        # privado (sai no _clean_item): closes de 1h para a diversificação do TOP10
+        item["_closes_1h"] = [float(k[3]) for k in k1[-CLOSES_KEEP:]]
+    return {"item": item, "price": price, "miss_mark": miss_mark, "miss_kl": miss_kl,
+            "integrity": fetched.get("integrity")}
+
+
+def _signal_fields(sig: Optional[Signal], usable: bool) -> Dict:
+    """Colunas que dependem dos limiares, com a mesma regra do item principal."""
+    if sig is None or not usable or sig.side not in ("LONG", "SHORT"):
+        return {"side": "NÃO ENTRAR", "atual": 0.0, "alvo": 0.0, "ganho_pct": 0.0, "assert_pct": 0.0,
+                "prazo": "-", "ttl_h": "-"}
+    return {"side": sig.side, "atual": float(sig.atual), "alvo": float(sig.alvo),
+            "ganho_pct": float(sig.ganho_pct), "assert_pct": float(sig.assert_pct),
+            "prazo": sig.prazo or "-", "ttl_h": sig.prazo or "-"}
+
+
+def _stale_item(par: str, last: Optional[Tuple[Dict, float]], now: float, *,
+                date_brt: str, time_brt: str, ttl: str) -> Dict:
+    """Moeda que não terminou a tempo: repete o último item bom, marcado com a idade."""
+    if last is not None:
+        item = dict(last[0])
+        item["stale"] = True
+        item["stale_age_s"] = int(max(0.0, now - last[1]))
+        return item
+    # nunca teve valor bom (ex.: primeiro ciclo): sem números
+    item = _mk_item(par=par, side="NÃO ENTRAR", atual=0.0, alvo=0.0, ganho_pct=0.0, assert_pct=0.0,
+                    data=date_brt, hora=time_brt, prazo="-", price_source="NONE", ttl_expira_em=ttl)
+    item["stale"] = True
+    return item
+
+
+def _expire_stale(items: List[Dict], max_age_s: float) -> List[Dict]:
+    """Item stale há mais de max_age_s vira NÃO ENTRAR (sem números, perfis inclusive):
+    moeda que continua falhando não fica com sinal velho no painel/TOP10. 0 = sem limite."""
+    if max_age_s <= 0:
+        return items
+    out = []
+    for it in items:
+        if it.get("stale") and int(it.get("stale_age_s") or 0) > max_age_s:
+            it = {k: v for k, v in it.items() if k not in ("_profiles", "_ganho_raw", "_assert_raw")}
+            it.update(_signal_fields(None, False))
+        out.append(it)
+    return out
+
+
+def _assemble_payload(*, coins: List[str], done: Dict[str, Dict], last_good: Dict[str, Tuple[Dict, float]],
+                      dt_brt: datetime, date_brt: str, time_brt: str, ttl: str,
+                      gain_min: float, assert_min: float, partial: bool,
+                      carry: Iterable[str] = ()) -> Dict:
+    """Payload com as moedas prontas (`done`); as demais repetem o last_good como stale.
+    Moedas em `carry` ficaram fora do ciclo de propósito (engine/tiers): repetem o
+    último item SEM virar stale."""
+    now = time.time()
+    carry = set(carry)
     items: List[Dict] = []
+    prices: List[Dict] = []  # mark real de cada moeda (log de auditoria)
     miss_mark = 0
     miss_kl = 0
-    
+    integrity = new_stats()
+    stale = 0
+    carried = 0
     for par in coins:
-        symbol = _sym(par)
+        r = done.get(par)
+        if r is None and par in carry and par in last_good:
+            item = dict(last_good[par][0])
+            item["ttl_expira_em"] = ttl
+            items.append(item)
+            carried += 1
+            continue
+        if r is None:
+            items.append(_stale_item(par, last_good.get(par), now, date_brt=date_brt, time_brt=time_brt, ttl=ttl))
+            stale += 1
+            continue
+        items.append(r["item"])
+        if r["price"]:
+            prices.append(r["price"])
+        miss_mark += int(r["miss_mark"])
+        miss_kl += int(r["miss_kl"])
+        add_stats(integrity, r.get("integrity"))
 
-        mark, mark_src = _safe_mark(symbol)
-        if mark <= 0:
-            miss_mark += 1
-
-        k1, _src1 = _safe_klines(symbol, "1h", 220)
-        k4, _src4 = _safe_klines(symbol, "4h", 220)
-        if not k1 or not k4:
-            miss_kl += 1
-
-        # FALLBACK: se mark vier 0/None, usa último close do 4h (senão 1h)
-        if (not mark) or float(mark) <= 0:
-            try:
-                if k4 and len(k4) >= 2:
-                    mark = float(k4[-1][3])
-                elif k1 and len(k1) >= 2:
-                    mark = float(k1[-1][3])
-            except Exception:
-                pass
-
-        # Sempre calcula (sem "NÃO ENTRAR"):
-        sig = build_signal(
-            par=par,
-            ohlc_1h=(k1 or []),
-            ohlc_4h=(k4 or []),
-            mark_price=float(mark or 0.0),
-            gain_min_pct=float(gain_min),
-            assert_min_pct=float(assert_min),
-        )
-
-        # segurança operacional (NÃO ENTRAR por instabilidade)
-        nao_motivo = ""
-        if (mark_src == "NONE") or (not mark) or (float(mark) <= 0):
-            side = "NÃO ENTRAR"
-            nao_motivo = "SEM_PRECO_ATUAL"
-        elif (not k1) or (not k4):
-            side = "NÃO ENTRAR"
-            nao_motivo = "SEM_KLINES"
-        elif sig.side in ("LONG","SHORT"):
-            side = sig.side
-        else:
-            side = "NÃO ENTRAR"
-            nao_motivo = "SINAL_INVALIDO"
-
-        # SAÍDA FINAL (não depende de mutar sig)
-        if side == "NÃO ENTRAR":
-            out_atual = 0.0
-            out_alvo = 0.0
-            out_ganho = 0.0
-            out_assert = 0.0
-            out_prazo = "-"
-        else:
-            out_atual = sig.atual
-            out_alvo = sig.alvo
-            out_ganho = sig.ganho_pct
-            out_assert = sig.assert_pct
-            out_prazo = sig.prazo
-
-        items.append(
-            _mk_item(
-                par=par,
-                side=side,
-                atual=out_atual,
-                alvo=out_alvo,
-                ganho_pct=out_ganho,
-                assert_pct=out_assert,
-                data=date_brt,
-                hora=time_brt,
-                prazo=out_prazo,
-                price_source=mark_src,
-                ttl_expira_em=ttl,
-                    )
-        )
-    
     # FULL ordenado por PAR (estável)
     items.sort(key=lambda x: x.get("par") or "")
+    closes = {x["par"]: x["_closes_1h"] for x in items if x.get("_closes_1h")}
 
-    payload = {
+    return {
         "ok": True,
         "source": "local",
         "updated_at": dt_brt.astimezone(timezone.utc).isoformat().replace("+00:00", "Z"),
@@ -220,18 +410,199 @@ def build_payload() -> Dict:
         "assert_min_pct": float(assert_min),
         "miss_mark": int(miss_mark),
         "miss_klines": int(miss_kl),
+        "klines_integrity": integrity,  # engine/klines: buracos/duplicados/reparos do ciclo
+        "partial": bool(partial),
+        "stale_count": int(stale),
+        "carried_count": int(carried),
+        "warm": False,  # True só no payload de subida (checkpoint)
         "items": items,
+        # privado (não sai no JSON): preços para engine/audit, closes para engine/diversify
+        "_prices": prices,
+        "_closes": closes,
     }
 
+
+# resultados que terminaram depois do prazo: (last_good de destino, PAR, item, buscado em)
+_LATE: "queue.Queue[Tuple[Dict[str, Tuple[Dict, float]], str, Dict, float]]" = queue.Queue()
+
+
+def _keep_newer(last_good: Dict[str, Tuple[Dict, float]], par: str, item: Dict, at: float) -> None:
+    """Grava o item só se o dado for mais novo que o do last_good (resultado atrasado
+    de um ciclo antigo não sobrescreve o do ciclo seguinte)."""
+    cur = last_good.get(par)
+    if cur is None or cur[1] < at:
+        last_good[par] = (item, at)
+
+
+def _apply_late() -> None:
+    while True:
+        try:
+            target, par, item, at = _LATE.get_nowait()
+        except queue.Empty:
+            return
+        _keep_newer(target, par, item, at)
+
+
+def _cycle_coins(settings: Dict, shard: Optional[Tuple[int, int]]) -> List[str]:
+    coins = get_coins(settings)
+    return coins if shard is None else shard_coins(coins, *shard)
+
+
+def warm_payload(last_good: Dict[str, Tuple[Dict, float]], *, shard: Optional[Tuple[int, int]] = None) -> Dict:
+    """Payload de subida (sem nenhuma busca): tudo vem do checkpoint (engine/state)."""
+    settings = load_settings()
+    gain_min, assert_min = get_thresholds(settings)
+    dt_brt, date_brt, time_brt = _now_brt()
+    payload = _assemble_payload(coins=_cycle_coins(settings, shard), done={}, last_good=last_good, dt_brt=dt_brt,
+                                date_brt=date_brt, time_brt=time_brt, ttl=_ttl_iso(6),
+                                gain_min=gain_min, assert_min=assert_min, partial=True)
+    payload["warm"] = True
     return payload
 
 
+def build_payload(*, last_good: Optional[Dict[str, Tuple[Dict, float]]] = None,
+                  on_partial: Optional[Callable[[Dict], None]] = None,
+                  cache: Optional[LastGoodCache] = None,
+                  shard: Optional[Tuple[int, int]] = None,
+                  only: Optional[Iterable[str]] = None,
+                  marks_only: bool = False) -> Dict:
+    """
+    Ciclo com prazo (cycle_deadline_s), em pipeline: as buscas rodam num pool
+    de threads (fetch_workers) e entregam cada moeda numa fila limitada
+    (pipeline_queue) assim que chega; compute_workers threads calculam em
+    paralelo com as buscas que ainda faltam. Moeda que não termina até o prazo não segura o painel:
+    sai com o último item bom (last_good) marcado "stale" + "stale_age_s".
+    Enquanto o ciclo roda, on_partial recebe snapshots parciais ("partial":
+    true) a cada partial_publish_s com as moedas já prontas.
+    Com `cache` (engine/cache), falha de mark/klines usa o último dado bom
+    dentro do limite de idade em vez de virar SEM_PRECO_ATUAL/SEM_KLINES.
+    Com `shard` = (índice, total), só as moedas daquela partição (engine/shard).
+    Com `only`, só essas moedas são buscadas/recalculadas (marks_only: só o mark);
+    as demais repetem o último item (cadência por moeda, engine/tiers).
+    """
+    settings = load_settings()
+    gain_min, assert_min = get_thresholds(settings)  # mantidos no payload (info)
+    get_instruments().refresh_if_due()  # listagens das exchanges (1x/dia)
+    board = configure_tickers(settings)
+    if board is not None:
+        board.refresh()  # marks + funding/OI/giro de todas as moedas (1 requisição por exchange)
+    coins = _cycle_coins(settings, shard)
+    deadline_s = float(settings.get("cycle_deadline_s", 240))
+    publish_every_s = float(settings.get("partial_publish_s", 30))
+    workers = max(1, int(settings.get("fetch_workers", 4)))
+    compute_workers = max(1, int(settings.get("compute_workers", 1)))
+    queue_max = max(1, int(settings.get("pipeline_queue", 16)))
+    last_good = {} if last_good is None else last_good
+    _apply_late()  # resultados que passaram do prazo no ciclo anterior
+
+    dt_brt, date_brt, time_brt = _now_brt()
+    ttl = _ttl_iso(6)
+    cctx = dict(gain_min=gain_min, assert_min=assert_min, date_brt=date_brt, time_brt=time_brt, ttl=ttl,
+                max_funding_pct=float(settings.get("filter_max_funding_pct", 0.0) or 0.0),
+                min_turnover_usdt=float(settings.get("filter_min_turnover_usdt", 0.0) or 0.0),
+                profiles=get_profiles(settings))
+    run = coins if only is None else [c for c in coins if c in set(only)]
+    carry = set(coins) - set(run)
+
+    done: Dict[str, Dict] = {}
+    view = dict(coins=coins, done=done, last_good=last_good, dt_brt=dt_brt, date_brt=date_brt,
+                time_brt=time_brt, ttl=ttl, gain_min=gain_min, assert_min=assert_min, carry=carry)
+
+    # pipeline: busca (fetch_workers threads) -> fila limitada -> cálculo (compute_workers)
+    # -> resultados -> montagem/publicação (esta thread). Busca e cálculo se sobrepõem.
+    fetched_q: "queue.Queue[Optional[Tuple[str, Optional[Dict]]]]" = queue.Queue(maxsize=queue_max)
+    results: "queue.Queue[Tuple[str, Optional[Dict]]]" = queue.Queue()
+
+    # last_good só é escrito NESTA thread (o chamador itera nele entre ciclos: _tiers,
+    # checkpoint); resultado que chega depois do prazo vai para _LATE e entra no
+    # próximo ciclo, valendo o dado buscado mais recente (data["at"])
+    closed = [False]
+    close_lock = threading.Lock()
+
+    def _fetch(par: str) -> None:
+        try:
+            data = _fetch_coin(par, cache=cache, marks_only=marks_only)
+            data["at"] = time.time()
+        except Exception:
+            data = None
+        fetched_q.put((par, data))  # fila cheia = cálculo atrasado: a busca espera (backpressure)
+
+    def _compute() -> None:
+        while True:
+            job = fetched_q.get()
+            if job is None:
+                return
+            par, data = job
+            r = None
+            if data is not None:
+                try:
+                    r = _compute_coin(par, data, **cctx)
+                    r["at"] = data["at"]
+                except Exception:
+                    r = None  # vira "stale" como quem passou do prazo
+            with close_lock:
+                if not closed[0]:
+                    results.put((par, r))
+                elif r is not None:
+                    # também vale para quem termina DEPOIS do prazo: o próximo ciclo já tem o valor
+                    _LATE.put((last_good, par, r["item"], r["at"]))
+
+    t0 = time.monotonic()
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fetch")
+    futs = [pool.submit(_fetch, par) for par in run]
+    for i in range(compute_workers):
+        threading.Thread(target=_compute, name=f"compute-{i}", daemon=True).start()
+
+    def _close_compute() -> None:
+        wait(futs)  # canceladas no prazo também contam como terminadas
+        for _ in range(compute_workers):
+            fetched_q.put(None)
+
+    threading.Thread(target=_close_compute, name="pipeline-close", daemon=True).start()
+
+    pending = set(run)
+    last_pub, pub_n = t0, 0
+    try:
+        while pending:
+            remaining = deadline_s - (time.monotonic() - t0)
+            if remaining <= 0:
+                break
+            try:
+                par, r = results.get(timeout=min(remaining, publish_every_s))
+                pending.discard(par)
+                if r is not None:
+                    done[par] = r
+                    _keep_newer(last_good, par, r["item"], r["at"])
+            except queue.Empty:
+                pass
+            if (on_partial is not None and pending and len(done) > pub_n
+                    and time.monotonic() - last_pub >= publish_every_s):
+                on_partial(_assemble_payload(partial=True, **view))
+                last_pub, pub_n = time.monotonic(), len(done)
+    finally:
+        # quem travou (timeout duplo etc.) termina sozinho; o resultado vai para _LATE
+        pool.shutdown(wait=False, cancel_futures=True)
+        with close_lock:
+            closed[0] = True
+        while True:
+            try:
+                par, r = results.get_nowait()
+            except queue.Empty:
+                break
+            if r is not None:
+                _keep_newer(last_good, par, r["item"], r["at"])  # chegou junto com o prazo: fica de fora do done
+
+    return _assemble_payload(partial=False, **view)
+
+
 def _clean_item(x: dict) -> dict:
-    # mantém só as colunas válidas do painel
-    keep = {
+    # mantém só as colunas válidas do painel (tupla: ordem das chaves estável)
+    keep = (
         "par","side","atual","alvo","ganho_pct","assert_pct","prazo","data","hora",
-        "price_source","ttl_expira_em","ttl_h"
-    }
+        "price_source","ttl_expira_em","ttl_h","stale","stale_age_s","data_age_s",
+        "funding_rate_pct","next_funding_at","index_price","basis_pct","open_interest_usdt","turnover_24h_usdt",
+        "price_venues","price_spread_pct","price_diverged",
+    )
     return {k: x.get(k) for k in keep if k in x}
 
 def _clean_payload(d: dict) -> dict:
@@ -241,57 +612,265 @@ def _clean_payload(d: dict) -> dict:
     # remove campos mortos no topo do JSON (se existirem)
     for k in ["zona","risco","prioridade","rank_pts","nao_entrar","não_entrar","naoEntrar"]:
         if k in d: d.pop(k, None)
+    # campos internos do worker ("_...") nunca vão para o painel
+    for k in [k for k in d if k.startswith("_")]:
+        d.pop(k, None)
     return d
 
-def write_json(path: str, data: Dict):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    tmp = path + ".tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
-    os.replace(tmp, path)
+def build_top10(payload: Dict, *, closes: Optional[Dict[str, List[float]]] = None,
+                max_corr: float = 0.0, window: int = DEFAULT_WINDOW) -> Dict:
+    """TOP10: apenas operações válidas (LONG/SHORT). NÃO ENTRAR não entra no TOP10.
+    Ordenação: frescos antes de stale -> ASSERT desc -> GANHO desc -> PRAZO asc -> PAR asc.
+    Com `closes` e max_corr > 0: mesma ordem, pulando moedas correlacionadas demais
+    com as já escolhidas (engine/diversify) — pode sair com menos de 10."""
+    ls = list(payload.get("items") or [])
+    valid = [x for x in ls if (x.get("side") in ("LONG","SHORT"))]
+
+    valid = sorted(
+        valid,
+        key=lambda x: (
+            bool(x.get("stale")),
+            -float(x.get("assert_pct") or 0.0),
+            -float(x.get("ganho_pct") or 0.0),
+            _prazo_min(x.get("prazo")),
+            str(x.get("par") or ""),
+        ),
+    )
+
+    top10 = dict(payload)
+    if closes and max_corr > 0:
+        try:
+            top10["items"] = pick_diversified(valid, closes, k=10, max_corr=max_corr, window=window)
+            top10["diversified"] = {"max_corr": max_corr, "window_h": int(window)}
+        except Exception:
+            top10["items"] = valid[:10]  # diversificação nunca pode derrubar o worker
+    else:
+        top10["items"] = valid[:10]
+    return _clean_payload(top10)
+
+
+def profile_payload(raw: Dict, name: str, prof: Dict[str, float]) -> Dict:
+    """pro.json do perfil `name`: o mesmo ciclo com as colunas de limiar do perfil
+    (item["_profiles"], calculadas no _compute_coin). Item sem dado do perfil
+    (checkpoint de antes do perfil existir) sai NÃO ENTRAR, marcado stale."""
+    items = []
+    for it in raw.get("items") or []:
+        fields = (it.get("_profiles") or {}).get(name)
+        if fields is None:
+            items.append({**it, **_signal_fields(None, False), "stale": True})
+        else:
+            items.append({**it, **fields})
+    out = dict(raw)
+    out.update({"profile": name, "gain_min_pct": float(prof["gain_min_pct"]),
+                "assert_min_pct": float(prof["assert_min_pct"]), "items": items})
+    return out
+
+
+def make_recorder(settings: Dict) -> Optional[AuditRecorder]:
+    # log de auditoria (prices_/signals_*.jsonl para audit_report.py) numa thread
+    # própria: o ciclo só enfileira o lote
+    if not settings.get("audit_log", True):
+        return None
+    return AuditRecorder(
+        fsync=bool(settings.get("audit_fsync", False)),
+        price_format=str(settings.get("audit_price_format", "jsonl")),
+    )
+
+
+def record_cycle(recorder: Optional[AuditRecorder], raw: Dict, payload: Dict,
+                 signals: Optional[List[Dict]] = None) -> None:
+    if recorder is None:
+        return
+    if signals is None:
+        # itens "stale" são do ciclo anterior: não viram sinal novo; ciclo só-hot
+        # (engine/tiers) grava preços mas não sinais (cadência do log fica em 5 min)
+        signals = [x for x in (payload.get("items") or []) if not x.get("stale")] if raw.get("_signals_ok", True) else []
+    recorder.submit(
+        prices=raw.get("_prices") or [],
+        signals=signals,
+        updated_at=payload.get("updated_at") or "",
+        gain_min_pct=payload.get("gain_min_pct"),
+        now_brt=payload.get("updated_at_brt"),
+    )
+
+
+def hot_refresh_s(settings: Dict) -> float:
+    """Intervalo dos ciclos só-hot (engine/tiers), limitado a 30–60 s."""
+    return min(60.0, max(30.0, float(settings.get("hot_refresh_s", 45))))
+
+
+def make_publisher(settings: Dict) -> Callable[[Dict], Dict]:
+    """pro.json/top10.json + delta + servidor opcional; devolve publish(raw) -> payload limpo."""
+    # pro.json/top10.json + .gz/.br + manifesto (só grava se o conteúdo mudou)
+    snapshots = SnapshotWriter(
+        gz=bool(settings.get("snapshot_gzip", True)),
+        br=bool(settings.get("snapshot_brotli", True)),
+    )
+
+    # canal de deltas: pro.json ganha "seq" e pro_delta.json guarda os últimos patches.
+    # Ciclo só-hot também vira patch (o seq do pro.json tem que bater com o log); com
+    # tiered_refresh o log cresce na mesma proporção para cobrir o mesmo tempo (~3h).
+    keep = int(settings.get("delta_keep", 36))
+    if settings.get("tiered_refresh", False):
+        keep *= math.ceil(FULL_CYCLE_S / hot_refresh_s(settings))
+    delta = DeltaLog(keep=keep)
+    delta.load(os.path.join(DATA_DIR, "pro_delta.json"), os.path.join(DATA_DIR, "pro.json"))
+
+    # servidor HTTP opcional (snapshots em memória + ETag/304 + SSE)
+    server = None
+    serve_port = int(os.getenv("SERVE_PORT") or settings.get("serve_port") or 0)
+    if serve_port > 0:
+        server = SnapshotServer(os.getenv("SERVE_HOST") or settings.get("serve_host") or "127.0.0.1", serve_port)
+        server.delta = delta
+        server.start()
+
+    # arquivo histórico (engine/archive): só ciclos finais, diff por item + keyframes
+    archive = None
+    if settings.get("archive", True):
+        archive = SnapshotArchive(keyframe_every=int(settings.get("archive_keyframe_every", 24)),
+                                  keep_days=int(settings.get("archive_keep_days", 90)))
+
+    # TOP10 diversificado por correlação (opcional; 0 = TOP10 puro)
+    max_corr = float(settings.get("top10_max_corr", 0.0) or 0.0)
+    corr_window = int(settings.get("top10_corr_window_h", DEFAULT_WINDOW))
+
+    # perfis de limiares (settings "profiles"), resolvidos 1x como as demais opções
+    profiles = get_profiles(settings)
+
+    # idade máxima de um item stale (repetido do último ciclo bom); 0 = sem limite
+    stale_max_age_s = float(settings.get("stale_max_age_s", 1800) or 0)
+
+    def publish(raw: Dict) -> Dict:
+        # parciais e final passam pelo mesmo caminho (seq/delta coerentes com o pro.json)
+        raw = dict(raw, items=_expire_stale(list(raw.get("items") or []), stale_max_age_s))
+        payload = _clean_payload(raw)
+        delta.push(payload)
+        pro_snap, _ = snapshots.write(os.path.join(DATA_DIR, "pro.json"), payload)
+        snapshots.write(os.path.join(DATA_DIR, "pro_delta.json"), delta.document())
+
+        top10 = build_top10(payload, closes=raw.get("_closes"), max_corr=max_corr, window=corr_window)
+        top10_snap, _ = snapshots.write(os.path.join(DATA_DIR, "top10.json"), top10)
+        # arquivo só com ciclos completos (cadência de 5 min); parcial e só-hot ficam fora
+        if archive is not None and not payload.get("partial") and not raw.get("_hot"):
+            try:
+                archive.append("pro", payload)
+                archive.append("top10", top10)
+            except Exception:
+                pass  # arquivo histórico nunca pode derrubar o worker
+
+        # perfis de limiares: mesmos dados, arquivos próprios (só ciclos finais)
+        for name, prof in (profiles.items() if not payload.get("partial") else ()):
+            try:
+                pp = _clean_payload(profile_payload(raw, name, prof))
+                snapshots.write(os.path.join(DATA_DIR, f"pro_{name}.json"), pp)
+                snapshots.write(os.path.join(DATA_DIR, f"top10_{name}.json"),
+                                build_top10(pp, closes=raw.get("_closes"), max_corr=max_corr, window=corr_window))
+            except Exception:
+                pass  # perfil nunca pode derrubar o painel principal
+
+        if server is not None:
+            server.publish("pro", snap=pro_snap)
+            server.publish("top10", snap=top10_snap)
+            server.publish_file("audit_summary", os.path.join(DATA_DIR, "audit", "top10_summary.json"))
+        return payload
+
+    return publish
+
+
+def shard_config(settings: Dict) -> Optional[Tuple[int, int]]:
+    """(SHARD_INDEX, SHARD_COUNT) no modo sharded; None = processo único (padrão)."""
+    count = int(os.getenv("SHARD_COUNT") or settings.get("shard_count") or 1)
+    if count <= 1:
+        return None
+    index = int(os.getenv("SHARD_INDEX") or 0)
+    if not 0 <= index < count:
+        raise SystemExit(f"SHARD_INDEX={index} fora de 0..{count - 1}")
+    return index, count
 
-import time
 
 def main():
-    while True:
-        payload = build_payload()
-        payload = _clean_payload(payload)
-        write_json(os.path.join(DATA_DIR, "pro.json"), payload)
+    settings = load_settings()
+    shard = shard_config(settings)
 
-        # TOP10: apenas operações válidas (LONG/SHORT). NÃO ENTRAR não entra no TOP10.
-        ls = list(payload.get("items") or [])
-        valid = [x for x in ls if (x.get("side") in ("LONG","SHORT"))]
+    if shard is None:
+        recorder = make_recorder(settings)
+        publish = make_publisher(settings)
+        checkpoint_path = os.path.join(DATA_DIR, "cache", "checkpoint.json")
+    else:
+        # shard: só grava o seu pedaço; pro.json/top10.json/auditoria ficam com o worker_merge.py
+        recorder = None
 
-        # Ordenação TOP10: ASSERT desc -> GANHO desc -> PRAZO asc -> PAR asc
-        def _prazo_min_local(p):
-            try:
-                ss = (p or "").strip().lower()
-                if (not ss) or ss == "-":
-                    return 1e9
-                if ss.endswith("h"):
-                    return float(ss[:-1].strip()) * 60.0
-                if ss.endswith("m"):
-                    return float(ss[:-1].strip())
-            except Exception:
-                pass
-            return 1e9
+        def publish(raw: Dict) -> Dict:
+            payload = _clean_payload(raw)
+            profiles = {x["par"]: x["_profiles"] for x in raw.get("items") or [] if x.get("_profiles")}
+            write_shard(DATA_DIR, shard[0], shard[1], payload, prices=raw.get("_prices") or [],
+                        closes=raw.get("_closes") or {}, profiles=profiles, final=not raw.get("partial"), signals=bool(raw.get("_signals_ok", True)))
+            return payload
 
-        valid = sorted(
-            valid,
-            key=lambda x: (
-                -float(x.get("assert_pct") or 0.0),
-                -float(x.get("ganho_pct") or 0.0),
-                _prazo_min_local(x.get("prazo")),
-                str(x.get("par") or ""),
-            ),
-        )
-
-        top10 = dict(payload)
-        top10["items"] = valid[:10]
-        top10 = _clean_payload(top10)
-        write_json(os.path.join(DATA_DIR, "top10.json"), top10)
+        checkpoint_path = os.path.join(DATA_DIR, "cache", f"checkpoint_{shard[0]}of{shard[1]}.json")
+
+    # último item bom por moeda (moedas que perdem o prazo do ciclo repetem este)
+    last_good: Dict[str, Tuple[Dict, float]] = {}
 
-        time.sleep(300)
+    # último mark/klines bons por símbolo (memória + disco), com limite de idade
+    cache = LastGoodCache(max_age_s=settings.get("cache_max_age_s") or None)
+
+    # warm start: checkpoint do ciclo anterior -> painel publicado antes de qualquer busca
+    if load_checkpoint(checkpoint_path, cache=cache, last_good=last_good) and last_good:
+        publish(warm_payload(last_good, shard=shard))
+
+    # perfil opcional por ciclo (PROFILE=cprofile|tracemalloc|both; engine/profiling)
+    profiler = cycle_profiler("worker_pro" if shard is None else f"worker_pro_{shard[0]}of{shard[1]}", settings)
+
+    # cadência por moeda (engine/tiers): hot a cada hot_refresh_s, warm a cada 5 min, cold no fechar do 1h
+    tiered = bool(settings.get("tiered_refresh", False))
+    hot_s = hot_refresh_s(settings)
+    next_full = 0.0
+
+    while True:
+        with profiler.cycle():
+            tiers = _tiers(last_good, settings) if (tiered and last_good) else {}
+            full = time.time() >= next_full
+            if full:
+                only = None
+                if tiers:
+                    only = due_coins(_cycle_coins(settings, shard), tiers,
+                                     {par: ts for par, (_item, ts) in last_good.items()}, time.time())
+                raw = build_payload(last_good=last_good, on_partial=publish, cache=cache, shard=shard, only=only)
+            else:
+                hot = [par for par, t in tiers.items() if t == HOT]
+                raw = build_payload(last_good=last_good, cache=cache, shard=shard, only=hot, marks_only=True)
+                raw["_signals_ok"] = False
+                raw["_hot"] = True  # ciclo só-hot: fora do arquivo histórico (make_publisher)
+            if tiers:
+                raw["tiers"] = counts(tiers, [it.get("par") for it in raw.get("items") or []])
+            payload = publish(raw)
+            if full:
+                try:
+                    save_checkpoint(checkpoint_path, cache=cache, last_good=last_good)
+                except Exception:
+                    pass
+
+            record_cycle(recorder, raw, payload)
+
+        if not tiered:
+            time.sleep(FULL_CYCLE_S)
+            continue
+        if full:
+            next_full = time.time() + FULL_CYCLE_S
+        time.sleep(max(0.0, min(next_full - time.time(), hot_s)))
+
+
+def _tiers(last_good: Dict[str, Tuple[Dict, float]], settings: Dict) -> Dict[str, str]:
+    """hot/warm/cold de cada moeda a partir do último item + sinais abertos da auditoria."""
+    items = [item for item, _ts in last_good.values()]
+    gain_min, assert_min = get_thresholds(settings)
+    top10 = [x.get("par") for x in build_top10({"items": items}).get("items") or []]
+    return classify(
+        items, top10=top10, open_pars=open_signal_pars(DATA_DIR), gain_min=gain_min, assert_min=assert_min,
+        near_gain_pct=float(settings.get("hot_near_gain_pct", 0.5)),
+        near_assert_pct=float(settings.get("hot_near_assert_pct", 5.0)),
+    )
 
 if __name__ == "__main__":
     main()